@@ -0,0 +1,184 @@
+"""
+Asyncio Catalog Service
+The CatalogService API for asyncio programs, running on SQLAlchemy's AsyncEngine with the aiosqlite driver so many
+reads can be in flight at once without blocking the event loop, e.g.
+    service = await AsyncCatalogService.open("games.db")
+    results = await asyncio.gather(service.search("zelda"), service.search("mario"))
+aiosqlite is an optional dependency, only needed when this module is used (pip install aiosqlite).
+Author: DS-S
+"""
+import asyncio
+from typing import AsyncIterator, Callable, Dict, Iterable, List, Optional, Tuple, TypeVar
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+
+import Cataloger
+from Cataloger import CatalogBatch, GameEntry, Page
+
+T = TypeVar("T")
+
+
+async def connect_async(filepath: str, profile: str = Cataloger.DEFAULT_PROFILE) -> AsyncEngine:
+    """
+    Opens a catalog file for asyncio use, creating it if it does not exist. The schema is set up or migrated once on a
+    worker thread through Cataloger.connect(), then every connection of the async engine gets the same settings through
+    Cataloger.configure_connections(). Raises ValueError for an unknown profile.
+    :param filepath: The filepath to the catalog file.
+    :param profile: The name of the connection profile to use, one of Cataloger.PROFILES.
+    :return: The AsyncEngine.
+    """
+    setup = await asyncio.to_thread(Cataloger.connect, filepath, profile)
+    setup.dispose()
+    try:
+        engine = create_async_engine("sqlite+aiosqlite:///" + filepath, pool_size=Cataloger.POOL_SIZE)
+    except ImportError as error:
+        raise ImportError("The asyncio catalog service needs the aiosqlite package: pip install aiosqlite") from error
+    Cataloger.configure_connections(engine.sync_engine, profile)
+    return engine
+
+
+class AsyncCatalogService:
+    """
+    Asyncio version of Cataloger.CatalogService, with the same methods as coroutines. Queries and the query cache are
+    shared with the synchronous service, so both return the same results for the same catalog.
+    """
+
+    def __init__(self, engine: AsyncEngine) -> None:
+        self.engine = engine
+        self._cache = Cataloger.query_cache(engine.sync_engine)
+
+    @classmethod
+    async def open(cls, filepath: str, profile: str = Cataloger.DEFAULT_PROFILE) -> "AsyncCatalogService":
+        """
+        Opens a catalog file, creating it if it does not exist.
+        :param filepath: The filepath to the catalog file.
+        :param profile: The name of the connection profile to use, one of Cataloger.PROFILES.
+        :return: The AsyncCatalogService.
+        """
+        return cls(await connect_async(filepath, profile))
+
+    async def close(self) -> None:
+        """
+        Closes every connection to the catalog.
+        :return: Nothing.
+        """
+        await self.engine.dispose()
+
+    async def _fetch(self, key, statement, parameters=None):
+        """
+        Returns the rows of a query through the query cache.
+        :param key: The cache key, which must identify the statement and its parameters.
+        :param statement: The query to run on a miss.
+        :param parameters: Parameters for the statement.
+        :return: A list of the rows.
+        """
+        async with self.engine.connect() as conn:
+            return await conn.run_sync(self._cache.fetch_on, key, statement, parameters)
+
+    async def games(self, batch_size: int = Cataloger.BATCH_SIZE) -> AsyncIterator[GameEntry]:
+        """
+        Streams every game in the catalog alphabetically by title, batch_size rows at a time.
+        :param batch_size: The number of rows to fetch per round-trip.
+        :return: An async generator of GameEntry.
+        """
+        statement = Cataloger.game_summary_query(Cataloger.ENTRY_SEPARATOR).execution_options(yield_per=batch_size)
+        async with self.engine.connect() as conn:
+            result = await conn.stream(statement)
+            async for row in result:
+                yield Cataloger.to_entry(row)
+
+    async def search(self, query: str, limit: int = Cataloger.SEARCH_LIMIT) -> List[GameEntry]:
+        """
+        Searches the catalog by title, see Cataloger.search_games().
+        :param query: The text to search for.
+        :param limit: The maximum number of results to return.
+        :return: A list of GameEntry, best match first.
+        """
+        rows = await self._fetch(*Cataloger.search_query(query, limit, Cataloger.ENTRY_SEPARATOR))
+        return [Cataloger.to_entry(row) for row in rows]
+
+    async def page(self, sort: str = "title", platform: Optional[str] = None, genre: Optional[str] = None,
+                   played: Optional[bool] = None, completed: Optional[bool] = None, after: Optional[Tuple] = None,
+                   page_size: int = Cataloger.PAGE_SIZE) -> Page:
+        """
+        Lists one page of the catalog, see Cataloger.list_games().
+        :param sort: One of Cataloger.SORT_ORDERS.
+        :param platform: Only list games on this platform, or None for all.
+        :param genre: Only list games with this genre, or None for all.
+        :param played: Only list games with this played status, or None for all.
+        :param completed: Only list games with this completed status, or None for all.
+        :param after: The next_key of the previous page, or None for the first page.
+        :param page_size: The maximum number of rows on the page.
+        :return: A Page of GameEntry.
+        """
+        key, statement = Cataloger.list_query(sort, platform, genre, played, completed, after, page_size,
+                                              Cataloger.ENTRY_SEPARATOR)
+        page = Cataloger.to_page(await self._fetch(key, statement), sort, page_size)
+        return Page([Cataloger.to_entry(row) for row in page.rows], page.next_key)
+
+    async def stats(self) -> Cataloger.CatalogStats:
+        """
+        Reads the catalog statistics, see Cataloger.read_stats().
+        :return: A CatalogStats.
+        """
+        async with self.engine.connect() as conn:
+            return await conn.run_sync(Cataloger.read_stats)
+
+    async def has_title(self, title: str) -> bool:
+        """
+        Checks whether any game has the given title.
+        :param title: The game title.
+        :return: True if there is at least one game with the title.
+        """
+        async with self.engine.connect() as conn:
+            return await conn.run_sync(Cataloger.has_title, title)
+
+    async def find(self, title: str, played: bool, completed: bool, platform: str, genre: str) -> Optional[int]:
+        """
+        Looks up a full entry.
+        :return: The id of the matching game, or None.
+        """
+        async with self.engine.connect() as conn:
+            return await conn.run_sync(Cataloger.find_entry_id, title, played, completed, platform, genre)
+
+    async def run_batch(self, changes: Callable[[CatalogBatch], T]) -> T:
+        """
+        Runs a function making several changes through a CatalogBatch in a single transaction, committed when it returns
+        or rolled back should it raise.
+        :param changes: A function taking the CatalogBatch, run on the connection's own greenlet.
+        :return: Whatever the function returned.
+        """
+        async with self.engine.begin() as conn:
+            return await conn.run_sync(lambda sync_conn: changes(CatalogBatch(sync_conn)))
+
+    async def add(self, title: str, played: bool, completed: bool, platform: str, genre: str) -> int:
+        """
+        Adds a full entry in its own transaction, see Cataloger.CatalogBatch.add().
+        :return: The id of the new game.
+        """
+        return await self.run_batch(lambda batch: batch.add(title, played, completed, platform, genre))
+
+    async def add_games(self, entries: Iterable[Tuple[str, bool, bool, List[str], List[str]]]) -> List[int]:
+        """
+        Adds many games in one transaction, see Cataloger.CatalogBatch.add_games().
+        :return: A list of the ids of the new games, in the order given.
+        """
+        entries = list(entries)
+        return await self.run_batch(lambda batch: batch.add_games(entries))
+
+    async def update(self, values: Dict[str, object], ids: Optional[Iterable[int]] = None, title: Optional[str] = None,
+                     platform: Optional[str] = None, genre: Optional[str] = None, played: Optional[bool] = None,
+                     completed: Optional[bool] = None) -> int:
+        """
+        Changes every game matching the given filters in place in its own transaction, see
+        Cataloger.CatalogBatch.update().
+        :return: The number of games matching the filters.
+        """
+        ids = None if ids is None else list(ids)
+        return await self.run_batch(lambda batch: batch.update(values, ids, title, platform, genre, played, completed))
+
+    async def remove(self, title: str, played: bool, completed: bool, platform: str, genre: str) -> int:
+        """
+        Removes a full entry in its own transaction, see Cataloger.CatalogBatch.remove().
+        :return: The id of the removed game.
+        """
+        return await self.run_batch(lambda batch: batch.remove(title, played, completed, platform, genre))
@@ -0,0 +1,384 @@
+"""
+Command Line Interface
+Non-interactive subcommands for scripting and batch use of a catalog, e.g.
+    python CatalogCLI.py games.db add "Fire Emblem" --platform Switch --genre RPG --completed
+    python CatalogCLI.py games.db add "Hades" --platform Switch --platform PC --genre Roguelike --genre Action
+    python CatalogCLI.py games.db update --where-platform Switch --played true
+SQLAlchemy and the catalog code are only imported once a command actually needs them, so printing usage is fast.
+Author: DS-S
+"""
+import argparse
+import shlex
+import sys
+
+# Number of functions listed by --cprofile
+PROFILE_LINES = 25
+
+
+def _status(value):
+    """
+    Converts a true/false command line argument to a bool.
+    :param value: The argument.
+    :return: The bool.
+    """
+    if value.lower() in ("true", "yes", "1"):
+        return True
+    if value.lower() in ("false", "no", "0"):
+        return False
+    raise argparse.ArgumentTypeError(f"expected true or false, got '{value}'")
+
+
+def _positive(value):
+    """
+    Converts a command line argument to a positive int.
+    :param value: The argument.
+    :return: The int.
+    """
+    try:
+        number = int(value)
+    except ValueError:
+        number = 0
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"expected a whole number of at least 1, got '{value}'")
+    return number
+
+
+def _add_entry_arguments(parser, several=False):
+    """
+    Adds the arguments identifying a full game entry to an add/remove parser.
+    :param parser: The subcommand parser.
+    :param several: Whether --platform/--genre may be repeated, giving lists of names.
+    :return: Nothing.
+    """
+    parser.add_argument("title", help="game title")
+    if several:
+        parser.add_argument("--platform", required=True, action="append", help="platform name, repeat for several")
+        parser.add_argument("--genre", required=True, action="append", help="genre name, repeat for several")
+    else:
+        parser.add_argument("--platform", required=True, help="platform name")
+        parser.add_argument("--genre", required=True, help="genre name")
+    parser.add_argument("--played", action="store_true", help="the game has been played")
+    parser.add_argument("--completed", action="store_true", help="the game has been completed")
+
+
+def _entry_parser(prog="batch"):
+    """
+    Builds the parser for the add/remove commands, which may appear both on the command line and in batch scripts.
+    :param prog: The program name shown in error messages.
+    :return: The parser.
+    """
+    parser = argparse.ArgumentParser(prog=prog, add_help=False)
+    commands = parser.add_subparsers(dest="command", required=True)
+    _add_entry_arguments(commands.add_parser("add", help="add a game"), several=True)
+    _add_entry_arguments(commands.add_parser("remove", help="remove a game"))
+    return parser
+
+
+def build_parser():
+    """
+    Builds the command line parser.
+    :return: The parser.
+    """
+    parser = argparse.ArgumentParser(prog="CatalogCLI", description="Manage a game catalog from the command line.")
+    parser.add_argument("catalog", help="path to the catalog file, created if it does not exist")
+    parser.add_argument("--settings", "--profile", dest="profile", default="default",
+                        choices=("default", "performance"),
+                        help="SQLite connection settings to use, performance turns on write-ahead logging "
+                             "(default: default)")
+    parser.add_argument("--stats", action="store_true",
+                        help="print per-command and per-statement database timings on exit")
+    parser.add_argument("--cprofile", action="store_true",
+                        help="run under cProfile and print the hottest functions and database timings on exit")
+    parser.add_argument("--slow-log", help="append statements slower than --slow-ms to this file")
+    parser.add_argument("--slow-ms", type=float, default=100, help="slow statement threshold (default: 100)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    _add_entry_arguments(commands.add_parser("add", help="add a game"), several=True)
+    _add_entry_arguments(commands.add_parser("remove", help="remove a game"))
+
+    updating = commands.add_parser("update", help="change games in place, picked by id or by filters")
+    updating.add_argument("--id", type=int, action="append", dest="ids",
+                          help="only update the game with this id, repeat for several")
+    updating.add_argument("--where-title", help="only update games with this title")
+    updating.add_argument("--where-platform", help="only update games on this platform")
+    updating.add_argument("--where-genre", help="only update games with this genre")
+    updating.add_argument("--where-played", type=_status, help="only update games with this played status")
+    updating.add_argument("--where-completed", type=_status, help="only update games with this completed status")
+    updating.add_argument("--all", action="store_true", help="update every game when no other filter is given")
+    updating.add_argument("--title", help="new title")
+    updating.add_argument("--played", type=_status, help="new played status (true/false)")
+    updating.add_argument("--completed", type=_status, help="new completed status (true/false)")
+    updating.add_argument("--platform", action="append", help="new platform replacing the old ones, repeat for several")
+    updating.add_argument("--genre", action="append", help="new genre replacing the old ones, repeat for several")
+
+    search = commands.add_parser("search", help="search for games by title")
+    search.add_argument("query", help="text to search for, typos and partial words are allowed")
+    search.add_argument("--limit", type=_positive, default=50, help="maximum number of results (default: 50)")
+
+    listing = commands.add_parser("list", help="list games, optionally sorted and filtered")
+    listing.add_argument("--sort", default="title", choices=("title", "platform", "genre"),
+                         help="order to list games in (default: title)")
+    listing.add_argument("--platform", help="only list games on this platform")
+    listing.add_argument("--genre", help="only list games with this genre")
+    listing.add_argument("--played", type=_status, help="only list games with this played status (true/false)")
+    listing.add_argument("--completed", type=_status, help="only list games with this completed status (true/false)")
+    listing.add_argument("--page-size", type=_positive, default=1000, help="rows fetched per page (default: 1000)")
+
+    importing = commands.add_parser("import", help="bulk import games from a CSV/JSON/JSONL file")
+    importing.add_argument("file", help="file to import, may be gzip compressed (.gz)")
+    importing.add_argument("--format", choices=("csv", "json", "jsonl"), help="file format (default: from extension)")
+
+    exporting = commands.add_parser("export", help="export the catalog to a CSV/JSON/JSONL file")
+    exporting.add_argument("file", help="file to write, gzip compressed when the name ends in .gz")
+    exporting.add_argument("--format", choices=("csv", "json", "jsonl"), help="file format (default: from extension)")
+
+    batch = commands.add_parser("batch", help="run add/remove commands from a script in a single transaction")
+    batch.add_argument("script", help="file with one add/remove command per line ('-' for standard input), "
+                                      "blank lines and lines starting with # are skipped")
+
+    merging = commands.add_parser("merge", help="merge other catalogs into this new catalog, combining duplicates")
+    merging.add_argument("sources", nargs="+", help="catalog files to merge, which are only read")
+    merging.add_argument("--workers", type=_positive,
+                         help="number of processes reading catalogs (default: one per core)")
+
+    backing_up = commands.add_parser("backup", help="copy the catalog to a new file, safely while it is in use")
+    backing_up.add_argument("target", help="file to write, which must not exist")
+
+    syncing = commands.add_parser("sync", help="bring a replica up to date, making it with a backup if it is new")
+    syncing.add_argument("replica", help="replica catalog file")
+
+    changes = commands.add_parser("changes", help="write the changes made after a journal position to a file")
+    changes.add_argument("--since", type=int, default=0, help="journal position the replica is at (default: 0)")
+    changes.add_argument("output", help="JSONL file to write, gzip compressed when the name ends in .gz")
+
+    applying = commands.add_parser("apply", help="apply a file written by changes to this replica")
+    applying.add_argument("file", help="file written by the changes command")
+
+    maintaining = commands.add_parser("maintain", help="remove unused platforms/genres, reclaim free space and "
+                                                       "refresh query planner statistics")
+    maintaining.add_argument("--full", action="store_true", help="rewrite the whole file and recount all statistics")
+
+    commands.add_parser("stats", help="show how many games are played/completed per platform and genre")
+
+    serving = commands.add_parser("serve", help="serve the catalog to other programs over HTTP/JSON")
+    serving.add_argument("--host", default="127.0.0.1", help="address to listen on, 0.0.0.0 for the whole network "
+                                                            "(default: 127.0.0.1)")
+    serving.add_argument("--port", type=int, default=8080, help="port to listen on (default: 8080)")
+    serving.add_argument("--workers", type=_positive, default=5, help="number of worker threads (default: 5)")
+    serving.add_argument("--quiet", action="store_true", help="do not log each request")
+
+    commands.add_parser("menu", help="open the catalog in the interactive sub-menu")
+    return parser
+
+
+def _apply_entry(batch, args):
+    """
+    Applies an add/remove command inside a transaction without committing.
+    :param batch: The CatalogBatch of the open transaction.
+    :param args: The parsed add/remove command.
+    :return: Nothing.
+    """
+    if args.command == "add" and len(args.platform) == 1 and len(args.genre) == 1:
+        batch.add(args.title, args.played, args.completed, args.platform[0], args.genre[0])
+    elif args.command == "add":
+        # A game on several platforms or with several genres is one game rather than one full entry per combination
+        batch.add_games([(args.title, args.played, args.completed, args.platform, args.genre)])
+    else:
+        batch.remove(args.title, args.played, args.completed, args.platform, args.genre)
+
+
+def run_update(service, args):
+    """
+    Runs an update command.
+    :param service: The CatalogService of the catalog.
+    :param args: The parsed update command.
+    :return: The number of games matched.
+    """
+    filters = (args.ids, args.where_title, args.where_platform, args.where_genre, args.where_played,
+               args.where_completed)
+    if all(value is None for value in filters) and not args.all:
+        raise ValueError("no games picked, give --id or --where-... filters, or --all to update every game")
+    values = {name: value for name, value in (("title", args.title), ("played", args.played),
+                                               ("completed", args.completed), ("platforms", args.platform),
+                                               ("genres", args.genre)) if value is not None}
+    return service.update(values, *filters)
+
+
+def run_batch(service, lines):
+    """
+    Runs add/remove commands in a single transaction. Should any command fail nothing is changed.
+    :param service: The CatalogService of the catalog.
+    :param lines: The lines of the batch script.
+    :return: The number of commands run.
+    """
+    parser = _entry_parser()
+    count = 0
+    with service.batch() as batch:
+        for number, line in enumerate(lines, start=1):
+            if not line.strip() or line.lstrip().startswith("#"):
+                continue
+            try:
+                args = parser.parse_args(shlex.split(line))
+            except SystemExit:
+                raise ValueError(f"line {number}: invalid command: {line.strip()}")
+            try:
+                _apply_entry(batch, args)
+            except ValueError as error:
+                raise ValueError(f"line {number}: {error}")
+            count += 1
+    return count
+
+
+def run(args):
+    """
+    Runs a parsed command against the catalog it names, instrumenting the catalog first when timings or a slow query
+    log were asked for.
+    :param args: The parsed command line.
+    :return: The exit status.
+    """
+    import Cataloger
+
+    service = Cataloger.CatalogService.open(args.catalog, args.profile)
+    engine = service.engine
+    instruments = None
+    if args.stats or args.cprofile or args.slow_log:
+        instruments = Cataloger.instrument(engine, args.slow_ms, args.slow_log)
+    try:
+        with Cataloger.track(engine, args.command):
+            _dispatch(Cataloger, service, args)
+    finally:
+        if instruments is not None:
+            if args.stats or args.cprofile:
+                print(instruments.report(), file=sys.stderr)
+            instruments.close()
+    return 0
+
+
+def _dispatch(Cataloger, service, args):
+    """
+    Runs a parsed command against an open catalog.
+    :param Cataloger: The catalog module.
+    :param service: The CatalogService of the catalog.
+    :param args: The parsed command line.
+    :return: Nothing.
+    """
+    if args.command in ("add", "remove"):
+        with service.batch() as batch:
+            _apply_entry(batch, args)
+    elif args.command == "update":
+        print(f"Updated {run_update(service, args)} games.", file=sys.stderr)
+    elif args.command == "search":
+        for entry in service.search(args.query, args.limit):
+            print(Cataloger.format_game(entry))
+    elif args.command == "list":
+        page = Cataloger.Page([], None)
+        while True:
+            page = service.page(args.sort, args.platform, args.genre, args.played, args.completed, page.next_key,
+                                args.page_size)
+            for entry in page.rows:
+                group = "" if entry.group is None else f"{args.sort.capitalize()}: {entry.group} || "
+                print(group + Cataloger.format_game(entry))
+            if page.next_key is None:
+                break
+    elif args.command == "merge":
+        import CatalogMerge
+        report = CatalogMerge.merge_catalogs(service.engine, args.sources, args.workers)
+        print(f"Merged {report.read} games from {report.catalogs} catalogs into {report.games} games in "
+              f"{report.seconds:.2f} seconds.", file=sys.stderr)
+    elif args.command in ("backup", "sync", "changes", "apply"):
+        _dispatch_sync(service, args)
+    elif args.command == "maintain":
+        report = service.maintain(args.full)
+        print(f"Purged {report.links} orphaned links, {report.platforms} unused platforms, {report.genres} unused "
+              f"genres and {report.changes} applied journal entries, reclaimed {report.bytes_reclaimed} bytes "
+              f"(catalog size {report.bytes_before} -> {report.bytes_after} bytes) in {report.seconds:.2f} seconds.",
+              file=sys.stderr)
+    elif args.command == "stats":
+        Cataloger.show_stats(service.engine)
+    elif args.command == "import":
+        report = service.import_file(args.file, args.format)
+        rate = report.games / report.seconds if report.seconds else 0
+        print(f"Imported {report.games} games in {report.seconds:.2f} seconds ({rate:.0f} games/sec).",
+              file=sys.stderr)
+    elif args.command == "export":
+        report = service.export_file(args.file, args.format)
+        print(f"Exported {report.games} games in {report.seconds:.2f} seconds.", file=sys.stderr)
+    elif args.command == "batch":
+        if args.script == "-":
+            count = run_batch(service, sys.stdin)
+        else:
+            with open(args.script, encoding="utf-8") as script:
+                count = run_batch(service, script)
+        print(f"Ran {count} commands.", file=sys.stderr)
+    elif args.command == "serve":
+        import CatalogServer
+        CatalogServer.serve(service, args.host, args.port, args.workers, args.quiet)
+    elif args.command == "menu":
+        Cataloger.display_all(service.engine)
+        Cataloger.sub_menu(service.engine)
+
+
+def _dispatch_sync(service, args):
+    """
+    Runs a backup/sync command against an open catalog.
+    :param service: The CatalogService of the catalog.
+    :param args: The parsed command line.
+    :return: Nothing.
+    """
+    import CatalogSync
+
+    if args.command == "backup":
+        report = CatalogSync.backup(service.engine, args.target)
+        print(f"Backed up {report.pages} pages at journal position {report.seq} in {report.seconds:.2f} seconds.",
+              file=sys.stderr)
+    elif args.command == "changes":
+        count = CatalogSync.write_changes(service.engine, args.since, args.output)
+        print(f"Wrote {count} changes.", file=sys.stderr)
+    else:
+        if args.command == "sync":
+            report = CatalogSync.sync(service.engine, args.replica)
+        else:
+            report = CatalogSync.apply_changes(service.engine, *CatalogSync.read_changes(args.file))
+        print(f"Applied {report.applied} changes ({report.skipped} already applied), replica is at journal position "
+              f"{report.seq}, in {report.seconds:.2f} seconds.", file=sys.stderr)
+
+
+def main(argv=None):
+    """
+    Parses the command line and runs the command, reporting failures on standard error.
+    :param argv: The arguments, sys.argv[1:] when not given.
+    :return: The exit status.
+    """
+    args = build_parser().parse_args(argv)
+    profiler = None
+    if args.cprofile:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+    try:
+        return run(args)
+    except BrokenPipeError:
+        # Output piped into a command that stopped reading, e.g. head
+        sys.stderr.close()
+        return 0
+    except (ValueError, OSError, RuntimeError) as error:
+        print(f"error: {error}", file=sys.stderr)
+        return 1
+    except Exception as error:
+        # Imported here so printing usage does not load SQLAlchemy, which any command that raised its errors has loaded
+        import sqlite3
+        from sqlalchemy.exc import DBAPIError, SQLAlchemyError
+        if not isinstance(error, (SQLAlchemyError, sqlite3.Error)):
+            raise
+        # The driver's message, without the statement and parameters SQLAlchemy adds to it
+        print(f"error: {error.orig if isinstance(error, DBAPIError) else error}", file=sys.stderr)
+        return 1
+    finally:
+        if profiler is not None:
+            import pstats
+            profiler.disable()
+            pstats.Stats(profiler, stream=sys.stderr).sort_stats("cumulative").print_stats(PROFILE_LINES)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
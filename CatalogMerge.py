@@ -0,0 +1,152 @@
+"""
+Catalog Merge
+Merges several catalog files, e.g. one per household member, into a single catalog:
+    python CatalogCLI.py family.db merge alice.db bob.db carol.db
+Games whose titles only differ in case, punctuation or spacing are treated as the same game: they become one entry that
+is played/completed if any copy was, on every platform and with every genre any copy had. Each source catalog is read
+and grouped by normalized title in its own worker process, so reading many large catalogs scales with the number of
+cores, and the merged games are written through the bulk import path. Source catalogs are opened read-only and are never
+modified or migrated.
+Author: DS-S
+"""
+import os
+import re
+import sqlite3
+import time
+import unicodedata
+from collections import namedtuple
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from sqlalchemy import create_engine
+from sqlalchemy.pool import NullPool
+
+import Cataloger
+
+MergeReport = namedtuple("MergeReport", ["catalogs", "read", "games", "seconds"])
+
+_PUNCTUATION = re.compile(r"[\W_]+")
+
+
+def normalize_title(title):
+    """
+    Reduces a title to the form used to recognise the same game across catalogs: case folded, accents and other
+    compatibility characters unified, and punctuation and runs of whitespace turned into single spaces.
+    :param title: The title.
+    :return: The normalized title, e.g. "the legend of zelda breath of the wild".
+    """
+    return _PUNCTUATION.sub(" ", unicodedata.normalize("NFKC", title).casefold()).strip()
+
+
+@lru_cache(maxsize=None)
+def normalize_name(name):
+    """
+    Reduces a platform/genre name to the form used to recognise the same name across catalogs.
+    :param name: The name.
+    :return: The name case folded with runs of whitespace turned into single spaces.
+    """
+    return " ".join(unicodedata.normalize("NFKC", name).casefold().split())
+
+
+def _merge_names(names, new_names):
+    """
+    Adds platform/genre names to a group's names, skipping ones it already has in another spelling.
+    :param names: Map of normalized name to the first spelling seen, updated in place.
+    :param new_names: The names to add.
+    :return: Nothing.
+    """
+    for name in new_names:
+        names.setdefault(normalize_name(name), name)
+
+
+def read_catalog(filepath, batch_size=Cataloger.BATCH_SIZE):
+    """
+    Reads a catalog file read-only and groups its games by normalized title. Runs in a worker process.
+    :param filepath: The filepath to the catalog file.
+    :param batch_size: The number of rows to fetch per round-trip.
+    :return: A (games read, groups) pair, groups mapping each normalized title to a [title, played, completed,
+    platforms, genres] list with platforms/genres as maps of normalized name to spelling, in first seen order.
+    """
+    if not os.path.isfile(filepath):
+        raise ValueError(f"Catalog '{filepath}' does not exist")
+    uri = Path(filepath).resolve().as_uri() + "?mode=ro"
+    engine = create_engine("sqlite+pysqlite://", creator=lambda: sqlite3.connect(uri, uri=True), poolclass=NullPool)
+    groups = {}
+    read = 0
+    try:
+        with engine.connect() as conn:
+            statement = Cataloger.game_summary_query(Cataloger.ENTRY_SEPARATOR).execution_options(yield_per=batch_size)
+            for _, title, played, completed, platforms, genres in conn.execute(statement):
+                read += 1
+                key = normalize_title(title) or title
+                group = groups.get(key)
+                if group is None:
+                    group = groups[key] = [title, False, False, {}, {}]
+                group[1] = group[1] or bool(played)
+                group[2] = group[2] or bool(completed)
+                if platforms:
+                    _merge_names(group[3], platforms.split(Cataloger.ENTRY_SEPARATOR))
+                if genres:
+                    _merge_names(group[4], genres.split(Cataloger.ENTRY_SEPARATOR))
+    finally:
+        engine.dispose()
+    return read, groups
+
+
+def merge_groups(results):
+    """
+    Combines the groups read from each catalog, in catalog order so the spelling kept for a title or name is the first
+    one seen.
+    :param results: The (games read, groups) pairs returned by read_catalog().
+    :return: A (games read, groups) pair for all the catalogs together.
+    """
+    read, merged = 0, {}
+    for count, groups in results:
+        read += count
+        for key, group in groups.items():
+            kept = merged.get(key)
+            if kept is None:
+                merged[key] = group
+                continue
+            kept[1] = kept[1] or group[1]
+            kept[2] = kept[2] or group[2]
+            for names, new_names in ((kept[3], group[3]), (kept[4], group[4])):
+                for name_key, name in new_names.items():
+                    names.setdefault(name_key, name)
+    return read, merged
+
+
+def _records(groups):
+    """
+    Turns merged groups into import records, spelling each platform/genre name the same way in every game.
+    :param groups: The merged groups.
+    :return: A generator of (title, played, completed, platforms, genres) tuples, as taken by
+    Cataloger.import_records().
+    """
+    spellings = {}
+    for title, played, completed, platforms, genres in groups.values():
+        yield (title, played, completed,
+               [spellings.setdefault(("platform", key), name) for key, name in platforms.items()],
+               [spellings.setdefault(("genre", key), name) for key, name in genres.items()])
+
+
+def merge_catalogs(engine, filepaths, workers=None):
+    """
+    Merges catalog files into an empty catalog.
+    :param engine: The source of connections to the catalog to merge into, which must not hold any games.
+    :param filepaths: The filepaths to the catalogs to merge.
+    :param workers: The number of worker processes reading catalogs, one per core when not given.
+    :return: A MergeReport with the number of catalogs merged, games read and merged games written and the time taken.
+    """
+    start = time.perf_counter()
+    with engine.connect() as conn:
+        if conn.exec_driver_sql("SELECT EXISTS (SELECT 1 FROM game)").scalar():
+            raise ValueError("The catalog to merge into already holds games, merge into a new catalog")
+    if len(filepaths) < 2 or workers == 1:
+        results = [read_catalog(filepath) for filepath in filepaths]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers or os.cpu_count() or 1, len(filepaths))) as executor:
+            results = list(executor.map(read_catalog, filepaths))
+    read, groups = merge_groups(results)
+    Cataloger.import_records(engine, _records(groups))
+    return MergeReport(len(filepaths), read, len(groups), time.perf_counter() - start)
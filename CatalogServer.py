@@ -0,0 +1,345 @@
+"""
+Catalog Server
+Serves one catalog file to many clients over HTTP/JSON using only the standard library, e.g.
+    python CatalogCLI.py games.db serve --host 0.0.0.0 --port 8080
+    GET    /games?sort=platform&played=false&page_size=50   one page of the catalog, next page with &after=<next>
+    GET    /search?q=fire+emb&limit=10                       search by title
+    GET    /stats                                            played/completed counts overall, per platform and genre
+    POST   /games    {"title": ..., "played": ..., "completed": ..., "platform": ..., "genre": ...}
+    DELETE /games    same body as POST
+Requests are handled by a fixed size pool of worker threads sharing the catalog's connection pool, and changes are made
+one at a time. GET responses carry an ETag made from the catalog generation, so a client sending it back in
+If-None-Match gets 304 Not Modified without the listing/search query being run while the catalog is unchanged.
+Author: DS-S
+"""
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import Cataloger
+
+# Number of worker threads answering requests
+WORKERS = Cataloger.POOL_SIZE
+
+# Largest request body accepted, in bytes
+MAX_BODY = 64 * 1024
+
+# Fields of the JSON body of POST/DELETE /games, in CatalogService.add()/remove() argument order
+ENTRY_FIELDS = ("title", "played", "completed", "platform", "genre")
+
+
+class RequestError(Exception):
+    """
+    Raised while handling a request that should be answered with an error status.
+    """
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def _query_status(params, name):
+    """
+    Reads an optional played/completed filter from the query string.
+    :param params: The parsed query string.
+    :param name: The parameter name.
+    :return: True, False or None when not given.
+    """
+    value = params.get(name)
+    if value is None:
+        return None
+    if value.lower() in ("true", "1"):
+        return True
+    if value.lower() in ("false", "0"):
+        return False
+    raise RequestError(HTTPStatus.BAD_REQUEST, f"invalid value '{value}' for {name}, expected true or false")
+
+
+def _query_int(params, name, default):
+    """
+    Reads an optional positive integer from the query string.
+    :param params: The parsed query string.
+    :param name: The parameter name.
+    :param default: The value used when the parameter is not given.
+    :return: The integer.
+    """
+    value = params.get(name)
+    if value is None:
+        return default
+    if not value.isdigit() or int(value) < 1:
+        raise RequestError(HTTPStatus.BAD_REQUEST, f"invalid value '{value}' for {name}, expected a positive integer")
+    return int(value)
+
+
+def _entry_json(entry):
+    """
+    Converts a GameEntry to its JSON form.
+    :param entry: The entry.
+    :return: A dict ready for json.dumps().
+    """
+    record = entry._asdict()
+    if record["group"] is None:
+        del record["group"]
+    return record
+
+
+class CatalogRequestHandler(BaseHTTPRequestHandler):
+    """
+    Answers the requests of one connection, using the CatalogService and write lock of the server.
+    """
+    server_version = "CatalogServer/1.0"
+    protocol_version = "HTTP/1.1"
+    # Seconds an idle keep-alive connection may hold a worker before it is closed. Each one holds a whole worker, so a
+    # few idle clients could otherwise keep everyone else waiting for long.
+    timeout = 1
+
+    def handle_one_request(self):
+        """
+        Answers one request, then gives the worker up instead of keeping the connection alive when other connections
+        are waiting for one.
+        """
+        super().handle_one_request()
+        if self.server.busy():
+            self.close_connection = True
+
+    def log_message(self, format, *args):
+        """
+        Leaves request logging to the server's quiet setting.
+        """
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+    def _send_json(self, status, body, etag=None):
+        """
+        Sends a JSON response.
+        :param status: The HTTP status.
+        :param body: The object to send as JSON.
+        :param etag: The ETag of the response, if any.
+        :return: Nothing.
+        """
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        if etag is not None:
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _route(self):
+        """
+        Splits the request target into its path and query string parameters, keeping the last value of each.
+        :return: A (path, params) pair.
+        """
+        target = urlsplit(self.path)
+        params = {name: values[-1] for name, values in parse_qs(target.query).items()}
+        return target.path.rstrip("/") or "/", params
+
+    def _read_entry(self):
+        """
+        Reads a full entry from the JSON request body.
+        :return: The ENTRY_FIELDS values, in order.
+        """
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            # Where the body ends is unknown, so the connection cannot be reused
+            self.close_connection = True
+            raise RequestError(HTTPStatus.BAD_REQUEST, "invalid Content-Length")
+        if length > MAX_BODY:
+            # The body is left unread, so the connection cannot be reused
+            self.close_connection = True
+            raise RequestError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "request body too large")
+        try:
+            body = json.loads(self.rfile.read(length) or b"null")
+        except ValueError:
+            raise RequestError(HTTPStatus.BAD_REQUEST, "request body is not valid JSON")
+        if not isinstance(body, dict):
+            raise RequestError(HTTPStatus.BAD_REQUEST, f"request body must be an object with {', '.join(ENTRY_FIELDS)}")
+        for name in ("title", "platform", "genre"):
+            if not isinstance(body.get(name), str) or not body[name].strip():
+                raise RequestError(HTTPStatus.BAD_REQUEST, f"missing or invalid {name}")
+        for name in ("played", "completed"):
+            if not isinstance(body.get(name, False), bool):
+                raise RequestError(HTTPStatus.BAD_REQUEST, f"invalid {name}, expected true or false")
+        return [body.get(name, False) for name in ENTRY_FIELDS]
+
+    def _handle(self, method):
+        """
+        Runs a request, turning failures into JSON error responses.
+        :param method: The method handling the route.
+        :return: Nothing.
+        """
+        try:
+            method()
+        except RequestError as error:
+            self._send_json(error.status, {"error": str(error)})
+        except Cataloger.EntryExistsError as error:
+            self._send_json(HTTPStatus.CONFLICT, {"error": str(error)})
+        except Cataloger.EntryNotFoundError as error:
+            self._send_json(HTTPStatus.NOT_FOUND, {"error": str(error)})
+        except ValueError as error:
+            self._send_json(HTTPStatus.BAD_REQUEST, {"error": str(error)})
+        except Exception:
+            # Anything else, e.g. a database error, is the server's fault: logged in full, answered without details
+            self.server.handle_error(self.request, self.client_address)
+            self.close_connection = True
+            self._send_json(HTTPStatus.INTERNAL_SERVER_ERROR, {"error": "internal server error"})
+
+    def do_GET(self):
+        self._handle(self._get)
+
+    def do_POST(self):
+        self._handle(self._post)
+
+    def do_DELETE(self):
+        self._handle(self._delete)
+
+    def _get(self):
+        """
+        Answers a search or listing, or 304 when the client already holds the result for the current generation.
+        """
+        path, params = self._route()
+        if path not in ("/games", "/search", "/stats"):
+            raise RequestError(HTTPStatus.NOT_FOUND, f"no such resource '{path}'")
+        service = self.server.service
+        etag = f'"{service.generation()}"'
+        if etag in (tag.strip() for tag in self.headers.get("If-None-Match", "").split(",")):
+            self.send_response(HTTPStatus.NOT_MODIFIED)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        if path == "/stats":
+            stats = service.stats()
+            body = {"games": stats.games, "played": stats.played, "completed": stats.completed,
+                    "backlog": stats.backlog, "platforms": [row._asdict() for row in stats.platforms],
+                    "genres": [row._asdict() for row in stats.genres]}
+            self._send_json(HTTPStatus.OK, body, etag)
+            return
+        if path == "/search":
+            if not params.get("q", "").strip():
+                raise RequestError(HTTPStatus.BAD_REQUEST, "missing q")
+            entries = service.search(params["q"], _query_int(params, "limit", Cataloger.SEARCH_LIMIT))
+            self._send_json(HTTPStatus.OK, {"games": [_entry_json(entry) for entry in entries]}, etag)
+            return
+        after = params.get("after")
+        if after is not None:
+            try:
+                after = json.loads(after)
+            except ValueError:
+                after = None
+            if not isinstance(after, list):
+                raise RequestError(HTTPStatus.BAD_REQUEST, "invalid after, pass back the next value of a listing")
+            # The page key's values are checked by the listing, which rejects them with a ValueError answered with 400
+            after = tuple(after)
+        page = service.page(params.get("sort", "title"), params.get("platform"), params.get("genre"),
+                            _query_status(params, "played"), _query_status(params, "completed"), after,
+                            _query_int(params, "page_size", Cataloger.PAGE_SIZE))
+        next_key = None if page.next_key is None else json.dumps(page.next_key, ensure_ascii=False)
+        self._send_json(HTTPStatus.OK, {"games": [_entry_json(entry) for entry in page.rows], "next": next_key}, etag)
+
+    def _post(self):
+        """
+        Adds a full entry.
+        """
+        if self._route()[0] != "/games":
+            raise RequestError(HTTPStatus.NOT_FOUND, f"no such resource '{self._route()[0]}'")
+        entry = self._read_entry()
+        with self.server.write_lock:
+            game_id = self.server.service.add(*entry)
+        self._send_json(HTTPStatus.CREATED, {"id": game_id})
+
+    def _delete(self):
+        """
+        Removes a full entry.
+        """
+        if self._route()[0] != "/games":
+            raise RequestError(HTTPStatus.NOT_FOUND, f"no such resource '{self._route()[0]}'")
+        entry = self._read_entry()
+        with self.server.write_lock:
+            game_id = self.server.service.remove(*entry)
+        self._send_json(HTTPStatus.OK, {"id": game_id})
+
+
+class CatalogServer(HTTPServer):
+    """
+    HTTP server for one catalog. Connections are handed to a fixed pool of worker threads instead of a new thread each,
+    so however many clients connect at most workers requests use the catalog at once.
+    """
+    daemon_threads = True
+    # Connections waiting to be accepted while the pool is busy, rather than refused
+    request_queue_size = 128
+
+    def __init__(self, address, service, workers=WORKERS, quiet=False):
+        super().__init__(address, CatalogRequestHandler)
+        self.service = service
+        self.quiet = quiet
+        # SQLite only has one writer at a time, so changes queue here rather than on the database lock
+        self.write_lock = threading.Lock()
+        self.workers = workers
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="catalog-worker")
+        # Connections handed to the pool and not yet finished, both those being handled and those waiting for a worker
+        self._connections = 0
+        self._connections_lock = threading.Lock()
+
+    def busy(self):
+        """
+        Tells whether connections are waiting for a worker.
+        :return: True when there are more open connections than workers.
+        """
+        with self._connections_lock:
+            return self._connections > self.workers
+
+    def process_request(self, request, client_address):
+        """
+        Hands the connection to the worker pool.
+        """
+        with self._connections_lock:
+            self._connections += 1
+        self._executor.submit(self._process, request, client_address)
+
+    def _process(self, request, client_address):
+        """
+        Handles one connection on a worker thread, as socketserver would on the main thread.
+        """
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            with self._connections_lock:
+                self._connections -= 1
+
+    def server_close(self):
+        """
+        Stops listening and waits for the requests already accepted to finish.
+        """
+        super().server_close()
+        self._executor.shutdown(wait=True)
+
+
+def serve(service, host="127.0.0.1", port=8080, workers=WORKERS, quiet=False):
+    """
+    Serves a catalog until interrupted.
+    :param service: The CatalogService of the catalog.
+    :param host: The address to listen on, 0.0.0.0 for every interface.
+    :param port: The port to listen on.
+    :param workers: The number of worker threads.
+    :param quiet: Do not log each request.
+    :return: Nothing.
+    """
+    server = CatalogServer((host, port), service, workers, quiet)
+    print(f"Serving on http://{host}:{server.server_address[1]}/ (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
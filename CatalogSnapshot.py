@@ -0,0 +1,264 @@
+"""
+Catalog Snapshot
+A compact, read-only, column oriented copy of a catalog held in memory for analytics, e.g.
+    snapshot = load_snapshot(engine)
+    snapshot.count(platform="Switch", genre="RPG", played=False)
+Games are stored in id order as parallel columns. Platform and genre names are dictionary encoded to small integer
+codes, the platforms/genres of each game are kept as CSR (compressed sparse row) offset/code arrays, and played,
+completed and membership of each platform/genre are bitsets held in Python ints, one bit per game. Filters are bitwise
+ANDs and counts are popcounts over those ints, which run in C a machine word at a time, so queries over millions of
+games take milliseconds without any dependency beyond the standard library.
+Author: DS-S
+"""
+from array import array
+from collections import namedtuple
+
+import Cataloger
+
+# Number of rows read from the database at a time while loading
+LOAD_BATCH = 10000
+
+SnapshotSize = namedtuple("SnapshotSize", ["games", "platforms", "genres", "links", "bytes"])
+
+
+class _Names:
+    """
+    One dictionary encoded platform/genre column: the names, the CSR arrays giving the names of each game, and a bitset
+    of the games having each name.
+    """
+
+    def __init__(self, names, offsets, codes, bits):
+        self.names = names
+        self.codes_by_name = {name: code for code, name in enumerate(names)}
+        self.offsets = offsets
+        self.codes = codes
+        self.bits = bits
+
+    def of(self, index):
+        """
+        Decodes the names of one game.
+        :param index: The position of the game in the snapshot.
+        :return: A list of the names.
+        """
+        return [self.names[code] for code in self.codes[self.offsets[index]:self.offsets[index + 1]]]
+
+    def mask(self, name):
+        """
+        Gets the bitset of the games having a name.
+        :param name: The platform/genre name.
+        :return: The bitset, 0 when no game has the name.
+        """
+        code = self.codes_by_name.get(name)
+        return 0 if code is None else self.bits[code]
+
+
+def _load_names(conn, table, name_column, link_table, link_column, ids):
+    """
+    Reads one platform/genre table and its link table into a dictionary encoded _Names column.
+    :param conn: An open connection to the catalog.
+    :param table: Name of the platform/genre table.
+    :param name_column: Name of the column holding the name.
+    :param link_table: Name of the link table.
+    :param link_column: Name of the column in the link table referencing the platform/genre table.
+    :param ids: The game ids of the snapshot, ascending.
+    :return: The _Names column.
+    """
+    # Codes are handed out in name order so listings by code are alphabetical
+    names, code_of = [], {}
+    for name_id, name in conn.exec_driver_sql(f"SELECT id, {name_column} FROM {table} ORDER BY {name_column}"):
+        code_of[name_id] = len(names)
+        names.append(name)
+    width = (len(ids) + 7) // 8
+    flags = [bytearray(width) for _ in names]
+    offsets, codes = array("I", [0]), array("I")
+    # Links and games are both read in game id order, so each link is matched to its game in a single merged pass
+    index, count = 0, len(ids)
+    result = conn.exec_driver_sql(f"SELECT game_id, {link_column} FROM {link_table} ORDER BY game_id, {link_column}")
+    for rows in iter(lambda: result.fetchmany(LOAD_BATCH), []):
+        for game_id, name_id in rows:
+            while index < count and ids[index] < game_id:
+                offsets.append(len(codes))
+                index += 1
+            code = code_of.get(name_id)
+            # Links to games or names that no longer exist are left out
+            if index == count or ids[index] != game_id or code is None:
+                continue
+            codes.append(code)
+            flags[code][index >> 3] |= 1 << (index & 7)
+    while index < count:
+        offsets.append(len(codes))
+        index += 1
+    return _Names(names, offsets, codes, [int.from_bytes(flag, "little") for flag in flags])
+
+
+class CatalogSnapshot:
+    """
+    Read-only columnar copy of a catalog. Filters are combined into a bitset (a "mask") of the matching games, which can
+    then be counted, broken down by platform/genre, or decoded into GameEntry tuples.
+    """
+
+    def __init__(self, ids, titles, played, completed, platforms, genres, generation):
+        self.ids = ids
+        self.titles = titles
+        self.played = played
+        self.completed = completed
+        self.platforms = platforms
+        self.genres = genres
+        # The catalog generation the snapshot was taken at
+        self.generation = generation
+        self.all = (1 << len(ids)) - 1
+
+    def __len__(self):
+        return len(self.ids)
+
+    def is_current(self, engine):
+        """
+        Checks whether the catalog has changed since the snapshot was taken.
+        :param engine: The source of connections to the catalog.
+        :return: True if the snapshot still matches the catalog.
+        """
+        with engine.connect() as conn:
+            return Cataloger.generation(conn) == self.generation
+
+    def select(self, platform=None, genre=None, played=None, completed=None):
+        """
+        Finds the games matching every given filter.
+        :param platform: Only games on this platform, or None for all.
+        :param genre: Only games with this genre, or None for all.
+        :param played: Only games with this played status, or None for all.
+        :param completed: Only games with this completed status, or None for all.
+        :return: The mask of the matching games.
+        """
+        mask = self.all
+        if platform is not None:
+            mask &= self.platforms.mask(platform)
+        if genre is not None:
+            mask &= self.genres.mask(genre)
+        if played is not None:
+            mask &= self.played if played else ~self.played
+        if completed is not None:
+            mask &= self.completed if completed else ~self.completed
+        return mask
+
+    def count(self, platform=None, genre=None, played=None, completed=None):
+        """
+        Counts the games matching every given filter, see select().
+        :return: The number of games.
+        """
+        return self.select(platform, genre, played, completed).bit_count()
+
+    def _breakdown(self, names, mask):
+        """
+        Counts the games of a mask under each platform/genre name.
+        :param names: The _Names column.
+        :param mask: The mask of the games to count.
+        :return: Map of name to count, leaving out names with no games.
+        """
+        counts = {}
+        for name, bits in zip(names.names, names.bits):
+            count = (bits & mask).bit_count()
+            if count:
+                counts[name] = count
+        return counts
+
+    def by_platform(self, mask=None):
+        """
+        Counts the games of a mask on each platform.
+        :param mask: The mask of the games to count, every game when not given.
+        :return: Map of platform name to count, alphabetically.
+        """
+        return self._breakdown(self.platforms, self.all if mask is None else mask)
+
+    def by_genre(self, mask=None):
+        """
+        Counts the games of a mask in each genre.
+        :param mask: The mask of the games to count, every game when not given.
+        :return: Map of genre name to count, alphabetically.
+        """
+        return self._breakdown(self.genres, self.all if mask is None else mask)
+
+    def indexes(self, mask):
+        """
+        Lists the positions of the games in a mask.
+        :param mask: The mask.
+        :return: A generator of positions, ascending.
+        """
+        data = mask.to_bytes((len(self.ids) + 7) // 8, "little")
+        for byte_index, byte in enumerate(data):
+            while byte:
+                low = byte & -byte
+                yield (byte_index << 3) + low.bit_length() - 1
+                byte ^= low
+
+    def entries(self, mask):
+        """
+        Decodes the games in a mask.
+        :param mask: The mask.
+        :return: A list of GameEntry, alphabetically by title.
+        """
+        width = (len(self.ids) + 7) // 8
+        played, completed = self.played.to_bytes(width, "little"), self.completed.to_bytes(width, "little")
+        entries = [Cataloger.GameEntry(self.ids[index], self.titles[index], bool(played[index >> 3] >> (index & 7) & 1),
+                                       bool(completed[index >> 3] >> (index & 7) & 1), self.platforms.of(index),
+                                       self.genres.of(index))
+                   for index in self.indexes(mask)]
+        entries.sort(key=lambda entry: (entry.title, entry.id))
+        return entries
+
+    def size(self):
+        """
+        Reports the size of the snapshot.
+        :return: A SnapshotSize with the number of games, platforms, genres and links and the approximate number of
+        bytes the columns take, not counting the titles.
+        """
+        bitsets = [self.played, self.completed] + self.platforms.bits + self.genres.bits
+        arrays = [self.ids, self.platforms.offsets, self.platforms.codes, self.genres.offsets, self.genres.codes]
+        return SnapshotSize(len(self.ids), len(self.platforms.names), len(self.genres.names),
+                            len(self.platforms.codes) + len(self.genres.codes),
+                            sum((bits.bit_length() + 7) // 8 for bits in bitsets)
+                            + sum(len(column) * column.itemsize for column in arrays))
+
+
+def _read_snapshot(conn, generation):
+    """
+    Reads the whole catalog into a CatalogSnapshot.
+    :param conn: An open connection to the catalog.
+    :param generation: The catalog generation read before starting.
+    :return: The CatalogSnapshot.
+    """
+    ids, titles = array("q"), []
+    played, completed = bytearray(), bytearray()
+    result = conn.exec_driver_sql("SELECT id, title, played, completed FROM game ORDER BY id")
+    for rows in iter(lambda: result.fetchmany(LOAD_BATCH), []):
+        for game_id, title, is_played, is_completed in rows:
+            index = len(titles)
+            if not index & 7:
+                played.append(0)
+                completed.append(0)
+            ids.append(game_id)
+            titles.append(title)
+            if is_played:
+                played[-1] |= 1 << (index & 7)
+            if is_completed:
+                completed[-1] |= 1 << (index & 7)
+    platforms = _load_names(conn, "platform", "platform_name", "game_platform_link", "platform_id", ids)
+    genres = _load_names(conn, "genre", "genre_name", "game_genre_link", "genre_id", ids)
+    return CatalogSnapshot(ids, titles, int.from_bytes(played, "little"), int.from_bytes(completed, "little"),
+                           platforms, genres, generation)
+
+
+def load_snapshot(engine):
+    """
+    Reads the whole catalog into a CatalogSnapshot. Everything is read in one read transaction, so the snapshot never
+    mixes rows from before and after a change made while it loads, and it is taken in a single pass however busy the
+    catalog is. With write-ahead logging (the "performance" profile) writers carry on meanwhile, otherwise they wait for
+    the load to finish.
+    :param engine: The source of connections to the catalog.
+    :return: The CatalogSnapshot.
+    """
+    with engine.connect() as conn:
+        conn.exec_driver_sql("BEGIN")
+        try:
+            return _read_snapshot(conn, Cataloger.generation(conn))
+        finally:
+            conn.rollback()
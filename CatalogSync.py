@@ -0,0 +1,267 @@
+"""
+Catalog Backup and Sync
+Full backups and incremental replication of a catalog, built on its change journal, e.g.
+    python CatalogCLI.py games.db backup replica.db       consistent full copy, see backup() for when writers wait
+    python CatalogCLI.py games.db sync replica.db         ship only the changes the replica has not seen yet
+    python CatalogCLI.py games.db changes --since 120 changes.jsonl.gz
+    python CatalogCLI.py replica.db apply changes.jsonl.gz
+A replica starts as a full backup, which records how far through the source's journal it is. Syncing then replays the
+journal entries after that point on the replica in a single transaction, so a replica is always an exact copy of the
+source as it was at some point. Changes can also be shipped as a file when the replica is on another machine. The
+source remembers the position of each replica as of its backup and last sync, and Cataloger.maintain() prunes the
+journal entries every replica has applied, keeping the whole journal while no replica is known; a replica further behind
+than the journal goes is told to make a new backup.
+Author: DS-S
+"""
+import json
+import os
+import sqlite3
+import time
+import uuid
+from collections import namedtuple
+
+import Cataloger
+
+# Pages copied per step of an online backup, -1 for all of them in one step. A step reads from a single snapshot of the
+# catalog, which in write-ahead log mode (the "performance" profile) never holds up writers, whereas a multi-step backup
+# starts over whenever another connection writes between steps and so may never finish on a busy catalog.
+BACKUP_PAGES = -1
+
+Change = namedtuple("Change", ["seq", "table", "operation", "data"])
+
+BackupReport = namedtuple("BackupReport", ["pages", "seq", "seconds"])
+
+SyncReport = namedtuple("SyncReport", ["applied", "skipped", "seq", "seconds"])
+
+
+def catalog_id(conn):
+    """
+    Reads the id that tells a catalog apart from its replicas and other catalogs.
+    :param conn: An open connection.
+    :return: The catalog id.
+    """
+    return conn.exec_driver_sql("SELECT catalog_id FROM catalog_state WHERE id = 0").scalar()
+
+
+def journal_position(conn):
+    """
+    Reads the sequence number of the latest change recorded in the journal.
+    :param conn: An open connection.
+    :return: The sequence number, 0 if nothing was ever recorded.
+    """
+    return conn.exec_driver_sql("SELECT seq FROM sqlite_sequence WHERE name = 'change_journal'").scalar() or 0
+
+
+def replica_position(conn, source_id):
+    """
+    Reads how far through a source catalog's journal a replica is.
+    :param conn: An open connection to the replica.
+    :param source_id: The catalog id of the source.
+    :return: The sequence number of the last change applied, or None if the catalog is not a replica of the source.
+    """
+    return conn.exec_driver_sql("SELECT seq FROM sync_state WHERE source_id = ?", (source_id,)).scalar()
+
+
+def _record_replica(conn, replica_id, seq):
+    """
+    Remembers how far through the journal a replica of this catalog is, which holds back pruning of later entries.
+    :param conn: An open connection to the source catalog.
+    :param replica_id: The catalog id of the replica.
+    :param seq: The sequence number of the last change the replica has.
+    :return: Nothing.
+    """
+    conn.exec_driver_sql("INSERT OR REPLACE INTO replica_state (replica_id, seq) VALUES (?, ?)", (replica_id, seq))
+
+
+def changes_since(engine, since, batch_size=Cataloger.BATCH_SIZE):
+    """
+    Streams the changes recorded after a given sequence number, oldest first.
+    :param engine: The source of connections to the catalog.
+    :param since: The sequence number of the last change already seen.
+    :param batch_size: The number of changes fetched per round-trip.
+    :return: A generator of Change.
+    """
+    with engine.connect() as conn:
+        # Entries are only ever deleted from the start of the journal, by pruning
+        oldest = conn.exec_driver_sql("SELECT min(seq) FROM change_journal").scalar()
+        if since + 1 < (oldest if oldest is not None else journal_position(conn) + 1):
+            raise ValueError(f"Changes after {since} have been pruned from the journal of the source catalog, "
+                             f"make a new backup")
+        result = conn.exec_driver_sql("SELECT seq, table_name, operation, data FROM change_journal WHERE seq > ? "
+                                      "ORDER BY seq", (since,))
+        for rows in iter(lambda: result.fetchmany(batch_size), []):
+            for seq, table, operation, data in rows:
+                yield Change(seq, table, operation, json.loads(data))
+
+
+def _apply_change(conn, change):
+    """
+    Replays one journal entry.
+    :param conn: An open connection inside a transaction.
+    :param change: The Change.
+    :return: Nothing.
+    """
+    columns = Cataloger.JOURNAL_COLUMNS.get(change.table)
+    if columns is None or change.operation not in ("insert", "update", "delete"):
+        raise ValueError(f"Change {change.seq}: unknown change {change.operation} on '{change.table}'")
+    keys = Cataloger.JOURNAL_KEYS[change.table]
+    try:
+        if change.operation == "insert":
+            conn.exec_driver_sql(f"INSERT INTO {change.table} ({', '.join(columns)}) "
+                                 f"VALUES ({', '.join('?' * len(columns))})",
+                                 tuple(change.data[column] for column in columns))
+        elif change.operation == "update":
+            values = [column for column in columns if column not in keys]
+            conn.exec_driver_sql(f"UPDATE {change.table} SET {', '.join(f'{column} = ?' for column in values)} "
+                                 f"WHERE {' AND '.join(f'{key} = ?' for key in keys)}",
+                                 tuple(change.data[column] for column in values + keys))
+        else:
+            conn.exec_driver_sql(f"DELETE FROM {change.table} WHERE {' AND '.join(f'{key} = ?' for key in keys)}",
+                                 tuple(change.data[key] for key in keys))
+    except KeyError as error:
+        raise ValueError(f"Change {change.seq}: missing column {error}")
+
+
+def apply_changes(engine, source_id, changes):
+    """
+    Replays changes from a source catalog's journal on a replica in a single transaction. Changes the replica already
+    has are skipped, and a gap in the sequence numbers stops the sync without changing anything.
+    :param engine: The source of connections to the replica.
+    :param source_id: The catalog id of the source.
+    :param changes: The changes, oldest first, as made by changes_since() or read_changes().
+    :return: A SyncReport with the number of changes applied and skipped, the replica's new position and the time taken.
+    """
+    start = time.perf_counter()
+    applied = skipped = 0
+    with engine.begin() as conn:
+        position = replica_position(conn, source_id)
+        if position is None:
+            raise ValueError("This catalog is not a replica of the source catalog, make one with backup first")
+        for change in changes:
+            if change.seq <= position:
+                skipped += 1
+                continue
+            if change.seq != position + 1:
+                raise ValueError(f"Changes {position + 1} to {change.seq - 1} are missing, sync from the source "
+                                 f"catalog or make a new backup")
+            _apply_change(conn, change)
+            position = change.seq
+            applied += 1
+        conn.exec_driver_sql("UPDATE sync_state SET seq = ? WHERE source_id = ?", (position, source_id))
+    return SyncReport(applied, skipped, position, time.perf_counter() - start)
+
+
+def backup(engine, filepath, pages=BACKUP_PAGES):
+    """
+    Copies a catalog to a new file with SQLite's online backup API, which copies a consistent snapshot of the catalog
+    while it stays in use, see BACKUP_PAGES. Writers only carry on during the copy when the catalog uses write-ahead
+    logging (the "performance" profile); in rollback journal mode (the "default" profile) they wait until it is done.
+    The copy gets its own catalog id and remembers how far through the source's journal it is, ready for sync(), and
+    the source remembers the copy as one of its replicas.
+    :param engine: The source of connections to the catalog.
+    :param filepath: The filepath of the backup, which must not exist.
+    :param pages: The number of pages copied per step.
+    :return: A BackupReport with the number of pages copied, the journal position of the copy and the time taken.
+    """
+    start = time.perf_counter()
+    if os.path.exists(filepath):
+        raise ValueError(f"'{filepath}' already exists, backups are only written to new files")
+    replica_id = uuid.uuid4().hex
+    with engine.begin() as conn:
+        source_id = catalog_id(conn)
+        # The copy is at least this far through the journal, so nothing it needs is pruned while it is taken
+        _record_replica(conn, replica_id, journal_position(conn))
+    raw = engine.raw_connection()
+    target = sqlite3.connect(filepath)
+    try:
+        raw.driver_connection.backup(target, pages=pages)
+        count = target.execute("PRAGMA page_count").fetchone()[0]
+        seq = target.execute("SELECT seq FROM sqlite_sequence WHERE name = 'change_journal'").fetchone()
+        seq = seq[0] if seq else 0
+        with target:
+            target.execute("UPDATE catalog_state SET catalog_id = ? WHERE id = 0", (replica_id,))
+            target.execute("INSERT OR REPLACE INTO sync_state (source_id, seq) VALUES (?, ?)", (source_id, seq))
+            # The source's replicas are not the copy's
+            target.execute("DELETE FROM replica_state")
+    finally:
+        target.close()
+        raw.close()
+    with engine.begin() as conn:
+        _record_replica(conn, replica_id, seq)
+    return BackupReport(count, seq, time.perf_counter() - start)
+
+
+def sync(engine, filepath):
+    """
+    Brings a replica up to date with a catalog, making it with a full backup if it does not exist yet. The source
+    remembers how far the replica got, see Cataloger.prune_journal().
+    :param engine: The source of connections to the source catalog.
+    :param filepath: The filepath to the replica.
+    :return: A SyncReport.
+    """
+    start = time.perf_counter()
+    if not os.path.exists(filepath):
+        report = backup(engine, filepath)
+        return SyncReport(0, 0, report.seq, time.perf_counter() - start)
+    with engine.connect() as conn:
+        source_id = catalog_id(conn)
+    replica = Cataloger.connect(filepath)
+    try:
+        with replica.connect() as conn:
+            position = replica_position(conn, source_id)
+            replica_id = catalog_id(conn)
+        if position is None:
+            raise ValueError(f"'{filepath}' is not a replica of this catalog")
+        report = apply_changes(replica, source_id, changes_since(engine, position))
+    finally:
+        replica.dispose()
+    with engine.begin() as conn:
+        _record_replica(conn, replica_id, report.seq)
+    return report._replace(seconds=time.perf_counter() - start)
+
+
+def write_changes(engine, since, filepath):
+    """
+    Writes the changes recorded after a given sequence number to a JSONL file (gzip compressed when the name ends in
+    .gz), to be applied to a replica elsewhere with read_changes() and apply_changes(). The first line names the source
+    catalog, every other line is one change. The source only knows such a replica by the position of its backup, so
+    journal pruning keeps every change since then.
+    :param engine: The source of connections to the catalog.
+    :param since: The sequence number of the last change the replica has.
+    :param filepath: The filepath to write to.
+    :return: The number of changes written.
+    """
+    with engine.connect() as conn:
+        source_id = catalog_id(conn)
+    count = 0
+    with Cataloger.open_text(filepath, "w") as file:
+        file.write(json.dumps({"source": source_id, "since": since}) + "\n")
+        for change in changes_since(engine, since):
+            file.write(json.dumps(change._asdict(), ensure_ascii=False) + "\n")
+            count += 1
+    return count
+
+
+def read_changes(filepath):
+    """
+    Reads a file written by write_changes().
+    :param filepath: The filepath to the file.
+    :return: A (source catalog id, generator of Change) pair.
+    """
+    file = Cataloger.open_text(filepath)
+    try:
+        header = json.loads(file.readline() or "{}")
+    except ValueError:
+        header = {}
+    if "source" not in header:
+        file.close()
+        raise ValueError(f"'{filepath}' is not a change file")
+
+    def changes():
+        with file:
+            for line in file:
+                if line.strip():
+                    change = json.loads(line)
+                    yield Change(change["seq"], change["table"], change["operation"], change["data"])
+
+    return header["source"], changes()
@@ -2,20 +2,55 @@
 Main Program
 Author: DS-S
 """
+import contextlib
+import contextvars
+import csv
+import gzip
+import json
+import logging
 import os
-from sqlalchemy import create_engine, Table, Column, Integer, String, Boolean, ForeignKey, select, and_
+import re
+import sys
+import threading
+import time
+import weakref
+from collections import OrderedDict, namedtuple
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+# Command line arguments select the non-interactive interface in CatalogCLI, which takes over before SQLAlchemy is
+# imported so that printing its usage stays fast
+if __name__ == "__main__" and len(sys.argv) > 1:
+    import CatalogCLI
+    sys.exit(CatalogCLI.main())
+
+from sqlalchemy import create_engine, Table, Column, Index, Integer, String, Boolean, ForeignKey, select, and_, \
+    func, text, exists, null, tuple_, union_all, event, bindparam, column
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import OperationalError
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import Session, relationship
+from sqlalchemy.orm import relationship
+from sqlalchemy.pool import QueuePool
 
 Base = declarative_base()
 
+# Version of the catalog schema, stored in the database file with PRAGMA user_version. Catalogs created before
+# versioning was added have a user_version of 0.
+SCHEMA_VERSION = 8
+
+# The primary keys of the link tables only cover lookups by game, the extra indexes cover lookups in the reverse
+# direction (all games on a platform/with a genre) without touching the table itself. Each link also holds a copy of
+# its game's title, kept up to date by triggers, so the reverse index lists a platform's/genre's games in title order.
 gplink = Table("game_platform_link", Base.metadata,
                Column("game_id", ForeignKey("game.id"), primary_key=True),
-               Column("platform_id", Integer, ForeignKey("platform.id"), primary_key=True))
+               Column("platform_id", Integer, ForeignKey("platform.id"), primary_key=True),
+               Column("title", String),
+               Index("ix_game_platform_link_platform_title", "platform_id", "title", "game_id"))
 
 gglink = Table("game_genre_link", Base.metadata,
                Column("game_id", ForeignKey("game.id"), primary_key=True),
-               Column("genre_id", Integer, ForeignKey("genre.id"), primary_key=True))
+               Column("genre_id", Integer, ForeignKey("genre.id"), primary_key=True),
+               Column("title", String),
+               Index("ix_game_genre_link_genre_title", "genre_id", "title", "game_id"))
 
 class Game(Base):
     __tablename__ = "game"
@@ -29,12 +64,16 @@ class Game(Base):
     platforms = relationship("Platform", secondary=gplink, back_populates="games")
     genres = relationship("Genre", secondary=gglink, back_populates="games")
 
+    # Covers title lookups as well as listings in title order filtered by played/completed status, without reading the
+    # table itself.
+    __table_args__ = (Index("ix_game_title_status", "title", "played", "completed"),)
+
 
 class Platform(Base):
     __tablename__ = "platform"
 
     id = Column(Integer, primary_key=True)
-    platform_name = Column(String, nullable=False)
+    platform_name = Column(String, nullable=False, index=True, unique=True)
     games = relationship("Game", secondary=gplink, back_populates="platforms")
 
 
@@ -42,39 +81,951 @@ class Genre(Base):
     __tablename__ = "genre"
 
     id = Column(Integer, primary_key=True)
-    genre_name = Column(String, nullable=False)
+    genre_name = Column(String, nullable=False, index=True, unique=True)
     games = relationship("Game", secondary=gglink, back_populates="genres")
 
 
-def connect(filepath):
+def _merge_duplicate_names(conn, table, name_column, link_table, link_column):
+    """
+    Folds rows of a platform/genre table that share a name into the row with the lowest id, so that a unique index can
+    be built on the name column. Link rows pointing at the removed rows are moved to the kept row.
+    :param conn: An open connection inside a transaction.
+    :param table: Name of the platform/genre table.
+    :param name_column: Name of the column holding the platform/genre name.
+    :param link_table: Name of the link table referencing the platform/genre table.
+    :param link_column: Name of the column in the link table referencing the platform/genre table.
+    :return: Nothing.
+    """
+    duplicates = (f"SELECT t.id AS old_id, k.keep_id FROM {table} t "
+                  f"JOIN (SELECT {name_column}, MIN(id) AS keep_id FROM {table} GROUP BY {name_column} "
+                  f"HAVING COUNT(*) > 1) k ON t.{name_column} = k.{name_column} WHERE t.id != k.keep_id")
+    for old_id, keep_id in conn.exec_driver_sql(duplicates).all():
+        # A game linked to both duplicates already has the kept link, so the moved row is ignored and removed below
+        conn.exec_driver_sql(f"UPDATE OR IGNORE {link_table} SET {link_column} = ? WHERE {link_column} = ?",
+                             (keep_id, old_id))
+        conn.exec_driver_sql(f"DELETE FROM {link_table} WHERE {link_column} = ?", (old_id,))
+        conn.exec_driver_sql(f"DELETE FROM {table} WHERE id = ?", (old_id,))
+
+
+def _migrate_to_v1(conn):
+    """
+    Adds the title, platform name and genre name indexes to a catalog created before schema versioning.
+    :param conn: An open connection inside a transaction.
+    :return: Nothing.
+    """
+    _merge_duplicate_names(conn, "platform", "platform_name", "game_platform_link", "platform_id")
+    _merge_duplicate_names(conn, "genre", "genre_name", "game_genre_link", "genre_id")
+    for table in Base.metadata.sorted_tables:
+        columns = {row[1] for row in conn.exec_driver_sql(f"PRAGMA table_info({table.name})")}
+        for index in table.indexes:
+            # Indexes over columns added by later versions are built by those versions
+            if all(indexed.name in columns for indexed in index.columns):
+                index.create(conn, checkfirst=True)
+
+
+# Full-text indexes over game titles. game_fts holds whole words for token/prefix matching and game_trigram holds
+# three character sequences for typo tolerant matching. Both are external content tables reading titles from game and
+# are kept in sync with it by triggers, so every path that writes games (add_game, remove_game, imports) updates them.
+# While bulk_load holds a row (only ever inside an import or update_games() transaction) new games are left for the
+# importer to index in batches, which is an order of magnitude faster than indexing them one row at a time.
+_SEARCH_DDL = [
+    "CREATE TABLE IF NOT EXISTS bulk_load (active INTEGER NOT NULL)",
+    "CREATE VIRTUAL TABLE IF NOT EXISTS game_fts USING fts5(title, content='game', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2')",
+    "CREATE VIRTUAL TABLE IF NOT EXISTS game_trigram USING fts5(title, content='game', content_rowid='id', "
+    "tokenize='trigram')",
+    "CREATE TRIGGER IF NOT EXISTS game_search_insert AFTER INSERT ON game "
+    "WHEN NOT EXISTS (SELECT 1 FROM bulk_load) BEGIN "
+    "INSERT INTO game_fts(rowid, title) VALUES (new.id, new.title); "
+    "INSERT INTO game_trigram(rowid, title) VALUES (new.id, new.title); END",
+    "CREATE TRIGGER IF NOT EXISTS game_search_delete AFTER DELETE ON game BEGIN "
+    "INSERT INTO game_fts(game_fts, rowid, title) VALUES ('delete', old.id, old.title); "
+    "INSERT INTO game_trigram(game_trigram, rowid, title) VALUES ('delete', old.id, old.title); END",
+    "CREATE TRIGGER IF NOT EXISTS game_search_update AFTER UPDATE OF title ON game BEGIN "
+    "INSERT INTO game_fts(game_fts, rowid, title) VALUES ('delete', old.id, old.title); "
+    "INSERT INTO game_trigram(game_trigram, rowid, title) VALUES ('delete', old.id, old.title); "
+    "INSERT INTO game_fts(rowid, title) VALUES (new.id, new.title); "
+    "INSERT INTO game_trigram(rowid, title) VALUES (new.id, new.title); END",
+]
+
+
+def _migrate_to_v2(conn):
+    """
+    Adds the full-text title indexes used by search_games() and fills them from the existing games.
+    :param conn: An open connection inside a transaction.
+    :return: Nothing.
+    """
+    for statement in _SEARCH_DDL:
+        conn.exec_driver_sql(statement)
+    conn.exec_driver_sql("INSERT INTO game_fts(game_fts) VALUES ('rebuild')")
+    conn.exec_driver_sql("INSERT INTO game_trigram(game_trigram) VALUES ('rebuild')")
+
+
+def _migrate_to_v3(conn):
+    """
+    Replaces the plain title index with one that also covers played/completed status, used by list_games().
+    :param conn: An open connection inside a transaction.
+    :return: Nothing.
+    """
+    for index in Game.__table__.indexes:
+        index.create(conn, checkfirst=True)
+    conn.exec_driver_sql("DROP INDEX IF EXISTS ix_game_title")
+
+
+# Tables whose changes are counted by the catalog generation
+_COUNTED_TABLES = ("game", "platform", "genre", "game_platform_link", "game_genre_link")
+
+# catalog_state holds a single row whose generation is bumped by triggers on every change to the catalog, whichever
+# process or code path made it. Readers compare it with the generation they last saw to tell whether anything they
+# cached is stale. Bulk imports bump it once themselves instead of once per row.
+_STATE_DDL = [
+    "CREATE TABLE IF NOT EXISTS catalog_state (id INTEGER PRIMARY KEY CHECK (id = 0), generation INTEGER NOT NULL)",
+    "INSERT OR IGNORE INTO catalog_state (id, generation) VALUES (0, 0)",
+] + [
+    f"CREATE TRIGGER IF NOT EXISTS {table}_generation_{event.lower()} AFTER {event} ON {table} "
+    f"WHEN NOT EXISTS (SELECT 1 FROM bulk_load) BEGIN "
+    f"UPDATE catalog_state SET generation = generation + 1 WHERE id = 0; END"
+    for table in _COUNTED_TABLES for event in ("INSERT", "UPDATE", "DELETE")
+]
+
+
+def _migrate_to_v4(conn):
+    """
+    Adds the catalog generation counter used to invalidate cached query results.
+    :param conn: An open connection inside a transaction.
+    :return: Nothing.
+    """
+    for statement in _STATE_DDL:
+        conn.exec_driver_sql(statement)
+
+
+def _stats_triggers(link_table, link_column, stats_table):
+    """
+    Builds the triggers keeping the per platform/genre counts of one link table up to date.
+    :param link_table: Name of the game/platform or game/genre link table.
+    :param link_column: Name of the column in the link table referencing the platform/genre table.
+    :param stats_table: Name of the table holding the counts.
+    :return: A list of CREATE TRIGGER statements.
+    """
+    def status(game_id, column):
+        return f"COALESCE((SELECT {column} FROM game WHERE id = {game_id}), 0)"
+    add = (f"INSERT INTO {stats_table} ({link_column}, games, played, completed) "
+           f"VALUES (new.{link_column}, 1, {status('new.game_id', 'played')}, {status('new.game_id', 'completed')}) "
+           f"ON CONFLICT ({link_column}) DO UPDATE SET games = games + 1, played = played + excluded.played, "
+           f"completed = completed + excluded.completed; ")
+    remove = (f"UPDATE {stats_table} SET games = games - 1, played = played - {status('old.game_id', 'played')}, "
+              f"completed = completed - {status('old.game_id', 'completed')} WHERE {link_column} = old.{link_column}; ")
+    guard = "WHEN NOT EXISTS (SELECT 1 FROM bulk_load)"
+    return [
+        f"CREATE TRIGGER IF NOT EXISTS {link_table}_stats_insert AFTER INSERT ON {link_table} {guard} BEGIN {add}END",
+        f"CREATE TRIGGER IF NOT EXISTS {link_table}_stats_delete AFTER DELETE ON {link_table} {guard} "
+        f"BEGIN {remove}END",
+        f"CREATE TRIGGER IF NOT EXISTS {link_table}_stats_update AFTER UPDATE OF game_id, {link_column} "
+        f"ON {link_table} {guard} BEGIN {remove}{add}END",
+    ]
+
+
+def _linked_status(sign, row):
+    """
+    Builds the statements moving the played/completed counts of every platform/genre linked to a game.
+    :param sign: "+" to add the game's status, "-" to take it away.
+    :param row: "new" or "old", the trigger row holding the game.
+    :return: The statements, for the body of a trigger on game.
+    """
+    return "".join(
+        f"UPDATE {stats_table} SET played = played {sign} {row}.played, completed = completed {sign} {row}.completed "
+        f"WHERE {link_column} IN (SELECT {link_column} FROM {link_table} WHERE game_id = {row}.id); "
+        for link_table, link_column, stats_table in (("game_platform_link", "platform_id", "platform_stats"),
+                                                     ("game_genre_link", "genre_id", "genre_stats")))
+
+
+_STATUS_ADD = ("INSERT INTO status_stats (played, completed, games) VALUES (new.played, new.completed, 1) "
+               "ON CONFLICT (played, completed) DO UPDATE SET games = games + 1; ")
+_STATUS_REMOVE = "UPDATE status_stats SET games = games - 1 WHERE played = old.played AND completed = old.completed; "
+
+# Running counts of games per platform, per genre and per played/completed status, so statistics are read from a row
+# per platform/genre instead of scanning the catalog. Triggers keep them up to date whatever order games and their links
+# are written or deleted in: a link counts the game's status if the game exists, and a game moves the status counts of
+# links already present. As with the search indexes, imports pause the triggers and add their counts in one go.
+_STATS_DDL = [
+    "CREATE TABLE IF NOT EXISTS platform_stats (platform_id INTEGER PRIMARY KEY, games INTEGER NOT NULL, "
+    "played INTEGER NOT NULL, completed INTEGER NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS genre_stats (genre_id INTEGER PRIMARY KEY, games INTEGER NOT NULL, "
+    "played INTEGER NOT NULL, completed INTEGER NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS status_stats (played INTEGER NOT NULL, completed INTEGER NOT NULL, "
+    "games INTEGER NOT NULL, PRIMARY KEY (played, completed)) WITHOUT ROWID",
+    "CREATE TRIGGER IF NOT EXISTS game_stats_insert AFTER INSERT ON game WHEN NOT EXISTS (SELECT 1 FROM bulk_load) "
+    f"BEGIN {_STATUS_ADD}{_linked_status('+', 'new')}END",
+    "CREATE TRIGGER IF NOT EXISTS game_stats_delete AFTER DELETE ON game WHEN NOT EXISTS (SELECT 1 FROM bulk_load) "
+    f"BEGIN {_STATUS_REMOVE}{_linked_status('-', 'old')}END",
+    "CREATE TRIGGER IF NOT EXISTS game_stats_update AFTER UPDATE OF played, completed ON game "
+    "WHEN NOT EXISTS (SELECT 1 FROM bulk_load) "
+    f"BEGIN {_STATUS_REMOVE}{_STATUS_ADD}{_linked_status('-', 'old')}{_linked_status('+', 'new')}END",
+    "CREATE TRIGGER IF NOT EXISTS platform_stats_delete AFTER DELETE ON platform BEGIN "
+    "DELETE FROM platform_stats WHERE platform_id = old.id; END",
+    "CREATE TRIGGER IF NOT EXISTS genre_stats_delete AFTER DELETE ON genre BEGIN "
+    "DELETE FROM genre_stats WHERE genre_id = old.id; END",
+] + _stats_triggers("game_platform_link", "platform_id", "platform_stats") \
+  + _stats_triggers("game_genre_link", "genre_id", "genre_stats")
+
+
+def rebuild_stats(conn):
+    """
+    Recounts the statistics tables from scratch, reading the whole catalog once.
+    :param conn: An open connection inside a transaction.
+    :return: Nothing.
+    """
+    for link_table, link_column, stats_table in (("game_platform_link", "platform_id", "platform_stats"),
+                                                 ("game_genre_link", "genre_id", "genre_stats")):
+        conn.exec_driver_sql(f"DELETE FROM {stats_table}")
+        conn.exec_driver_sql(f"INSERT INTO {stats_table} ({link_column}, games, played, completed) "
+                             f"SELECT l.{link_column}, COUNT(*), COALESCE(SUM(g.played), 0), "
+                             f"COALESCE(SUM(g.completed), 0) FROM {link_table} l LEFT JOIN game g ON g.id = l.game_id "
+                             f"GROUP BY l.{link_column}")
+    conn.exec_driver_sql("DELETE FROM status_stats")
+    conn.exec_driver_sql("INSERT INTO status_stats (played, completed, games) "
+                         "SELECT played, completed, COUNT(*) FROM game GROUP BY played, completed")
+
+
+def _migrate_to_v5(conn):
+    """
+    Adds the statistics tables read by catalog_stats() and counts the existing games into them.
+    :param conn: An open connection inside a transaction.
+    :return: Nothing.
+    """
+    for statement in _STATS_DDL:
+        conn.exec_driver_sql(statement)
+    rebuild_stats(conn)
+
+
+# Columns recorded in the change journal for each table, key columns first
+JOURNAL_COLUMNS = {
+    "game": ["id", "title", "played", "completed"],
+    "platform": ["id", "platform_name"],
+    "genre": ["id", "genre_name"],
+    "game_platform_link": ["game_id", "platform_id"],
+    "game_genre_link": ["game_id", "genre_id"],
+}
+
+# Columns identifying a row of each table in the change journal
+JOURNAL_KEYS = {
+    "game": ["id"],
+    "platform": ["id"],
+    "genre": ["id"],
+    "game_platform_link": ["game_id", "platform_id"],
+    "game_genre_link": ["game_id", "genre_id"],
+}
+
+
+def _journal_row(table, row):
+    """
+    Builds the SQL expression recording a row of a table in the change journal.
+    :param table: Name of the table.
+    :param row: The row to record, e.g. "new" or "old" in a trigger.
+    :return: The json_object() expression.
+    """
+    return "json_object(" + ", ".join(f"'{column}', {row}.{column}" for column in JOURNAL_COLUMNS[table]) + ")"
+
+
+def _journal_values(table):
+    """
+    Builds the SQL expression recording a row of a table given as bound parameters in the change journal.
+    :param table: Name of the table.
+    :return: The json_object() expression, taking one parameter per JOURNAL_COLUMNS entry of the table.
+    """
+    return "json_object(" + ", ".join(f"'{column}', ?" for column in JOURNAL_COLUMNS[table]) + ")"
+
+
+def _journal_triggers(table):
+    """
+    Builds the triggers recording every insert, update and delete on a table in the change journal. Link rows are
+    never updated in place by the program, so an update of one is recorded as a delete followed by an insert.
+    :param table: Name of the table.
+    :return: A list of CREATE TRIGGER statements.
+    """
+    # Games and links written by an import are journaled by the importer a batch at a time
+    guard = "WHEN NOT EXISTS (SELECT 1 FROM bulk_load) " if table.endswith("link") or table == "game" else ""
+    journal = "INSERT INTO change_journal (table_name, operation, data) VALUES "
+    insert = f"{journal}('{table}', 'insert', {_journal_row(table, 'new')}); "
+    delete = f"{journal}('{table}', 'delete', {_journal_row(table, 'old')}); "
+    update = f"{journal}('{table}', 'update', {_journal_row(table, 'new')}); "
+    updated = "UPDATE"
+    if table.endswith("link"):
+        update = delete + insert
+        # The title copy is not journaled, each catalog keeps its own up to date
+        updated = f"UPDATE OF {', '.join(JOURNAL_COLUMNS[table])}"
+    return [f"CREATE TRIGGER IF NOT EXISTS {table}_journal_{event.split()[0].lower()} AFTER {event} ON {table} {guard}"
+            f"BEGIN {body}END" for event, body in (("INSERT", insert), (updated, update), ("DELETE", delete))]
+
+
+# The change journal records every change to the catalog tables, whichever code path or process made it, in order with
+# a sequence number that only ever grows. Replicas are kept up to date by replaying the changes after the last one they
+# applied, which sync_state remembers for each catalog they replicate. Every catalog gets a random catalog_id so
+# replicas can tell their sources apart.
+_JOURNAL_DDL = [
+    "CREATE TABLE IF NOT EXISTS change_journal (seq INTEGER PRIMARY KEY AUTOINCREMENT, "
+    "changed_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%fZ', 'now')), table_name TEXT NOT NULL, "
+    "operation TEXT NOT NULL, data TEXT NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS sync_state (source_id TEXT PRIMARY KEY, seq INTEGER NOT NULL)",
+] + [statement for table in JOURNAL_COLUMNS for statement in _journal_triggers(table)]
+
+
+def _migrate_to_v6(conn):
+    """
+    Adds the change journal, the replica positions and the catalog id. Changes made before the journal existed are not
+    in it, so existing catalogs are replicated starting from a full backup.
+    :param conn: An open connection inside a transaction.
+    :return: Nothing.
+    """
+    for statement in _JOURNAL_DDL:
+        conn.exec_driver_sql(statement)
+    columns = [row[1] for row in conn.exec_driver_sql("PRAGMA table_info(catalog_state)")]
+    if "catalog_id" not in columns:
+        conn.exec_driver_sql("ALTER TABLE catalog_state ADD COLUMN catalog_id TEXT")
+    conn.exec_driver_sql("UPDATE catalog_state SET catalog_id = lower(hex(randomblob(16))) WHERE catalog_id IS NULL")
+
+
+# Triggers keeping the title copied into each link equal to its game's title. Links written without the title (by the
+# ORM, by replaying a replica's journal or by an older version of the program) are given it from their game, and links
+# written before their game get it when the game arrives. The program's own writes copy the title in themselves.
+_LINK_TITLE_DDL = [
+    statement for link_table, link_column in (("game_platform_link", "platform_id"), ("game_genre_link", "genre_id"))
+    for statement in (
+        f"CREATE TRIGGER IF NOT EXISTS {link_table}_title_insert AFTER INSERT ON {link_table} "
+        f"WHEN new.title IS NULL BEGIN UPDATE {link_table} SET title = (SELECT title FROM game WHERE id = new.game_id) "
+        f"WHERE game_id = new.game_id AND {link_column} = new.{link_column}; END",
+        f"CREATE TRIGGER IF NOT EXISTS {link_table}_title_game_insert AFTER INSERT ON game "
+        f"WHEN NOT EXISTS (SELECT 1 FROM bulk_load) BEGIN "
+        f"UPDATE {link_table} SET title = new.title WHERE game_id = new.id; END",
+        f"CREATE TRIGGER IF NOT EXISTS {link_table}_title_game_update AFTER UPDATE OF title ON game BEGIN "
+        f"UPDATE {link_table} SET title = new.title WHERE game_id = new.id; END",
+    )
+]
+
+
+def _migrate_to_v7(conn):
+    """
+    Copies each game's title into its links and replaces the reverse link table indexes with ones ordered by title, so
+    listings grouped by platform/genre are read straight off an index. Link updates that only change the title copy are
+    left out of the statistics and the change journal.
+    :param conn: An open connection inside a transaction.
+    :return: Nothing.
+    """
+    for link_table, link_column, stats_table in (("game_platform_link", "platform_id", "platform_stats"),
+                                                 ("game_genre_link", "genre_id", "genre_stats")):
+        columns = [row[1] for row in conn.exec_driver_sql(f"PRAGMA table_info({link_table})")]
+        if "title" not in columns:
+            conn.exec_driver_sql(f"ALTER TABLE {link_table} ADD COLUMN title TEXT")
+        conn.exec_driver_sql(f"UPDATE {link_table} SET title = (SELECT title FROM game WHERE id = game_id) "
+                             f"WHERE title IS NULL")
+        conn.exec_driver_sql(f"DROP INDEX IF EXISTS ix_{link_table}_{link_column}")
+        conn.exec_driver_sql(f"DROP TRIGGER IF EXISTS {link_table}_stats_update")
+        conn.exec_driver_sql(f"DROP TRIGGER IF EXISTS {link_table}_journal_update")
+        for statement in _stats_triggers(link_table, link_column, stats_table) + _journal_triggers(link_table):
+            conn.exec_driver_sql(statement)
+    for index in gplink.indexes | gglink.indexes:
+        index.create(conn, checkfirst=True)
+    for statement in _LINK_TITLE_DDL:
+        conn.exec_driver_sql(statement)
+
+
+# replica_state remembers how far through the journal each replica made from this catalog is, as of its backup and then
+# its last sync, so journal entries every replica has applied can be pruned.
+_REPLICA_DDL = [
+    "CREATE TABLE IF NOT EXISTS replica_state (replica_id TEXT PRIMARY KEY, seq INTEGER NOT NULL)",
+]
+
+
+def _migrate_to_v8(conn):
+    """
+    Adds the positions of the replicas made from the catalog, used to prune the change journal. Replicas made before
+    are not known until they next sync.
+    :param conn: An open connection inside a transaction.
+    :return: Nothing.
+    """
+    for statement in _REPLICA_DDL:
+        conn.exec_driver_sql(statement)
+
+
+# Maps each schema version to the step that upgrades a catalog from the version before it
+_MIGRATIONS = {
+    1: _migrate_to_v1,
+    2: _migrate_to_v2,
+    3: _migrate_to_v3,
+    4: _migrate_to_v4,
+    5: _migrate_to_v5,
+    6: _migrate_to_v6,
+    7: _migrate_to_v7,
+    8: _migrate_to_v8,
+}
+
+
+def migrate(engine):
+    """
+    Upgrades the catalog to SCHEMA_VERSION in place by running every migration step newer than the version stored in
+    the database file. The version is only recorded once every step has finished and each step is safe to re-run, so an
+    interrupted upgrade is completed the next time the catalog is opened.
+    :param engine: The source of connections to the database.
+    :return: The schema version the catalog was at before migrating.
+    """
+    with engine.begin() as conn:
+        version = conn.exec_driver_sql("PRAGMA user_version").scalar()
+        if version > SCHEMA_VERSION:
+            raise RuntimeError(f"Catalog schema version {version} is newer than this program supports "
+                               f"({SCHEMA_VERSION}).")
+        for step in range(version + 1, SCHEMA_VERSION + 1):
+            _MIGRATIONS[step](conn)
+        if version != SCHEMA_VERSION:
+            conn.exec_driver_sql(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    return version
+
+
+# SQLite settings applied to every connection, by profile. "performance" uses write-ahead logging so readers never wait
+# on a writer, only syncs to disk at checkpoints (a power cut can lose the last commits but never corrupts the file),
+# keeps a 64MB page cache, memory maps up to 256MB of the file and keeps temporary tables/sorts in memory. "default"
+# leaves SQLite's own settings alone, for catalogs on network drives where WAL does not work. Catalogs are opened with
+# "default" unless "performance" is asked for: write-ahead logging keeps -wal/-shm files next to the catalog, so it can
+# no longer be copied as a single file, and once turned on it stays with the file.
+PROFILES = {
+    "default": {},
+    "performance": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -65536,
+        "mmap_size": 268435456,
+        "temp_store": "MEMORY",
+    },
+}
+
+DEFAULT_PROFILE = "default"
+
+# Number of connections kept open for reuse by each engine
+POOL_SIZE = 5
+
+
+def _apply_pragmas(pragmas):
+    """
+    Makes a listener that applies the given pragmas to each new database connection.
+    :param pragmas: Map of pragma name to value.
+    :return: The listener for the engine's connect event.
+    """
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name} = {value}")
+        cursor.close()
+    return on_connect
+
+
+def configure_connections(engine, profile=DEFAULT_PROFILE):
+    """
+    Applies the settings of a connection profile to every new connection of an engine. Raises ValueError for an
+    unknown profile.
+    :param engine: The source of connections to the database, a synchronous Engine.
+    :param profile: The name of the entry in PROFILES to configure connections with.
+    :return: Nothing.
+    """
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown connection profile '{profile}', expected one of: {', '.join(PROFILES)}")
+    event.listen(engine, "connect", _apply_pragmas(PROFILES[profile]))
+
+
+def connect(filepath, profile=DEFAULT_PROFILE):
     """
     Creates the engine, which is the source of all connections to the database, using the provided filepath. Then
-    creates/loads all metadata (e.g. Tables) in the database.
+    creates/loads all metadata (e.g. Tables) in the database and migrates catalogs created by older versions of the
+    program to the current schema. Both are skipped when the schema version stored in the file is already current, so
+    opening an existing catalog costs a single pragma read.
     :param filepath: The filepath to the database file.
+    :param profile: The name of the entry in PROFILES to configure connections with.
     :return: The engine.
     """
-    # Create engine
-    engine = create_engine("sqlite+pysqlite:///" + filepath, echo=False, future=True)
-    # Create all tables in the database
-    Base.metadata.create_all(engine)
+    # Create engine, keeping a pool of configured connections to reuse
+    engine = create_engine("sqlite+pysqlite:///" + filepath, echo=False, future=True, poolclass=QueuePool,
+                           pool_size=POOL_SIZE)
+    configure_connections(engine, profile)
+    with engine.connect() as conn:
+        version = conn.exec_driver_sql("PRAGMA user_version").scalar()
+    if version != SCHEMA_VERSION:
+        # Create all tables in the database
+        Base.metadata.create_all(engine)
+        # Bring older catalogs up to the current schema
+        migrate(engine)
     # Return engine to connect to database later
     return engine
 
 
+def generation(conn):
+    """
+    Reads the catalog generation, a counter that changes whenever anything in the catalog does.
+    :param conn: An open connection.
+    :return: The generation.
+    """
+    return conn.exec_driver_sql("SELECT generation FROM catalog_state WHERE id = 0").scalar()
+
+
+# Maximum number of result rows held by each catalog's query cache, 0 turns caching off
+CACHE_ROWS = 100000
+
+CacheStats = namedtuple("CacheStats", ["hits", "misses", "invalidations", "entries", "rows"])
+
+
+class QueryCache:
+    """
+    Read-through cache of query results for one catalog, keyed by the shape and parameters of the query. Entries are
+    evicted least recently used first once they hold more than max_rows rows in total, and are all dropped as soon as
+    the catalog generation moves on, so results are never served after the catalog has changed.
+    """
+
+    def __init__(self, max_rows=CACHE_ROWS):
+        self.max_rows = max_rows
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._entries = OrderedDict()
+        self._rows = 0
+        self._generation = None
+        self._lock = threading.Lock()
+
+    def _lookup(self, conn, key):
+        """
+        Drops every entry if the catalog has changed since they were stored, then looks up key. The generation is read
+        before the caller runs its query, so a result stored under it can only ever be newer than the generation.
+        :param conn: An open connection to the catalog.
+        :param key: The cache key.
+        :return: The cached rows, or None on a miss.
+        """
+        current = generation(conn)
+        with self._lock:
+            if current != self._generation:
+                if self._entries:
+                    self.invalidations += 1
+                self._entries.clear()
+                self._rows = 0
+                self._generation = current
+            rows = self._entries.get(key)
+            if rows is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return rows
+
+    def _store(self, key, rows, seen):
+        """
+        Stores the rows of a query, evicting the least recently used entries to stay within max_rows.
+        :param key: The cache key.
+        :param rows: The rows returned by the query.
+        :param seen: The generation read before the query ran.
+        :return: Nothing.
+        """
+        with self._lock:
+            if len(rows) > self.max_rows or seen != self._generation or key in self._entries:
+                return
+            self._entries[key] = rows
+            self._rows += len(rows)
+            while self._rows > self.max_rows:
+                _, evicted = self._entries.popitem(last=False)
+                self._rows -= len(evicted)
+
+    def fetch(self, engine, key, statement, parameters=None):
+        """
+        Returns the rows of a query, from the cache when it holds them and otherwise by running it.
+        :param engine: The source of connections to the database.
+        :param key: The cache key, which must identify the statement and its parameters.
+        :param statement: The query to run on a miss.
+        :param parameters: Parameters for the statement.
+        :return: A list of the rows.
+        """
+        with engine.connect() as conn:
+            return self.fetch_on(conn, key, statement, parameters)
+
+    def fetch_on(self, conn, key, statement, parameters=None):
+        """
+        Same as fetch(), but runs on a connection that is already open.
+        :param conn: An open connection to the catalog.
+        :param key: The cache key, which must identify the statement and its parameters.
+        :param statement: The query to run on a miss.
+        :param parameters: Parameters for the statement.
+        :return: A list of the rows.
+        """
+        rows = self._lookup(conn, key)
+        if rows is None:
+            seen = self._generation
+            rows = tuple(conn.execute(statement, parameters).all())
+            self._store(key, rows, seen)
+        return list(rows)
+
+    def stream(self, engine, key, statement, max_kept):
+        """
+        Streams the rows of a query, from the cache when it holds them and otherwise by running it. Rows streamed from
+        the database are only kept while there are no more than max_kept of them, so streaming a large result holds at
+        most a page of rows on top of what the driver fetches, and only results that fit in a page are cached.
+        :param engine: The source of connections to the database.
+        :param key: The cache key, which must identify the statement.
+        :param statement: The query to run on a miss.
+        :param max_kept: The most rows kept for the cache, e.g. the number fetched per round-trip.
+        :return: A generator of the rows.
+        """
+        with engine.connect() as conn:
+            rows = self._lookup(conn, key)
+            if rows is not None:
+                yield from rows
+                return
+            seen = self._generation
+            kept = []
+            for row in conn.execute(statement):
+                if kept is not None:
+                    kept.append(row)
+                    if len(kept) > min(max_kept, self.max_rows):
+                        kept = None
+                yield row
+        if kept is not None:
+            self._store(key, tuple(kept), seen)
+
+    def stats(self):
+        """
+        Reports how well the cache is doing.
+        :return: A CacheStats with the hit, miss and invalidation counts and the number of entries and rows held.
+        """
+        with self._lock:
+            return CacheStats(self.hits, self.misses, self.invalidations, len(self._entries), self._rows)
+
+    def clear(self):
+        """
+        Drops every entry, leaving the statistics alone.
+        :return: Nothing.
+        """
+        with self._lock:
+            self._entries.clear()
+            self._rows = 0
+
+
+# The query cache of each open catalog, dropped along with its engine
+_caches = weakref.WeakKeyDictionary()
+
+
+def query_cache(engine):
+    """
+    Gets the query cache of a catalog, creating it the first time it is asked for.
+    :param engine: The source of connections to the database.
+    :return: The QueryCache.
+    """
+    cache = _caches.get(engine)
+    if cache is None:
+        cache = _caches.setdefault(engine, QueryCache())
+    return cache
+
+
+# Statements taking longer than this many milliseconds are written to the slow query log
+SLOW_QUERY_MS = 100
+
+# Name of the logger slow statements are written to
+SLOW_QUERY_LOGGER = "Cataloger.slow_queries"
+
+StatementStats = namedtuple("StatementStats", ["statement", "count", "seconds", "max_seconds", "rows"])
+CommandStats = namedtuple("CommandStats", ["command", "count", "seconds", "statements", "statement_seconds"])
+
+# Name of the command the current thread/task is running, used to attribute statements to it
+_current_command = contextvars.ContextVar("current_command", default=None)
+
+
+class _CountingCursor:
+    """
+    Wraps the DBAPI cursor of a query, adding the rows fetched through it to the query's statement totals. Everything
+    else is passed through to the cursor.
+    """
+
+    def __init__(self, cursor, totals, lock):
+        self._cursor = cursor
+        self._totals = totals
+        self._lock = lock
+
+    def __getattr__(self, name):
+        """
+        Passes attributes other than the fetch methods through to the cursor.
+        :param name: The attribute's name.
+        :return: The cursor's attribute.
+        """
+        return getattr(self._cursor, name)
+
+    def _count(self, rows):
+        """
+        Adds fetched rows to the statement totals.
+        :param rows: The number of rows fetched.
+        :return: Nothing.
+        """
+        if rows:
+            with self._lock:
+                self._totals[3] += rows
+
+    def fetchone(self):
+        """
+        Fetches the next row, counting it.
+        :return: The row, or None once all rows have been fetched.
+        """
+        row = self._cursor.fetchone()
+        self._count(row is not None)
+        return row
+
+    def fetchmany(self, *args, **kwargs):
+        """
+        Fetches the next batch of rows, counting them. The arguments are those of the cursor's fetchmany.
+        :return: The rows.
+        """
+        rows = self._cursor.fetchmany(*args, **kwargs)
+        self._count(len(rows))
+        return rows
+
+    def fetchall(self):
+        """
+        Fetches the remaining rows, counting them.
+        :return: The rows.
+        """
+        rows = self._cursor.fetchall()
+        self._count(len(rows))
+        return rows
+
+
+class Instrumentation:
+    """
+    Times every statement run on an engine through its before/after_cursor_execute events, and totals them per SQL
+    statement and per command (Search, Display, AddGame, ...). Statements slower than slow_ms are written to the slow
+    query log, at WARNING level so they are shown even where logging has not been configured. Row counts are the rows
+    written, or for queries the rows fetched, which SQLite only knows once they are read. The slow query log is written
+    as soon as a statement has run, so it only gives row counts for writes.
+    """
+
+    def __init__(self, slow_ms=SLOW_QUERY_MS, slow_log=None):
+        self.slow_seconds = slow_ms / 1000
+        self.logger = logging.getLogger(SLOW_QUERY_LOGGER)
+        # The log file's handler is added to the shared logger for as long as this instrumentation is open
+        self._handler = None
+        if slow_log is not None:
+            self._handler = logging.FileHandler(slow_log, encoding="utf-8")
+            self._handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+            self.logger.addHandler(self._handler)
+        self._engine = None
+        self._statements = {}
+        self._commands = {}
+        self._lock = threading.Lock()
+
+    def attach(self, engine):
+        """
+        Starts timing the statements run on an engine.
+        :param engine: The source of connections to the database.
+        :return: Nothing.
+        """
+        event.listen(engine, "before_cursor_execute", self._before)
+        event.listen(engine, "after_cursor_execute", self._after)
+        _instruments[engine] = self
+        # A weak reference, so the instrumentation held for the engine does not keep it alive
+        self._engine = weakref.ref(engine)
+
+    def close(self):
+        """
+        Stops timing the statements run on the engine it is attached to and closes the slow query log file, if any.
+        :return: Nothing.
+        """
+        engine = self._engine() if self._engine is not None else None
+        if engine is not None:
+            event.remove(engine, "before_cursor_execute", self._before)
+            event.remove(engine, "after_cursor_execute", self._after)
+            if _instruments.get(engine) is self:
+                del _instruments[engine]
+        self._engine = None
+        if self._handler is not None:
+            self.logger.removeHandler(self._handler)
+            self._handler.close()
+            self._handler = None
+
+    def _before(self, conn, cursor, statement, parameters, context, executemany):
+        """
+        Notes when a statement starts, the arguments are those of the before_cursor_execute event.
+        """
+        conn.info.setdefault("statement_start", []).append(time.perf_counter())
+
+    def _after(self, conn, cursor, statement, parameters, context, executemany):
+        """
+        Adds a finished statement to the totals and logs it if it was slow, the arguments are those of the
+        after_cursor_execute event.
+        """
+        seconds = time.perf_counter() - conn.info["statement_start"].pop()
+        query = cursor.description is not None
+        rows = 0 if query else max(cursor.rowcount, 0)
+        command = _current_command.get()
+        with self._lock:
+            stats = self._statements.get(statement)
+            if stats is None:
+                stats = self._statements[statement] = [0, 0.0, 0.0, 0]
+            stats[0] += 1
+            stats[1] += seconds
+            stats[2] = max(stats[2], seconds)
+            stats[3] += rows
+            if command is not None:
+                totals = self._commands[command]
+                totals[2] += 1
+                totals[3] += seconds
+        if query and context is not None:
+            # The result reads its rows through the execution context's cursor, so count them there as they are fetched
+            context.cursor = _CountingCursor(cursor, stats, self._lock)
+        if seconds >= self.slow_seconds:
+            self.logger.warning("%.1fms command=%s rows=%s %s %r", seconds * 1000, command, "?" if query else rows,
+                                " ".join(statement.split()), parameters)
+
+    @contextlib.contextmanager
+    def command(self, name):
+        """
+        Times a command, attributing every statement run while it is in progress to it.
+        :param name: The name of the command.
+        :return: A context manager wrapping the command.
+        """
+        with self._lock:
+            self._commands.setdefault(name, [0, 0.0, 0, 0.0])
+        token = _current_command.set(name)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            _current_command.reset(token)
+            with self._lock:
+                totals = self._commands[name]
+                totals[0] += 1
+                totals[1] += seconds
+
+    def statement_stats(self):
+        """
+        Lists the totals of every distinct statement run, slowest in total first.
+        :return: A list of StatementStats.
+        """
+        with self._lock:
+            stats = [StatementStats(statement, *totals) for statement, totals in self._statements.items()]
+        return sorted(stats, key=lambda entry: entry.seconds, reverse=True)
+
+    def command_stats(self):
+        """
+        Lists the totals of every command run. Time spent on a command includes time waiting on prompts, the statement
+        time is only that spent in the database.
+        :return: A list of CommandStats.
+        """
+        with self._lock:
+            return [CommandStats(command, *totals) for command, totals in self._commands.items()]
+
+    def report(self, limit=10):
+        """
+        Summarizes the command and statement totals in an easy to read format.
+        :param limit: The number of statements to list.
+        :return: The summary.
+        """
+        lines = ["Command totals:"]
+        for entry in self.command_stats():
+            lines.append(f"  {entry.command:<12} {entry.count:>6} runs {entry.seconds * 1000:>10.1f}ms total "
+                         f"{entry.statements:>7} statements {entry.statement_seconds * 1000:>10.1f}ms in database")
+        lines.append(f"Slowest statements (of {len(self._statements)}):")
+        for entry in self.statement_stats()[:limit]:
+            sql = " ".join(entry.statement.split())
+            lines.append(f"  {entry.count:>6}x {entry.seconds * 1000:>10.1f}ms total "
+                         f"{entry.max_seconds * 1000:>8.1f}ms max {entry.rows:>7} rows  {sql[:100]}")
+        return "\n".join(lines)
+
+
+# The instrumentation attached to each catalog, if any
+_instruments = weakref.WeakKeyDictionary()
+
+
+def instrument(engine, slow_ms=SLOW_QUERY_MS, slow_log=None):
+    """
+    Attaches instrumentation to a catalog's engine, or returns the instrumentation already attached.
+    :param engine: The source of connections to the database.
+    :param slow_ms: Statements taking at least this many milliseconds are written to the slow query log.
+    :param slow_log: Optional filepath to append the slow query log to, otherwise it only goes to the
+    SLOW_QUERY_LOGGER logger.
+    :return: The Instrumentation, to be closed once the catalog is no longer timed.
+    """
+    instruments = _instruments.get(engine)
+    if instruments is None:
+        instruments = Instrumentation(slow_ms, slow_log)
+        instruments.attach(engine)
+    return instruments
+
+
+@contextlib.contextmanager
+def track(engine, command):
+    """
+    Times a command run against a catalog when it is instrumented, otherwise does nothing.
+    :param engine: The source of connections to the database.
+    :param command: The name of the command, or None to not track it.
+    :return: A context manager wrapping the command.
+    """
+    instruments = _instruments.get(engine)
+    if instruments is None or command is None:
+        yield
+        return
+    with instruments.command(command):
+        yield
+
+
+# Number of rows fetched from the database at a time when streaming the catalog
+BATCH_SIZE = 1000
+
+
+def game_summary_query(separator=", "):
+    """
+    Builds a query returning one row per game with its platforms and genres each concatenated into a single string.
+    The names are gathered by correlated sub-queries on the link table primary keys, so games with several platforms
+    and genres do not multiply into one row per combination.
+    :param separator: The string placed between platform/genre names.
+    :return: The select statement, ordered alphabetically by title.
+    """
+    platforms = (select(func.group_concat(Platform.platform_name, separator))
+                 .join(gplink, gplink.c.platform_id == Platform.id)
+                 .where(gplink.c.game_id == Game.id)
+                 .scalar_subquery())
+    genres = (select(func.group_concat(Genre.genre_name, separator))
+              .join(gglink, gglink.c.genre_id == Genre.id)
+              .where(gglink.c.game_id == Game.id)
+              .scalar_subquery())
+    return (select(Game.id, Game.title, Game.played, Game.completed, func.coalesce(platforms, "").label("platforms"),
+                   func.coalesce(genres, "").label("genres"))
+            .order_by(Game.title, Game.id))
+
+
+def iter_games(engine, batch_size=BATCH_SIZE, separator=", "):
+    """
+    Streams every game in the catalog, alphabetically by title, fetching batch_size rows from the database at a time.
+    :param engine: The source of connections to the database.
+    :param batch_size: The number of rows to fetch per round-trip.
+    :param separator: The string placed between platform/genre names.
+    :return: A generator of rows with id, title, played, completed, platforms and genres.
+    """
+    with engine.connect() as conn:
+        result = conn.execute(game_summary_query(separator).execution_options(yield_per=batch_size))
+        for row in result:
+            yield row
+
+
+def format_game(entry):
+    """
+    Formats a GameEntry into a single easy to read line.
+    :param entry: The entry to format.
+    :return: The formatted line.
+    """
+    return (f"Title: {entry.title} || Played: {entry.played} || Completed: {entry.completed} || "
+            f"Platform: {', '.join(entry.platforms)} || Genre: {', '.join(entry.genres)}")
+
+
 def display_all(engine):
     """
     Prints out all entries in the database in an easy to read format, while sorting all entries alphabetically
-    descending by title.
+    ascending by title. Entries are streamed from the database, so printing starts immediately and memory use does not
+    grow with the size of the catalog.
     :param engine: The source of connections to the database.
     :return: The engine.
     """
-    with Session(engine) as session:
-        all_games = session.execute(select(Game.title, Game.played, Game.completed, Platform.platform_name,
-                                           Genre.genre_name).join(Game.platforms).join(Game.genres)).all()
-        print("")
-        for row in all_games:
-            print(f"Title: {row.title} || Played: {row.played} || Completed: {row.completed} || "
-                  f"Platform: {row.platform_name} || Genre: {row.genre_name}")
+    print("")
+    for entry in CatalogService(engine).games():
+        print(format_game(entry))
     return
 
 
@@ -135,164 +1086,812 @@ def load_path():
     return filepath
 
 
-def add_game(engine):
+# Statements used by the non-interactive entry functions, built once so repeated calls in a batch only bind parameters
+_FIND_ENTRY = (select(Game.id).join(Game.platforms).join(Game.genres)
+               .where(and_(Game.title == bindparam("title"), Game.played == bindparam("played"),
+                           Game.completed == bindparam("completed")))
+               .where(and_(Platform.platform_name == bindparam("platform"), Genre.genre_name == bindparam("genre")))
+               .limit(1))
+_INSERT_GAME = Game.__table__.insert()
+# Sent as multi-row INSERTs with the new ids read back in the order the games were given
+_INSERT_GAMES = Game.__table__.insert().returning(Game.id, sort_by_parameter_order=True)
+_INSERT_PLATFORM_LINK = gplink.insert()
+_INSERT_GENRE_LINK = gglink.insert()
+_DELETE_PLATFORM_LINKS = gplink.delete().where(gplink.c.game_id == bindparam("game_id"))
+_DELETE_GENRE_LINKS = gglink.delete().where(gglink.c.game_id == bindparam("game_id"))
+_DELETE_GAME = Game.__table__.delete().where(Game.id == bindparam("game_id"))
+
+
+def find_entry_id(conn, title, played, completed, platform, genre):
     """
-    Adds a game to the database, as well as genre and platform entries if necessary.
-    :param engine: The source of connections to the database.
-    :return: The engine.
+    Looks up a full game entry, that is a game with the given title and status on the given platform with the given
+    genre.
+    :param conn: An open connection.
+    :param title: The game title.
+    :param played: The played status.
+    :param completed: The completed status.
+    :param platform: The platform name.
+    :param genre: The genre name.
+    :return: The id of the matching game, or None.
     """
-    with Session(engine) as session:
-        title = input("Enter game title:")
-        played = input("Has this title been played(True/False):")
-        if played == "True":
-            played = True
-        elif played == "False":
-            played = False
-        else:
-            print("Invalid submission for played status, returning to sub-menu.")
-            return
+    return conn.execute(_FIND_ENTRY, {"title": title, "played": played, "completed": completed, "platform": platform,
+                                      "genre": genre}).scalar()
 
-        completed = input("Has this title been completed(True/False):")
-        if completed == "True":
-            completed = True
-        elif completed == "False":
-            completed = False
-        else:
-            print("Invalid submission for completed status, returning to sub-menu.")
-            return
 
-        platform = input("Enter game platform:")
-        genre = input("Enter game genre:")
+_HAS_TITLE = select(exists().where(Game.title == bindparam("title")))
 
-        # Check if full game entry exists
-        game = session.execute(select(Game,Platform,Genre).join(Game.platforms).join(Game.genres)
-                               .where(and_(Game.title == title,Game.played == played, Game.completed == completed))
-                               .where(and_(Platform.platform_name == platform,Genre.genre_name == genre))).one_or_none()
 
-        if game is not None:
-            print("\nFull entry already exists.")
-            return
+def has_title(conn, title):
+    """
+    Checks whether any game has the given title.
+    :param conn: An open connection.
+    :param title: The game title.
+    :return: True if there is at least one game with the title.
+    """
+    return conn.execute(_HAS_TITLE, {"title": title}).scalar()
 
-        # Check if game with title exists
-        t = session.execute(select(Game).where(Game.title == title)).first()
 
-        if t is not None:
-            cont = input("\nEntry with this title exists.\nCreate new entry with this title(Y/N):")
-            if cont == "N":
-                print("\nExiting to sub-menu.")
-                return
-            elif cont == "Y":
-                print("Continuing with entry creation.")
-            else:
-                print("Invalid input.\n Exiting to sub-menu.")
-                return
-        new_game = Game(title=title, played=played, completed=completed)
-        session.add(new_game)
+def insert_game(conn, title, played, completed, platform, genre, names=None):
+    """
+    Inserts a game along with its platform and genre if they do not exist yet. Nothing is committed, so several games
+    can be inserted in one transaction.
+    :param conn: An open connection inside a transaction.
+    :param title: The game title.
+    :param played: The played status.
+    :param completed: The completed status.
+    :param platform: The platform name.
+    :param genre: The genre name.
+    :param names: Optional map of table name to a name to id map, shared between calls in the same transaction so names
+    already resolved are not looked up again.
+    :return: The id of the new game.
+    """
+    names = {} if names is None else names
+    game_id = conn.execute(_INSERT_GAME, {"title": title, "played": played, "completed": completed}) \
+        .inserted_primary_key[0]
+    platform_id = _intern_name(conn, Platform.__table__, "platform_name", names.setdefault("platform", {}), platform)
+    genre_id = _intern_name(conn, Genre.__table__, "genre_name", names.setdefault("genre", {}), genre)
+    conn.execute(_INSERT_PLATFORM_LINK, {"game_id": game_id, "platform_id": platform_id, "title": title})
+    conn.execute(_INSERT_GENRE_LINK, {"game_id": game_id, "genre_id": genre_id, "title": title})
+    return game_id
 
-        # Check if platform exists
-        p = session.execute(select(Platform).where(Platform.platform_name == platform)).first()
 
-        if p is None:
-            newPlat = Platform(platform_name=platform)
-            session.add(newPlat)
-            new_game.platforms.append(newPlat)
-        else:
-            new_game.platforms.append(p.Platform)
+def _intern_names(conn, table, name_column, ids, names):
+    """
+    Resolves many platform/genre names at once through the in-memory name to id map. Names not in the map are inserted
+    with INSERT OR IGNORE, which leaves names that are already in the database alone, and then read back together, so
+    resolving any number of names takes a couple of statements per BATCH_SIZE new names.
+    :param conn: An open connection inside a transaction.
+    :param table: Name of the platform/genre table.
+    :param name_column: The column holding the name.
+    :param ids: Map of names already resolved to their ids, updated in place.
+    :param names: The names to resolve, duplicates allowed.
+    :return: Nothing.
+    """
+    missing = [name for name in dict.fromkeys(names) if name not in ids]
+    for start in range(0, len(missing), BATCH_SIZE):
+        chunk = missing[start:start + BATCH_SIZE]
+        conn.exec_driver_sql(f"INSERT OR IGNORE INTO {table} ({name_column}) VALUES (?)", [(name,) for name in chunk])
+        rows = conn.exec_driver_sql(f"SELECT {name_column}, id FROM {table} "
+                                    f"WHERE {name_column} IN ({', '.join('?' * len(chunk))})", tuple(chunk))
+        ids.update(rows.all())
 
-        g = session.execute(select(Genre).where(Genre.genre_name == genre)).first()
 
-        if g is None:
-            newGenre = Genre(genre_name=genre)
-            session.add(newGenre)
-            new_game.genres.append(newGenre)
-        else:
-            new_game.genres.append(g.Genre)
+def insert_games(conn, entries, names=None):
+    """
+    Inserts many games, each with any number of platforms and genres, adding the platforms and genres that do not exist
+    yet. Names are resolved together, the games go in as multi-row INSERTs and the link rows with one executemany call
+    per link table, so a whole collection is entered in a handful of statements rather than several per game. Nothing is
+    committed.
+    :param conn: An open connection inside a transaction.
+    :param entries: An iterable of (title, played, completed, platforms, genres) tuples, as taken by import_records().
+    :param names: Optional map of table name to a name to id map, shared between calls in the same transaction so names
+    already resolved are not looked up again.
+    :return: A list of the ids of the new games, in the order given.
+    """
+    names = {} if names is None else names
+    platform_ids, genre_ids = names.setdefault("platform", {}), names.setdefault("genre", {})
+    # A name given twice for the same game is only linked once
+    entries = [(title, played, completed, list(dict.fromkeys(platforms)), list(dict.fromkeys(genres)))
+               for title, played, completed, platforms, genres in entries]
+    if not entries:
+        return []
+    _intern_names(conn, "platform", "platform_name", platform_ids, [name for entry in entries for name in entry[3]])
+    _intern_names(conn, "genre", "genre_name", genre_ids, [name for entry in entries for name in entry[4]])
+    game_ids = conn.execute(_INSERT_GAMES, [{"title": title, "played": played, "completed": completed}
+                                            for title, played, completed, _, _ in entries]).scalars().all()
+    platform_rows = [(game_id, platform_ids[name], entry[0]) for game_id, entry in zip(game_ids, entries)
+                     for name in entry[3]]
+    genre_rows = [(game_id, genre_ids[name], entry[0]) for game_id, entry in zip(game_ids, entries)
+                  for name in entry[4]]
+    if platform_rows:
+        conn.exec_driver_sql("INSERT INTO game_platform_link (game_id, platform_id, title) VALUES (?, ?, ?)",
+                             platform_rows)
+    if genre_rows:
+        conn.exec_driver_sql("INSERT INTO game_genre_link (game_id, genre_id, title) VALUES (?, ?, ?)", genre_rows)
+    return game_ids
 
-        # Commit changes to database
-        session.commit()
-        print("\nGame has been added.")
-    return engine
 
+# Values update_games() can change
+UPDATE_FIELDS = ("title", "played", "completed", "platforms", "genres")
 
-def remove_game(engine):
+# Matches the ids in a JSON array, so any number of games can be picked by a single bound parameter
+_IN_IDS = "IN (SELECT value FROM json_each(?))"
+
+# The platform/genre fields of update_games() with their table, name column, link table, link column and the
+# statistics table counting the links
+_LINK_FIELDS = (("platforms", "platform", "platform_name", "game_platform_link", "platform_id", "platform_stats"),
+                ("genres", "genre", "genre_name", "game_genre_link", "genre_id", "genre_stats"))
+
+
+def _move_link_stats(conn, sign, matched, link_table, link_column, stats_table):
     """
-    Removes a game from the database, but does not removes the genre or platform.
-    :param engine: The source of connections to the database.
-    :return: The engine.
+    Adds the counts of some games' links to the per platform/genre statistics, or takes them away, for links written
+    while the triggers are paused.
+    :param conn: An open connection inside a transaction.
+    :param sign: 1 to add the links' counts, -1 to take them away.
+    :param matched: The ids of the games as a JSON array string.
+    :param link_table: Name of the game/platform or game/genre link table.
+    :param link_column: Name of the column in the link table referencing the platform/genre table.
+    :param stats_table: Name of the table holding the counts.
+    :return: Nothing.
     """
-    with Session(engine) as session:
-        title = input("Enter game title:")
-        played = input("Has this title been played(True/False):")
-        if played == "True":
-            played = True
-        elif played == "False":
-            played = False
-        else:
-            print("Invalid submission for played status, returning to sub-menu.")
-            return
+    conn.exec_driver_sql(f"INSERT INTO {stats_table} ({link_column}, games, played, completed) "
+                         f"SELECT l.{link_column}, {sign} * COUNT(*), {sign} * SUM(g.played), "
+                         f"{sign} * SUM(g.completed) FROM {link_table} l JOIN game g ON g.id = l.game_id "
+                         f"WHERE l.game_id {_IN_IDS} GROUP BY l.{link_column} "
+                         f"ON CONFLICT ({link_column}) DO UPDATE SET games = games + excluded.games, "
+                         f"played = played + excluded.played, "
+                         f"completed = completed + excluded.completed", (matched,))
 
-        completed = input("Has this title been completed(True/False):")
-        if completed == "True":
-            completed = True
-        elif completed == "False":
-            completed = False
-        else:
-            print("Invalid submission for completed status, returning to sub-menu.")
-            return
 
-        platform = input("Enter game platform:")
-        genre = input("Enter game genre:")
+def _move_status_stats(conn, matched, status, link_fields):
+    """
+    Moves the counts of some games in the statistics tables to a new played/completed status, reading the games and
+    their links once. Must be called before the games are updated, for updates made while the triggers are paused.
+    :param conn: An open connection inside a transaction.
+    :param matched: The ids of the games as a JSON array string.
+    :param status: Map of "played" and/or "completed" to the new value.
+    :param link_fields: The _LINK_FIELDS entries of the links whose counts should move.
+    :return: Nothing.
+    """
+    new = {name: int(status[name]) if name in status else None for name in ("played", "completed")}
+    for _, _, _, link_table, link_column, stats_table in link_fields:
+        conn.exec_driver_sql(f"INSERT INTO {stats_table} ({link_column}, games, played, completed) "
+                             f"SELECT l.{link_column}, 0, SUM(COALESCE(?, g.played) - g.played), "
+                             f"SUM(COALESCE(?, g.completed) - g.completed) FROM {link_table} l "
+                             f"JOIN game g ON g.id = l.game_id WHERE l.game_id {_IN_IDS} GROUP BY l.{link_column} "
+                             f"ON CONFLICT ({link_column}) DO UPDATE SET played = played + excluded.played, "
+                             f"completed = completed + excluded.completed", (new["played"], new["completed"], matched))
+    moved = {}
+    for played, completed, games in conn.exec_driver_sql(f"SELECT played, completed, COUNT(*) FROM game "
+                                                         f"WHERE id {_IN_IDS} GROUP BY played, completed", (matched,)):
+        moved[(played, completed)] = moved.get((played, completed), 0) - games
+        key = (played if new["played"] is None else new["played"],
+               completed if new["completed"] is None else new["completed"])
+        moved[key] = moved.get(key, 0) + games
+    conn.exec_driver_sql("INSERT INTO status_stats (played, completed, games) VALUES (?, ?, ?) "
+                         "ON CONFLICT (played, completed) DO UPDATE SET games = games + excluded.games",
+                         [(played, completed, games) for (played, completed), games in moved.items()])
 
-        # check if full game entry exists
-        game = session.execute(select(Game, Platform, Genre).join(Game.platforms).join(Game.genres)
-                               .where(and_(Game.title == title, Game.played == played, Game.completed == completed))
-                               .where(
-            and_(Platform.platform_name == platform, Genre.genre_name == genre))).one_or_none()
 
-        if game is None:
-            print("\nEntry does not exist.")
-            return
-        print(f"Deleting:\nTitle {game.Game.title} || Played:{game.Game.played} || Completed:{game.Game.completed} || "
-              f"Platform:{game.Platform.platform_name} || Genre:{game.Genre.genre_name}")
-        session.delete(game.Game)
-        print("\nEntry deleted.")
-        session.commit()
+def update_games(conn, values, ids=None, title=None, platform=None, genre=None, played=None, completed=None,
+                 names=None):
+    """
+    Changes the title, status, platforms or genres of every game matching the given filters in place, keeping each
+    game's id. Title and status changes are a single UPDATE however many games match. New platforms/genres replace the
+    old ones with one DELETE of the links no longer wanted and one INSERT of the missing ones, so links the games
+    already have are left alone. As in an import, the statistics, change journal and generation triggers are paused
+    and brought up to date a statement at a time instead of once per row. Nothing is committed.
+    :param conn: An open connection inside a transaction.
+    :param values: Map of the UPDATE_FIELDS to change to their new values, platforms/genres as lists of names.
+    :param ids: Only update the games with these ids, or None for all.
+    :param title: Only update games with this title, or None for all.
+    :param platform: Only update games on this platform, or None for all.
+    :param genre: Only update games with this genre, or None for all.
+    :param played: Only update games with this played status, or None for all.
+    :param completed: Only update games with this completed status, or None for all.
+    :param names: Optional map of table name to a name to id map, shared between calls in the same transaction so names
+    already resolved are not looked up again.
+    :return: The number of games matching the filters.
+    """
+    unknown = set(values) - set(UPDATE_FIELDS)
+    if unknown:
+        raise ValueError(f"Cannot update {', '.join(sorted(unknown))}, expected any of: {', '.join(UPDATE_FIELDS)}")
+    if not values:
+        raise ValueError("Nothing to update")
+    conditions = _game_conditions(ids, title, platform, genre, played, completed, every=True)
+    game_values = {name: values[name] for name in ("title", "played", "completed") if name in values}
+    relinked = [fields for fields in _LINK_FIELDS if fields[0] in values]
+    journal = "INSERT INTO change_journal (table_name, operation, data) "
+    # Pausing the triggers also takes the write lock, so the games picked below are the ones updated
+    conn.exec_driver_sql("INSERT INTO bulk_load (active) VALUES (1)")
+    try:
+        # Changing links could change which games the filters match, so the games are picked once up front
+        matched_ids = conn.execute(select(Game.id).where(*conditions)).scalars().all()
+        if not matched_ids:
+            return 0
+        matched = json.dumps(matched_ids)
+        # Replaced links are counted again once written, the links kept only move to the new status
+        for _, _, _, link_table, link_column, stats_table in relinked:
+            _move_link_stats(conn, -1, matched, link_table, link_column, stats_table)
+        if "played" in values or "completed" in values:
+            _move_status_stats(conn, matched, values, [fields for fields in _LINK_FIELDS if fields not in relinked])
+        if game_values:
+            conn.execute(Game.__table__.update().where(Game.id.in_(_json_ids(matched))).values(game_values))
+            conn.exec_driver_sql(f"{journal}SELECT 'game', 'update', {_journal_row('game', 'game')} FROM game "
+                                 f"WHERE id {_IN_IDS} ORDER BY id", (matched,))
+        names = {} if names is None else names
+        for field, table, name_column, link_table, link_column, stats_table in relinked:
+            name_ids = names.setdefault(table, {})
+            _intern_names(conn, table, name_column, name_ids, values[field])
+            wanted = json.dumps([name_ids[name] for name in dict.fromkeys(values[field])])
+            unwanted = f"FROM {link_table} WHERE game_id {_IN_IDS} AND {link_column} NOT {_IN_IDS}"
+            conn.exec_driver_sql(f"{journal}SELECT '{link_table}', 'delete', {_journal_row(link_table, link_table)} "
+                                 f"{unwanted}", (matched, wanted))
+            conn.exec_driver_sql(f"DELETE {unwanted}", (matched, wanted))
+            # The missing links are journaled before they are written, while they can still be told apart
+            missing = (f"FROM json_each(?) AS games JOIN game ON game.id = games.value, json_each(?) AS names "
+                       f"WHERE NOT EXISTS (SELECT 1 FROM {link_table} WHERE game_id = game.id "
+                       f"AND {link_column} = names.value)")
+            conn.exec_driver_sql(f"{journal}SELECT '{link_table}', 'insert', json_object('game_id', game.id, "
+                                 f"'{link_column}', names.value) {missing}", (matched, wanted))
+            conn.exec_driver_sql(f"INSERT INTO {link_table} (game_id, {link_column}, title) "
+                                 f"SELECT game.id, names.value, game.title {missing}", (matched, wanted))
+            _move_link_stats(conn, 1, matched, link_table, link_column, stats_table)
+        conn.exec_driver_sql("UPDATE catalog_state SET generation = generation + 1 WHERE id = 0")
+    finally:
+        conn.exec_driver_sql("DELETE FROM bulk_load")
+    return len(matched_ids)
 
 
-def search_title(engine):
+def delete_game(conn, game_id):
     """
-    Take input for a title. Then searches if any entries with the given title exist. Should entries with the given title
-    exist all of them will be printed out in a easy to read format.
-    :param engine: The source of connections to the database.
+    Deletes a game and its links to platforms and genres, but not the platforms or genres themselves. Nothing is
+    committed.
+    :param conn: An open connection inside a transaction.
+    :param game_id: The id of the game.
     :return: Nothing.
     """
-    with Session(engine) as session:
-        title = input("\nEnter the title of the game you are searching for: ")
+    for statement in (_DELETE_PLATFORM_LINKS, _DELETE_GENRE_LINKS, _DELETE_GAME):
+        conn.execute(statement, {"game_id": game_id})
 
-        entry = session.execute(select(Game.title, Game.played, Game.completed, Platform.platform_name,
-                Genre.genre_name).join(Game.platforms).join(Game.genres).where(Game.title == title)).first()
 
-        if entry is None:
-            print("\nNo entries with that title.")
-            return
+def _input_entry():
+    """
+    Takes input for the title, status, platform and genre of a full game entry.
+    :return: A (title, played, completed, platform, genre) tuple, or None if a status was invalid.
+    """
+    title = input("Enter game title:")
+    played = input("Has this title been played(True/False):")
+    if played == "True":
+        played = True
+    elif played == "False":
+        played = False
+    else:
+        print("Invalid submission for played status, returning to sub-menu.")
+        return None
 
-        entries = session.execute(select(Game.title, Game.played, Game.completed, Platform.platform_name,
-                Genre.genre_name).join(Game.platforms).join(Game.genres).where(Game.title == title)).all()
+    completed = input("Has this title been completed(True/False):")
+    if completed == "True":
+        completed = True
+    elif completed == "False":
+        completed = False
+    else:
+        print("Invalid submission for completed status, returning to sub-menu.")
+        return None
 
-        print("")
-        for row in entries:
-            print(f"Title: {row.title} || Played: {row.played} || Completed: {row.completed} || "
-                  f"Platform: {row.platform_name} || Genre: {row.genre_name}")
-    return
+    platform = input("Enter game platform:")
+    genre = input("Enter game genre:")
+    return title, played, completed, platform, genre
 
 
-def initial_menu():
+def add_game(engine):
     """
-    Initial menu accessed by user allowing them to create a new game tracking log, load an old log, or quit the program.
-    :return: Nothing.
+    Adds a game to the database, as well as genre and platform entries if necessary.
+    :param engine: The source of connections to the database.
+    :return: The engine.
     """
-    print("\nTo start a new log enter the command: New")
-    print("To use an existing catalog enter the command: Load")
+    service = CatalogService(engine)
+    entry = _input_entry()
+    if entry is None:
+        return
+    title = entry[0]
+
+    # Check if full game entry exists
+    if service.find(*entry) is not None:
+        print("\nFull entry already exists.")
+        return
+
+    # Check if game with title exists
+    if service.has_title(title):
+        cont = input("\nEntry with this title exists.\nCreate new entry with this title(Y/N):")
+        if cont == "N":
+            print("\nExiting to sub-menu.")
+            return
+        elif cont == "Y":
+            print("Continuing with entry creation.")
+        else:
+            print("Invalid input.\n Exiting to sub-menu.")
+            return
+    try:
+        service.add(*entry)
+    except EntryExistsError:
+        print("\nFull entry already exists.")
+        return
+    print("\nGame has been added.")
+    return engine
+
+
+def remove_game(engine):
+    """
+    Removes a game from the database, but does not removes the genre or platform.
+    :param engine: The source of connections to the database.
+    :return: The engine.
+    """
+    entry = _input_entry()
+    if entry is None:
+        return
+    title, played, completed, platform, genre = entry
+    try:
+        CatalogService(engine).remove(*entry)
+    except EntryNotFoundError:
+        print("\nEntry does not exist.")
+        return
+    print(f"Deleted:\nTitle {title} || Played:{played} || Completed:{completed} || "
+          f"Platform:{platform} || Genre:{genre}")
+    print("\nEntry deleted.")
+
+
+def update_game(engine):
+    """
+    Changes the played/completed status of a game in place, keeping its platforms and genres.
+    :param engine: The source of connections to the database.
+    :return: Nothing.
+    """
+    entry = _input_entry()
+    if entry is None:
+        return
+    service = CatalogService(engine)
+    game_id = service.find(*entry)
+    if game_id is None:
+        print("\nEntry does not exist.")
+        return
+    values = {}
+    for name in ("played", "completed"):
+        status = _input_status(f"Has this title now been {name}(True/False, blank to keep):",
+                               f"Invalid submission, keeping the {name} status.")
+        if status is not None:
+            values[name] = status
+    if not values:
+        print("\nNothing to update.")
+        return
+    service.update(values, ids=[game_id])
+    print("\nEntry updated.")
+
+
+# Maximum number of results returned by a search
+SEARCH_LIMIT = 50
+
+# FTS5 query that never matches anything, used when a search produces no terms for an index
+_NO_MATCH = '""'
+
+# Shortest last word of a search that is matched as a prefix, shorter ones only match whole words. One or two letter
+# prefixes expand to a large part of the index.
+MIN_PREFIX = 3
+
+# Number of matches of each tier ranked per search. Only the first matches in id order are ranked, so a common word
+# costs the same as a rare one.
+SEARCH_CANDIDATES = 500
+
+# Matches are ranked exact title first, then titles containing every word (the last word as a prefix), then titles
+# sharing four letter runs with the words searched for. Within a tier the candidates are ordered by a score computed
+# from the title alone: shorter titles first, and in the typo tolerant tier titles sharing more runs first. FTS5's bm25
+# rank is not used, as it counts the matches of every term across the whole index before returning a single row. The
+# typo tolerant tier is only searched when no title contains the words as typed, since it is the most expensive.
+_SEARCH_HITS = text(
+    "SELECT id, MIN(tier) AS tier, MIN(score) AS score FROM ("
+    "SELECT id, 0 AS tier, 0 AS score FROM game WHERE title = :title "
+    "UNION ALL SELECT * FROM (SELECT game.id, 1, length(game.title) AS score FROM "
+    "(SELECT rowid FROM game_fts WHERE game_fts MATCH :words LIMIT :candidates) AS hits "
+    "JOIN game ON game.id = hits.rowid ORDER BY score LIMIT :limit) "
+    "UNION ALL SELECT * FROM (SELECT game.id, 2, length(game.title) - 1000 * "
+    "(SELECT count(*) FROM json_each(:runs) WHERE instr(lower(game.title), value)) AS score FROM "
+    "(SELECT rowid FROM game_trigram WHERE game_trigram MATCH "
+    "CASE WHEN EXISTS (SELECT 1 FROM game_fts WHERE game_fts MATCH :words) THEN :no_match ELSE :trigrams END "
+    "LIMIT :candidates) AS hits JOIN game ON game.id = hits.rowid ORDER BY score LIMIT :limit)"
+    ") GROUP BY id"
+).columns(id=Integer, tier=Integer, score=Integer)
+
+
+def _search_terms(query):
+    """
+    Builds the FTS5 match expressions for a search.
+    :param query: The text the user searched for.
+    :return: A (words, trigrams, runs) tuple: the match expressions, either of which is _NO_MATCH when the query is too
+    short to produce it, and the four letter runs of the words as a JSON array.
+    """
+    words = re.findall(r"\w+", query.lower())
+    if not words:
+        return _NO_MATCH, _NO_MATCH, "[]"
+    prefix = "*" if len(words[-1]) >= MIN_PREFIX else ""
+    word_match = " ".join([f'"{word}"' for word in words[:-1]] + [f'"{words[-1]}"{prefix}'])
+    # A four letter run is two overlapping trigrams, so a title has to share at least two trigrams in a row with a word
+    # to be a candidate, rather than any single common trigram
+    runs = dict.fromkeys(word[i:i + 4] for word in words for i in range(len(word) - 3))
+    run_match = " OR ".join(f'"{run}"' for run in runs) or _NO_MATCH
+    return word_match, run_match, json.dumps(list(runs))
+
+
+def search_query(query, limit=SEARCH_LIMIT, separator=", "):
+    """
+    Builds the single query behind search_games().
+    :param query: The text to search for.
+    :param limit: The maximum number of results to return.
+    :param separator: The string placed between platform/genre names.
+    :return: A (cache key, statement, parameters) tuple.
+    """
+    words, trigrams, runs = _search_terms(query)
+    hits = _SEARCH_HITS.subquery("hits")
+    statement = (game_summary_query(separator).join(hits, hits.c.id == Game.id).order_by(None)
+                 .order_by(hits.c.tier, hits.c.score, Game.title).limit(limit))
+    parameters = {"title": query.strip(), "words": words, "trigrams": trigrams, "runs": runs,
+                  "no_match": _NO_MATCH, "limit": limit, "candidates": max(limit, SEARCH_CANDIDATES)}
+    return ("search", query.strip(), limit, separator), statement, parameters
+
+
+def search_games(engine, query, limit=SEARCH_LIMIT, separator=", "):
+    """
+    Searches the catalog for games whose title matches the query exactly, by whole words/prefix, or approximately
+    (tolerating typos) through the full-text title indexes, all in a single query. The last word is only matched as a
+    prefix when it has at least MIN_PREFIX letters, and at most SEARCH_CANDIDATES matches of each kind are ranked.
+    :param engine: The source of connections to the database.
+    :param query: The text to search for.
+    :param limit: The maximum number of results to return.
+    :param separator: The string placed between platform/genre names.
+    :return: A list of rows like those from game_summary_query(), best match first.
+    """
+    return query_cache(engine).fetch(engine, *search_query(query, limit, separator))
+
+
+def search_title(engine):
+    """
+    Take input for a title. Then searches for entries whose title matches it exactly, by whole words or prefix, or
+    approximately. Should any entries match, all of them will be printed out in a easy to read format, best match first.
+    :param engine: The source of connections to the database.
+    :return: Nothing.
+    """
+    title = input("\nEnter the title of the game you are searching for: ")
+
+    entries = CatalogService(engine).search(title)
+
+    if not entries:
+        print("\nNo entries with that title.")
+        return
+
+    print("")
+    for entry in entries:
+        print(format_game(entry))
+    return
+
+
+# Number of games shown per page by the Sort command
+PAGE_SIZE = 25
+
+# Orders list_games() can sort by
+SORT_ORDERS = ("title", "platform", "genre")
+
+Page = namedtuple("Page", ["rows", "next_key"])
+
+
+def _group_columns(sort):
+    """
+    Looks up the table, name column and link table a grouped view is ordered by.
+    :param sort: "platform" or "genre".
+    :return: A (table, name column, link table, link column) tuple.
+    """
+    if sort == "platform":
+        return Platform, Platform.platform_name, gplink, gplink.c.platform_id
+    return Genre, Genre.genre_name, gglink, gglink.c.genre_id
+
+
+def _has_name(link, link_column, table, name_column, name, every=False):
+    """
+    Builds a condition that is true when the game is linked to the platform/genre with the given name. The check is a
+    single lookup on the link table primary key per game, or when every matching game is wanted, a read of the ids
+    linked to the platform/genre off the reverse link index, so the games that are not linked are never visited.
+    :param link: The link table.
+    :param link_column: The column in the link table referencing the platform/genre table.
+    :param table: The platform/genre class.
+    :param name_column: The column holding the platform/genre name.
+    :param name: The name to check for.
+    :param every: Whether every matching game is wanted, rather than the first few in some order.
+    :return: The condition.
+    """
+    name_id = select(table.id).where(name_column == name).scalar_subquery()
+    if every:
+        return Game.id.in_(select(link.c.game_id).where(link_column == name_id))
+    return exists().where(link.c.game_id == Game.id, link_column == name_id)
+
+
+def _json_ids(ids):
+    """
+    Builds a sub-query listing the ids in a JSON array, for IN conditions on any number of ids.
+    :param ids: The ids as a JSON array string.
+    :return: The select statement.
+    """
+    return select(column("value")).select_from(func.json_each(ids))
+
+
+def _game_conditions(ids=None, title=None, platform=None, genre=None, played=None, completed=None, every=False):
+    """
+    Builds the conditions picking the games matching every given filter.
+    :param ids: Only games with these ids, or None for all.
+    :param title: Only games with this title, or None for all.
+    :param platform: Only games on this platform, or None for all.
+    :param genre: Only games with this genre, or None for all.
+    :param played: Only games with this played status, or None for all.
+    :param completed: Only games with this completed status, or None for all.
+    :param every: Whether every matching game is wanted, see _has_name().
+    :return: A list of the conditions, empty when no filter is given.
+    """
+    conditions = []
+    if ids is not None:
+        conditions.append(Game.id.in_(_json_ids(json.dumps(list(ids)))))
+    if title is not None:
+        conditions.append(Game.title == title)
+    if played is not None:
+        conditions.append(Game.played == played)
+    if completed is not None:
+        conditions.append(Game.completed == completed)
+    if platform is not None:
+        conditions.append(_has_name(gplink, gplink.c.platform_id, Platform, Platform.platform_name, platform, every))
+    if genre is not None:
+        conditions.append(_has_name(gglink, gglink.c.genre_id, Genre, Genre.genre_name, genre, every))
+    return conditions
+
+
+def _page_key(sort, after):
+    """
+    Checks the next_key of a previous page against the sort order it is used with.
+    :param sort: One of SORT_ORDERS.
+    :param after: The key: a (title, id) pair when sorting by title, a (group, title, id) triple otherwise.
+    :return: The key as a tuple.
+    """
+    types = (str, int) if sort == "title" else (str, str, int)
+    if (not isinstance(after, (list, tuple)) or len(after) != len(types) or
+            not all(isinstance(value, kind) and not isinstance(value, bool) for value, kind in zip(after, types))):
+        shape = "(title, id)" if sort == "title" else "(group, title, id)"
+        raise ValueError(f"Invalid page key {after!r} for sort order '{sort}', expected {shape}")
+    return tuple(after)
+
+
+def list_query(sort="title", platform=None, genre=None, played=None, completed=None, after=None, page_size=PAGE_SIZE,
+               separator=", "):
+    """
+    Builds the query behind list_games(), which fetches one row more than the page size to tell whether there is a
+    next page.
+    :param sort: One of SORT_ORDERS.
+    :param platform: Only list games on this platform, or None for all.
+    :param genre: Only list games with this genre, or None for all.
+    :param played: Only list games with this played status, or None for all.
+    :param completed: Only list games with this completed status, or None for all.
+    :param after: The next_key of the previous page, or None for the first page.
+    :param page_size: The maximum number of rows on the page.
+    :param separator: The string placed between platform/genre names.
+    :return: A (cache key, statement) pair.
+    """
+    if sort not in SORT_ORDERS:
+        raise ValueError(f"Unknown sort order '{sort}', expected one of: {', '.join(SORT_ORDERS)}")
+    if page_size < 1:
+        raise ValueError(f"Invalid page size {page_size}, expected at least 1")
+    if after is not None:
+        after = _page_key(sort, after)
+    # A grouped listing filters on its own group name below
+    conditions = _game_conditions(platform=None if sort == "platform" else platform,
+                                  genre=None if sort == "genre" else genre, played=played, completed=completed)
+    # One extra row is fetched to tell whether there is a next page
+    limit = page_size + 1
+
+    if sort == "title":
+        statement = game_summary_query(separator).add_columns(null().label("group")).where(*conditions).limit(limit)
+        if after is not None:
+            statement = statement.where(tuple_(Game.title, Game.id) > tuple_(*after))
+    else:
+        table, name_column, link, link_column = _group_columns(sort)
+        name = platform if sort == "platform" else genre
+        if name is not None:
+            conditions.append(name_column == name)
+        # Each group is read off the reverse link index in title order, through the title copied into the links, and
+        # only the games on the page are looked up
+        base = (game_summary_query(separator).order_by(None).add_columns(name_column.label("group"))
+                .select_from(table).join(link, link_column == table.id).join(Game, Game.id == link.c.game_id)
+                .where(*conditions))
+        if after is None:
+            # Every name sorts at or after "", but the range has SQLite walk the groups in order off the name index even
+            # before ANALYZE has gathered statistics, rather than sort every link
+            statement = base.where(name_column >= "").order_by(name_column, link.c.title, link.c.game_id).limit(limit)
+        else:
+            # The rest of the group the previous page ended in, then the groups after it. Splitting the seek keeps
+            # each half a range scan of the link index instead of a scan from the start of the group.
+            group, title, game_id = after
+            current = (base.where(name_column == group, tuple_(link.c.title, link.c.game_id) > tuple_(title, game_id))
+                       .order_by(link.c.title, link.c.game_id).limit(limit).subquery())
+            following = (base.where(name_column > group).order_by(name_column, link.c.title, link.c.game_id)
+                         .limit(limit).subquery())
+            pages = union_all(select(current), select(following)).subquery()
+            statement = select(pages).order_by(pages.c.group, pages.c.title, pages.c.id).limit(limit)
+
+    return ("list", sort, platform, genre, played, completed, after, page_size, separator), statement
+
+
+def to_page(rows, sort, page_size):
+    """
+    Splits the rows fetched by a list_query() statement into a Page.
+    :param rows: The rows, which may include one more than the page size.
+    :param sort: The sort order the rows were listed in.
+    :param page_size: The maximum number of rows on the page.
+    :return: The Page.
+    """
+    if len(rows) <= page_size:
+        return Page(rows, None)
+    rows = rows[:page_size]
+    last = rows[-1]
+    next_key = (last.title, last.id) if sort == "title" else (last.group, last.title, last.id)
+    return Page(rows, next_key)
+
+
+def list_games(engine, sort="title", platform=None, genre=None, played=None, completed=None, after=None,
+               page_size=PAGE_SIZE, separator=", "):
+    """
+    Lists one page of the catalog sorted by title, or grouped by platform/genre name and then sorted by title, with
+    optional filters. Pages are found by seeking past the last key of the previous page (keyset pagination) rather than
+    with OFFSET, and every order is read straight off an index (grouped orders through the title copied into each link),
+    so every page costs the same however deep it is.
+    :param engine: The source of connections to the database.
+    :param sort: One of SORT_ORDERS. Grouped orders list a game once per platform/genre it has.
+    :param platform: Only list games on this platform, or None for all.
+    :param genre: Only list games with this genre, or None for all.
+    :param played: Only list games with this played status, or None for all.
+    :param completed: Only list games with this completed status, or None for all.
+    :param after: The next_key of the previous page, or None for the first page.
+    :param page_size: The maximum number of rows on the page.
+    :param separator: The string placed between platform/genre names.
+    :return: A Page of rows like those from game_summary_query() plus a group column holding the platform/genre name
+    (None when sorting by title), and the key to pass as after to get the next page (None on the last page).
+    """
+    key, statement = list_query(sort, platform, genre, played, completed, after, page_size, separator)
+    return to_page(query_cache(engine).fetch(engine, key, statement), sort, page_size)
+
+
+def _input_status(prompt, invalid="Invalid submission, not filtering on this status."):
+    """
+    Takes input for an optional played/completed filter.
+    :param prompt: The prompt shown to the user.
+    :param invalid: The message shown when the input is neither True, False nor blank.
+    :return: True, False or None when left blank. Anything else is reported and also treated as None.
+    """
+    status = input(prompt)
+    if status == "True":
+        return True
+    if status == "False":
+        return False
+    if status != "":
+        print(invalid)
+    return None
+
+
+def sort_games(engine):
+    """
+    Takes input for a sort order and filters, then prints the matching games one page at a time in an easy to read
+    format, grouped under platform/genre headings when sorting by platform or genre.
+    :param engine: The source of connections to the database.
+    :return: Nothing.
+    """
+    sort = input("\nSort by Title, Platform or Genre:").lower()
+    if sort not in SORT_ORDERS:
+        print("Invalid sort order, returning to sub-menu.")
+        return
+    platform = input("Only show games on platform (leave blank for all):") or None
+    genre = input("Only show games with genre (leave blank for all):") or None
+    played = _input_status("Only show games with played status True/False (leave blank for all):")
+    completed = _input_status("Only show games with completed status True/False (leave blank for all):")
+
+    service = CatalogService(engine)
+    page = service.page(sort, platform, genre, played, completed)
+    group = None
+    print("")
+    while True:
+        for entry in page.rows:
+            if entry.group is not None and entry.group != group:
+                group = entry.group
+                print(f"\n{sort.capitalize()}: {group}")
+            print(format_game(entry))
+        if page.next_key is None:
+            break
+        if input("\nPress Enter for the next page or enter Q to stop:") == "Q":
+            break
+        page = service.page(sort, platform, genre, played, completed, page.next_key)
+    if not page.rows and group is None:
+        print("No games match.")
+    return
+
+
+NameStats = namedtuple("NameStats", ["name", "games", "played", "completed"])
+
+CatalogStats = namedtuple("CatalogStats", ["games", "played", "completed", "backlog", "statuses", "platforms",
+                                           "genres"])
+
+_STATUS_STATS = text("SELECT played, completed, games FROM status_stats WHERE games > 0")
+_PLATFORM_STATS = text("SELECT p.platform_name, s.games, s.played, s.completed FROM platform_stats s "
+                       "JOIN platform p ON p.id = s.platform_id WHERE s.games > 0 ORDER BY p.platform_name")
+_GENRE_STATS = text("SELECT g.genre_name, s.games, s.played, s.completed FROM genre_stats s "
+                    "JOIN genre g ON g.id = s.genre_id WHERE s.games > 0 ORDER BY g.genre_name")
+
+
+def read_stats(conn):
+    """
+    Reads the catalog statistics from the statistics tables, at the cost of one row per platform, genre and status
+    rather than a scan of the catalog.
+    :param conn: An open connection to the catalog.
+    :return: A CatalogStats with the number of games, how many are played/completed, the backlog (games not yet
+    completed), a map of (played, completed) to the number of games, and lists of NameStats per platform and per genre.
+    """
+    cache = query_cache(conn.engine)
+    statuses = {(bool(played), bool(completed)): games
+                for played, completed, games in cache.fetch_on(conn, ("stats", "status"), _STATUS_STATS)}
+    platforms = [NameStats(*row) for row in cache.fetch_on(conn, ("stats", "platform"), _PLATFORM_STATS)]
+    genres = [NameStats(*row) for row in cache.fetch_on(conn, ("stats", "genre"), _GENRE_STATS)]
+    games = sum(statuses.values())
+    played = sum(count for (is_played, _), count in statuses.items() if is_played)
+    completed = sum(count for (_, is_completed), count in statuses.items() if is_completed)
+    return CatalogStats(games, played, completed, games - completed, statuses, platforms, genres)
+
+
+def catalog_stats(engine):
+    """
+    Reads the catalog statistics, see read_stats().
+    :param engine: The source of connections to the database.
+    :return: A CatalogStats.
+    """
+    with engine.connect() as conn:
+        return read_stats(conn)
+
+
+def _percent(part, whole):
+    """
+    Formats part of a whole as a whole percentage.
+    :param part: The part.
+    :param whole: The whole.
+    :return: The percentage, e.g. "42%".
+    """
+    return f"{100 * part // whole if whole else 0}%"
+
+
+def show_stats(engine):
+    """
+    Prints how many games are played and completed overall, the backlog, and the counts and completion rate on each
+    platform and in each genre.
+    :param engine: The source of connections to the database.
+    :return: Nothing.
+    """
+    stats = CatalogService(engine).stats()
+    print(f"\nGames: {stats.games} || Played: {stats.played} ({_percent(stats.played, stats.games)}) || "
+          f"Completed: {stats.completed} ({_percent(stats.completed, stats.games)}) || Backlog: {stats.backlog}")
+    for heading, rows in (("Platform", stats.platforms), ("Genre", stats.genres)):
+        print(f"\nBy {heading.lower()}:")
+        for row in rows:
+            print(f"{heading}: {row.name} || Games: {row.games} || Played: {row.played} || "
+                  f"Completed: {row.completed} ({_percent(row.completed, row.games)})")
+    return
+
+
+def initial_menu():
+    """
+    Initial menu accessed by user allowing them to create a new game tracking log, load an old log, or quit the program.
+    :return: Nothing.
+    """
+    print("\nTo start a new log enter the command: New")
+    print("To use an existing catalog enter the command: Load")
     print("To quit the program enter the command: Quit\n")
     cmd = input("Enter Command:")
     while cmd != "Quit":
@@ -334,90 +1933,897 @@ def initial_menu():
     return
 
 
-def sub_menu(engine):
+# File formats understood by import_catalog(), keyed by file extension
+FILE_FORMATS = {".csv": "csv", ".json": "json", ".jsonl": "jsonl", ".ndjson": "jsonl"}
+
+# Separator between names in the platforms/genres columns of CSV files. A separator or escape character that is part of
+# a name is written with NAME_ESCAPE in front of it, so names containing it survive an export and import.
+NAME_SEPARATOR = ";"
+NAME_ESCAPE = "\\"
+
+ImportReport = namedtuple("ImportReport", ["games", "platforms", "genres", "seconds"])
+
+
+def file_format(filepath):
     """
-    Sub-menu accessed by user allowing them to search for a game by title, display stored games sorted in different
-    manners, add a game to the catalog, remove a game from the catalog, display all games in the database (sorted
-    alphabetically).
-    :param engine: The source of connections ot the database.
-    :return: Nothing
+    Works out the format of a catalog data file from its extension, ignoring a trailing .gz.
+    :param filepath: The filepath to the data file.
+    :return: One of "csv", "json" or "jsonl".
+    """
+    name = filepath[:-3] if filepath.lower().endswith(".gz") else filepath
+    extension = os.path.splitext(name)[1].lower()
+    if extension not in FILE_FORMATS:
+        raise ValueError(f"Unsupported file type '{extension}', expected one of: {', '.join(FILE_FORMATS)}")
+    return FILE_FORMATS[extension]
+
+
+def open_text(filepath, mode="r"):
+    """
+    Opens a data file in text mode, transparently (de)compressing it when the name ends in .gz.
+    :param filepath: The filepath to the data file.
+    :param mode: "r" to read or "w" to write.
+    :return: The open file object.
+    """
+    if filepath.lower().endswith(".gz"):
+        return gzip.open(filepath, mode + "t", encoding="utf-8", newline="")
+    return open(filepath, mode, encoding="utf-8", newline="")
+
+
+def _parse_bool(value, field, line):
+    """
+    Converts a played/completed value read from a data file to a bool.
+    :param value: The value read from the file.
+    :param field: The name of the field, used in the error message.
+    :param line: The line/record number, used in the error message.
+    :return: The bool.
+    """
+    if isinstance(value, bool):
+        return value
+    # A JSON null is taken as the field not being given
+    if value is None:
+        return False
+    text = str(value).strip().lower()
+    if text in ("true", "1", "yes", "y"):
+        return True
+    if text in ("false", "0", "no", "n", ""):
+        return False
+    raise ValueError(f"Record {line}: invalid value '{value}' for {field}")
+
+
+def join_names(names):
+    """
+    Joins platform/genre names into one CSV column, escaping separators within names.
+    :param names: The names.
+    :return: The names separated by NAME_SEPARATOR.
+    """
+    return NAME_SEPARATOR.join(name.replace(NAME_ESCAPE, NAME_ESCAPE * 2).replace(NAME_SEPARATOR,
+                                                                                 NAME_ESCAPE + NAME_SEPARATOR)
+                               for name in names)
+
+
+def split_names(value):
+    """
+    Splits a CSV column of platform/genre names written by join_names(). A NAME_ESCAPE in front of anything but a
+    separator or another escape is kept as it is, so files written by hand with backslashes in names read as before.
+    :param value: The column.
+    :return: A list of the names.
+    """
+    if NAME_ESCAPE not in value:
+        return value.split(NAME_SEPARATOR)
+    names, name, escaped = [], [], False
+    for char in value:
+        if escaped:
+            name.append(char if char in (NAME_SEPARATOR, NAME_ESCAPE) else NAME_ESCAPE + char)
+            escaped = False
+        elif char == NAME_ESCAPE:
+            escaped = True
+        elif char == NAME_SEPARATOR:
+            names.append("".join(name))
+            name = []
+        else:
+            name.append(char)
+    if escaped:
+        name.append(NAME_ESCAPE)
+    names.append("".join(name))
+    return names
+
+
+def _parse_names(record, plural, singular, line):
+    """
+    Reads the platform/genre names of a record, accepting either a list or a separated string under the plural or
+    singular key.
+    :param record: The record read from the data file.
+    :param plural: Key holding several names (e.g. "platforms").
+    :param singular: Key holding one name (e.g. "platform").
+    :param line: The line/record number, used in the error message.
+    :return: A list of unique, stripped names in the order they were given.
+    """
+    value = record.get(plural)
+    if value is None:
+        value = record.get(singular)
+    if value is None:
+        return []
+    if isinstance(value, str):
+        value = split_names(value)
+    elif not isinstance(value, list) or not all(isinstance(name, str) for name in value):
+        raise ValueError(f"Record {line}: invalid value {json.dumps(value)} for {plural}, expected a list of names")
+    return list(dict.fromkeys(name.strip() for name in value if name and name.strip()))
+
+
+def read_records(filepath, fmt=None):
+    """
+    Streams the games in a CSV/JSON/JSONL data file as normalized records. CSV and JSONL files are read one line at a
+    time, JSON files must hold a single array and are parsed as a whole.
+    :param filepath: The filepath to the data file.
+    :param fmt: The file format, worked out from the extension when not given.
+    :return: A generator of (title, played, completed, platforms, genres) tuples.
+    """
+    fmt = fmt or file_format(filepath)
+    with open_text(filepath) as file:
+        if fmt == "csv":
+            records = csv.DictReader(file)
+        elif fmt == "jsonl":
+            records = (json.loads(line) for line in file if line.strip())
+        else:
+            records = json.load(file)
+        for line, record in enumerate(records, start=1):
+            if not isinstance(record, dict):
+                raise ValueError(f"Record {line}: expected an object with a title, got {json.dumps(record)}")
+            # csv.DictReader fills the columns missing from a short row with None
+            if fmt == "csv" and None in record.values():
+                missing = [field for field, value in record.items() if value is None]
+                raise ValueError(f"Record {line}: missing {', '.join(missing)}, the row is shorter than the header")
+            title = record.get("title") or ""
+            if not isinstance(title, str) or not title.strip():
+                raise ValueError(f"Record {line}: missing title")
+            yield (title.strip(), _parse_bool(record.get("played", False), "played", line),
+                   _parse_bool(record.get("completed", False), "completed", line),
+                   _parse_names(record, "platforms", "platform", line), _parse_names(record, "genres", "genre", line))
+
+
+def _intern_name(conn, table, name_column, ids, name):
+    """
+    Looks a platform/genre name up in the in-memory name to id map, falling back to the database and inserting it there
+    the first time it is seen.
+    :param conn: An open connection inside a transaction.
+    :param table: The platform/genre table.
+    :param name_column: The column holding the name.
+    :param ids: Map of names already resolved to their ids, updated in place.
+    :param name: The name to look up.
+    :return: The id of the name.
+    """
+    name_id = ids.get(name)
+    if name_id is None:
+        name_id = conn.execute(select(table.c.id).where(table.c[name_column] == name)).scalar()
+        if name_id is None:
+            name_id = conn.execute(table.insert().values({name_column: name})).inserted_primary_key[0]
+        ids[name] = name_id
+    return name_id
+
+
+def import_records(engine, records, batch_size=BATCH_SIZE):
+    """
+    Bulk loads games into the catalog inside a single transaction. Platform and genre names are resolved through
+    in-memory maps loaded once up front, and games and link rows are written with batched executemany calls instead of
+    one round-trip per row.
+    :param engine: The source of connections to the database.
+    :param records: An iterable of (title, played, completed, platforms, genres) tuples, as made by read_records().
+    :param batch_size: The number of games written per executemany call.
+    :return: An ImportReport with the number of games, new platforms and new genres added and the time taken.
+    """
+    start = time.perf_counter()
+    games = 0
+    with engine.begin() as conn:
+        # Take the write lock before reading the highest id, so no other connection can add games before the import
+        # writes the ids it hands out below
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+        # Leave search indexing to _write_batch() for the rest of this transaction
+        conn.exec_driver_sql("INSERT INTO bulk_load (active) VALUES (1)")
+        platform_ids = dict(conn.execute(select(Platform.platform_name, Platform.id)).all())
+        genre_ids = dict(conn.execute(select(Genre.genre_name, Genre.id)).all())
+        known_platforms = len(platform_ids)
+        known_genres = len(genre_ids)
+        # Ids are handed out here so link rows can be written without reading each new game id back
+        next_id = (conn.execute(select(func.max(Game.id))).scalar() or 0) + 1
+        game_rows, platform_rows, genre_rows = [], [], []
+        # Statistics of the imported games, added to the statistics tables once at the end
+        platform_counts, genre_counts, status_counts = {}, {}, {}
+        for title, played, completed, platforms, genres in records:
+            game_rows.append((next_id, title, played, completed))
+            _count(status_counts, (played, completed), played, completed)
+            for name in platforms:
+                platform_id = _intern_name(conn, Platform.__table__, "platform_name", platform_ids, name)
+                platform_rows.append((next_id, platform_id, title))
+                _count(platform_counts, platform_id, played, completed)
+            for name in genres:
+                genre_id = _intern_name(conn, Genre.__table__, "genre_name", genre_ids, name)
+                genre_rows.append((next_id, genre_id, title))
+                _count(genre_counts, genre_id, played, completed)
+            next_id += 1
+            if len(game_rows) >= batch_size:
+                _write_batch(conn, game_rows, platform_rows, genre_rows)
+                games += len(game_rows)
+                game_rows, platform_rows, genre_rows = [], [], []
+        if game_rows:
+            _write_batch(conn, game_rows, platform_rows, genre_rows)
+            games += len(game_rows)
+        _write_stats(conn, platform_counts, genre_counts, status_counts)
+        conn.exec_driver_sql("UPDATE catalog_state SET generation = generation + 1 WHERE id = 0")
+        conn.exec_driver_sql("DELETE FROM bulk_load")
+    return ImportReport(games, len(platform_ids) - known_platforms, len(genre_ids) - known_genres,
+                        time.perf_counter() - start)
+
+
+def _write_batch(conn, game_rows, platform_rows, genre_rows):
+    """
+    Writes one batch of games, their search index entries, their link rows and their change journal entries with a
+    driver level executemany call per table, skipping the per-row parameter processing done for ORM/Core statements.
+    :param conn: An open connection inside a transaction.
+    :param game_rows: (id, title, played, completed) tuples for the game table.
+    :param platform_rows: (game_id, platform_id, title) tuples for the game/platform link table.
+    :param genre_rows: (game_id, genre_id, title) tuples for the game/genre link table.
+    :return: Nothing.
+    """
+    conn.exec_driver_sql("INSERT INTO game (id, title, played, completed) VALUES (?, ?, ?, ?)", game_rows)
+    titles = [(game_id, title) for game_id, title, _, _ in game_rows]
+    conn.exec_driver_sql("INSERT INTO game_fts (rowid, title) VALUES (?, ?)", titles)
+    conn.exec_driver_sql("INSERT INTO game_trigram (rowid, title) VALUES (?, ?)", titles)
+    if platform_rows:
+        conn.exec_driver_sql("INSERT INTO game_platform_link (game_id, platform_id, title) VALUES (?, ?, ?)",
+                             platform_rows)
+    if genre_rows:
+        conn.exec_driver_sql("INSERT INTO game_genre_link (game_id, genre_id, title) VALUES (?, ?, ?)", genre_rows)
+    # The rows written are journaled as given, so nothing else already in the tables can be picked up with them
+    for table, rows in (("game", game_rows), ("game_platform_link", platform_rows), ("game_genre_link", genre_rows)):
+        if rows:
+            width = len(JOURNAL_COLUMNS[table])
+            conn.exec_driver_sql(f"INSERT INTO change_journal (table_name, operation, data) "
+                                 f"VALUES ('{table}', 'insert', {_journal_values(table)})",
+                                 [row[:width] for row in rows])
+
+
+def _count(counts, key, played, completed):
+    """
+    Counts a game towards the statistics gathered by an import.
+    :param counts: Map of key to [games, played, completed] counts, updated in place.
+    :param key: The platform/genre id or (played, completed) status the game counts towards.
+    :param played: The played status of the game.
+    :param completed: The completed status of the game.
+    :return: Nothing.
+    """
+    totals = counts.get(key)
+    if totals is None:
+        totals = counts[key] = [0, 0, 0]
+    totals[0] += 1
+    totals[1] += played
+    totals[2] += completed
+
+
+def _write_stats(conn, platform_counts, genre_counts, status_counts):
+    """
+    Adds the statistics gathered by an import to the statistics tables, which the paused triggers did not update.
+    :param conn: An open connection inside a transaction.
+    :param platform_counts: Map of platform id to [games, played, completed] counts.
+    :param genre_counts: Map of genre id to [games, played, completed] counts.
+    :param status_counts: Map of (played, completed) to [games, played, completed] counts.
+    :return: Nothing.
+    """
+    for stats_table, key_column, counts in (("platform_stats", "platform_id", platform_counts),
+                                            ("genre_stats", "genre_id", genre_counts)):
+        if counts:
+            conn.exec_driver_sql(f"INSERT INTO {stats_table} ({key_column}, games, played, completed) "
+                                 f"VALUES (?, ?, ?, ?) ON CONFLICT ({key_column}) DO UPDATE SET "
+                                 f"games = games + excluded.games, played = played + excluded.played, "
+                                 f"completed = completed + excluded.completed",
+                                 [(key, *totals) for key, totals in counts.items()])
+    if status_counts:
+        conn.exec_driver_sql("INSERT INTO status_stats (played, completed, games) VALUES (?, ?, ?) "
+                             "ON CONFLICT (played, completed) DO UPDATE SET games = games + excluded.games",
+                             [(played, completed, totals[0]) for (played, completed), totals in status_counts.items()])
+
+
+def import_catalog(engine, filepath, fmt=None, batch_size=BATCH_SIZE):
+    """
+    Bulk loads every game in a CSV/JSON/JSONL data file (optionally gzip compressed) into the catalog. CSV files need a
+    header row with title, played, completed, platforms and genres columns, with several names in a column separated by
+    NAME_SEPARATOR, see join_names(). JSON/JSONL records use the same keys and may give platforms/genres as lists.
+    :param engine: The source of connections to the database.
+    :param filepath: The filepath to the data file.
+    :param fmt: The file format, worked out from the extension when not given.
+    :param batch_size: The number of games written per executemany call.
+    :return: An ImportReport for the import.
+    """
+    return import_records(engine, read_records(filepath, fmt), batch_size)
+
+
+def import_file(engine):
+    """
+    Takes input for the filepath of a data file, then bulk imports its games into the catalog and reports how fast the
+    import ran.
+    :param engine: The source of connections to the database.
+    :return: Nothing.
+    """
+    filepath = input("\nEnter the path to the CSV/JSON/JSONL file to import:")
+    if not os.path.isfile(filepath):
+        print("\nFile does not exist.")
+        return
+    try:
+        report = CatalogService(engine).import_file(filepath)
+    except (ValueError, KeyError) as error:
+        print(f"\nImport failed, no games were added: {error}")
+        return
+    rate = report.games / report.seconds if report.seconds else 0
+    print(f"\nImported {report.games} games ({report.platforms} new platforms, {report.genres} new genres) in "
+          f"{report.seconds:.2f} seconds ({rate:.0f} games/sec).")
+    return
+
+
+ExportReport = namedtuple("ExportReport", ["games", "seconds"])
+
+# Column order of exported files, matching what import_catalog() reads
+EXPORT_FIELDS = ["title", "played", "completed", "platforms", "genres"]
+
+
+def export_records(engine, batch_size=BATCH_SIZE):
+    """
+    Streams every game in the catalog as a record ready to be written to a data file, with platform/genre names as
+    lists.
+    :param engine: The source of connections to the database.
+    :param batch_size: The number of rows to fetch per round-trip.
+    :return: A generator of dicts keyed by EXPORT_FIELDS.
+    """
+    for row in iter_games(engine, batch_size, ENTRY_SEPARATOR):
+        entry = to_entry(row)
+        yield {"title": entry.title, "played": entry.played, "completed": entry.completed,
+               "platforms": entry.platforms, "genres": entry.genres}
+
+
+def _csv_record(record):
+    """
+    Converts an exported record to its CSV form, with platform/genre names joined by join_names().
+    :param record: A record from export_records().
+    :return: The record with platforms/genres as strings.
+    """
+    return dict(record, platforms=join_names(record["platforms"]), genres=join_names(record["genres"]))
+
+
+def _json_record(record):
+    """
+    Converts an exported record to its JSON form.
+    :param record: A record from export_records().
+    :return: The record as a JSON string.
+    """
+    return json.dumps(record, ensure_ascii=False)
+
+
+def export_catalog(engine, filepath, fmt=None, batch_size=BATCH_SIZE):
+    """
+    Streams every game in the catalog to a CSV/JSON/JSONL data file, gzip compressed when the name ends in .gz. Rows are
+    read batch_size at a time and written as they arrive, so memory use stays flat whatever the size of the catalog.
+    The files written can be loaded back with import_catalog().
+    :param engine: The source of connections to the database.
+    :param filepath: The filepath to write to, any existing file is overwritten.
+    :param fmt: The file format, worked out from the extension when not given.
+    :param batch_size: The number of rows to fetch per round-trip.
+    :return: An ExportReport with the number of games written and the time taken.
+    """
+    start = time.perf_counter()
+    fmt = fmt or file_format(filepath)
+    games = 0
+    with open_text(filepath, "w") as file:
+        if fmt == "csv":
+            writer = csv.DictWriter(file, EXPORT_FIELDS)
+            writer.writeheader()
+            for record in export_records(engine, batch_size):
+                writer.writerow(_csv_record(record))
+                games += 1
+        elif fmt == "jsonl":
+            for record in export_records(engine, batch_size):
+                file.write(_json_record(record) + "\n")
+                games += 1
+        else:
+            file.write("[")
+            for record in export_records(engine, batch_size):
+                file.write(("," if games else "") + "\n" + _json_record(record))
+                games += 1
+            file.write("\n]\n")
+    return ExportReport(games, time.perf_counter() - start)
+
+
+def export_file(engine):
+    """
+    Takes input for the filepath of a data file, then exports the whole catalog to it and reports how fast the export
+    ran.
+    :param engine: The source of connections to the database.
+    :return: Nothing.
+    """
+    filepath = input("\nEnter the path of the CSV/JSON/JSONL file to export to (add .gz to compress):")
+    try:
+        report = CatalogService(engine).export_file(filepath)
+    except (ValueError, OSError) as error:
+        print(f"\nExport failed: {error}")
+        return
+    print(f"\nExported {report.games} games in {report.seconds:.2f} seconds.")
+    return
+
+
+MaintenanceReport = namedtuple("MaintenanceReport", ["links", "platforms", "genres", "changes", "bytes_before",
+                                                     "bytes_after", "bytes_reclaimed", "seconds"])
+
+# Rows ANALYZE samples per index in a routine run, which keeps it fast on large catalogs while still giving the query
+# planner current statistics. A full run reads every row.
+ANALYSIS_LIMIT = 1000
+
+# Link rows pointing at a game, platform or genre that no longer exists, then platforms and genres no game uses
+_ORPHAN_LINKS = [
+    "DELETE FROM game_platform_link WHERE game_id NOT IN (SELECT id FROM game) "
+    "OR platform_id NOT IN (SELECT id FROM platform)",
+    "DELETE FROM game_genre_link WHERE game_id NOT IN (SELECT id FROM game) OR genre_id NOT IN (SELECT id FROM genre)",
+]
+_ORPHAN_PLATFORMS = "DELETE FROM platform WHERE id NOT IN (SELECT platform_id FROM game_platform_link)"
+_ORPHAN_GENRES = "DELETE FROM genre WHERE id NOT IN (SELECT genre_id FROM game_genre_link)"
+
+
+def _database_bytes(conn):
+    """
+    Measures the size of the catalog's database, not counting the write-ahead log.
+    :param conn: An open connection.
+    :return: The size in bytes.
+    """
+    return (conn.exec_driver_sql("PRAGMA page_count").scalar() *
+            conn.exec_driver_sql("PRAGMA page_size").scalar())
+
+
+def purge_orphans(conn):
+    """
+    Deletes link rows left pointing at games, platforms or genres that no longer exist, then the platforms and genres no
+    game uses any more (remove_game() deliberately leaves them behind). Nothing is committed.
+    :param conn: An open connection inside a transaction.
+    :return: A (links, platforms, genres) tuple with the number of rows deleted from each.
+    """
+    links = sum(conn.exec_driver_sql(statement).rowcount for statement in _ORPHAN_LINKS)
+    platforms = conn.exec_driver_sql(_ORPHAN_PLATFORMS).rowcount
+    genres = conn.exec_driver_sql(_ORPHAN_GENRES).rowcount
+    return links, platforms, genres
+
+
+def prune_journal(conn):
+    """
+    Deletes the change journal entries every known replica has applied. Nothing is deleted while no replica is known,
+    as replicas made before the catalog recorded them are only known once they next sync. Sequence numbers carry on
+    from where they were, so a replica that was not known is told to make a new backup rather than silently missing
+    changes.
+    :param conn: An open connection inside a transaction.
+    :return: The number of entries deleted.
+    """
+    applied = conn.exec_driver_sql("SELECT min(seq) FROM replica_state").scalar()
+    if applied is None:
+        return 0
+    return conn.exec_driver_sql("DELETE FROM change_journal WHERE seq <= ?", (applied,)).rowcount
+
+
+def maintain(engine, full=False):
+    """
+    Tidies up a catalog: purges orphaned link rows, platforms and genres, prunes the change journal entries every
+    known replica has applied (none while no replica is known), merges the search index segments, returns free pages
+    to the file system and refreshes the query planner statistics.
+    Catalogs are switched to incremental auto-vacuum by the first run, which needs a full VACUUM (rewriting the file);
+    after that routine runs only release the free pages with incremental_vacuum. A full run always rewrites the file
+    with VACUUM, recounts the statistics tables and analyzes every row. Raises CatalogError when another connection
+    keeps the catalog locked.
+    :param engine: The source of connections to the database.
+    :param full: Whether to do a full run.
+    :return: A MaintenanceReport with the number of link rows, platforms, genres and journal entries purged, the size of
+    the database before and after, the bytes freed by the vacuum (the planner statistics written afterwards can leave
+    the file a little larger than the vacuum did) and the time taken.
+    """
+    start = time.perf_counter()
+    try:
+        with engine.begin() as conn:
+            before = _database_bytes(conn)
+            links, platforms, genres = purge_orphans(conn)
+            changes = prune_journal(conn)
+            if full:
+                rebuild_stats(conn)
+            for index in ("game_fts", "game_trigram"):
+                conn.exec_driver_sql(f"INSERT INTO {index}({index}) VALUES ('optimize')")
+        # Close the idle pooled connections, so only connections really in use can stand in the way of the vacuum
+        engine.dispose()
+        # VACUUM cannot run inside a transaction
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            vacuumed = _database_bytes(conn)
+            # 2 is INCREMENTAL
+            if full or conn.exec_driver_sql("PRAGMA auto_vacuum").scalar() != 2:
+                conn.exec_driver_sql("PRAGMA auto_vacuum = INCREMENTAL")
+                conn.exec_driver_sql("VACUUM")
+            else:
+                conn.exec_driver_sql("PRAGMA incremental_vacuum")
+            # Switching to incremental auto-vacuum adds a few pages of its own
+            reclaimed = max(vacuumed - _database_bytes(conn), 0)
+            conn.exec_driver_sql(f"PRAGMA analysis_limit = {0 if full else ANALYSIS_LIMIT}")
+            conn.exec_driver_sql("ANALYZE")
+            conn.exec_driver_sql("PRAGMA optimize")
+            # Copy the log back into the database file and empty it, so the file on disk shrinks too
+            conn.exec_driver_sql("PRAGMA wal_checkpoint(TRUNCATE)")
+            after = _database_bytes(conn)
+    except OperationalError as error:
+        if "locked" not in str(error.orig):
+            raise
+        raise CatalogError("The catalog is locked by another connection, close any other program or listing using it "
+                           "and try again") from error
+    return MaintenanceReport(links, platforms, genres, changes, before, after, reclaimed, time.perf_counter() - start)
+
+
+def maintain_catalog(engine):
+    """
+    Takes input for whether to do a full run, then tidies up the catalog and reports what was purged and how much space
+    was reclaimed.
+    :param engine: The source of connections to the database.
+    :return: Nothing.
+    """
+    full = input("\nRewrite the whole file and recount all statistics, which takes longer (Y/N):") == "Y"
+    try:
+        report = CatalogService(engine).maintain(full)
+    except CatalogError as error:
+        print(f"\nMaintenance failed: {error}")
+        return
+    print(f"\nPurged {report.links} orphaned links, {report.platforms} unused platforms, {report.genres} unused "
+          f"genres and {report.changes} applied journal entries.\nReclaimed {report.bytes_reclaimed} bytes "
+          f"(catalog size {report.bytes_before} -> {report.bytes_after} bytes) in {report.seconds:.2f} seconds.")
+    return
+
+
+# Separator between platform/genre names in the rows read by CatalogService, chosen so it never appears in a name
+ENTRY_SEPARATOR = "\x1f"
+
+class CatalogError(ValueError):
+    """
+    Raised when a change cannot be made to the catalog.
+    """
+
+
+class EntryExistsError(CatalogError):
+    """
+    Raised when adding a full entry that is already in the catalog.
+    """
+
+
+class EntryNotFoundError(CatalogError):
+    """
+    Raised when removing a full entry that is not in the catalog.
+    """
+
+
+class GameEntry(NamedTuple):
+    """
+    A game in the catalog, with the names of its platforms and genres.
+    """
+    id: int
+    title: str
+    played: bool
+    completed: bool
+    platforms: List[str]
+    genres: List[str]
+    # The platform/genre name a grouped listing placed the game under, None otherwise
+    group: Optional[str] = None
+
+
+def to_entry(row) -> GameEntry:
+    """
+    Converts a row read with ENTRY_SEPARATOR between platform/genre names to a GameEntry.
+    :param row: A row like those from game_summary_query(), optionally with a group column.
+    :return: The GameEntry.
+    """
+    game_id, title, played, completed, platforms, genres, *group = row
+    return GameEntry(game_id, title, played, completed, platforms.split(ENTRY_SEPARATOR) if platforms else [],
+                     genres.split(ENTRY_SEPARATOR) if genres else [], group[0] if group else None)
+
+
+class CatalogBatch:
+    """
+    Adds, updates and removes games inside one open transaction, sharing the platform/genre names already resolved.
+    Nothing is committed until the CatalogService.batch() block it came from ends.
+    """
+
+    def __init__(self, conn: Connection) -> None:
+        self.conn = conn
+        self._names: Dict[str, Dict[str, int]] = {}
+
+    def add(self, title: str, played: bool, completed: bool, platform: str, genre: str) -> int:
+        """
+        Adds a full entry, along with its platform and genre if they are new.
+        :param title: The game title.
+        :param played: The played status.
+        :param completed: The completed status.
+        :param platform: The platform name.
+        :param genre: The genre name.
+        :return: The id of the new game.
+        """
+        if find_entry_id(self.conn, title, played, completed, platform, genre) is not None:
+            raise EntryExistsError(f"full entry for '{title}' already exists")
+        return insert_game(self.conn, title, played, completed, platform, genre, self._names)
+
+    def add_games(self, entries: Iterable[Tuple[str, bool, bool, List[str], List[str]]]) -> List[int]:
+        """
+        Adds many games, each with any number of platforms and genres, see insert_games(). Unlike add() there is no
+        check for an existing full entry, so a game with several platforms/genres is always a single new game.
+        :param entries: An iterable of (title, played, completed, platforms, genres) tuples.
+        :return: A list of the ids of the new games, in the order given.
+        """
+        return insert_games(self.conn, entries, self._names)
+
+    def update(self, values: Dict[str, object], ids: Optional[Iterable[int]] = None, title: Optional[str] = None,
+               platform: Optional[str] = None, genre: Optional[str] = None, played: Optional[bool] = None,
+               completed: Optional[bool] = None) -> int:
+        """
+        Changes every game matching the given filters in place, see update_games(), e.g.
+        batch.update({"played": True}, platform="Switch") marks every game on Switch as played.
+        :param values: Map of the UPDATE_FIELDS to change to their new values.
+        :param ids: Only update the games with these ids, or None for all.
+        :param title: Only update games with this title, or None for all.
+        :param platform: Only update games on this platform, or None for all.
+        :param genre: Only update games with this genre, or None for all.
+        :param played: Only update games with this played status, or None for all.
+        :param completed: Only update games with this completed status, or None for all.
+        :return: The number of games matching the filters.
+        """
+        return update_games(self.conn, values, ids, title, platform, genre, played, completed, self._names)
+
+    def remove(self, title: str, played: bool, completed: bool, platform: str, genre: str) -> int:
+        """
+        Removes a full entry, leaving its platform and genre in the catalog.
+        :param title: The game title.
+        :param played: The played status.
+        :param completed: The completed status.
+        :param platform: The platform name.
+        :param genre: The genre name.
+        :return: The id of the removed game.
+        """
+        game_id = find_entry_id(self.conn, title, played, completed, platform, genre)
+        if game_id is None:
+            raise EntryNotFoundError(f"entry for '{title}' does not exist")
+        delete_game(self.conn, game_id)
+        return game_id
+
+
+class CatalogService:
+    """
+    Library interface to one catalog. Every method returns data rather than printing it, so the interactive menus, the
+    command line interface and other programs all share the same queries, caching and error handling.
+    """
+
+    def __init__(self, engine: Engine) -> None:
+        self.engine = engine
+
+    @classmethod
+    def open(cls, filepath: str, profile: str = DEFAULT_PROFILE) -> "CatalogService":
+        """
+        Opens a catalog file, creating it if it does not exist.
+        :param filepath: The filepath to the catalog file.
+        :param profile: The name of the connection profile to use, one of PROFILES.
+        :return: The CatalogService.
+        """
+        return cls(connect(filepath, profile))
+
+    def games(self, batch_size: int = BATCH_SIZE) -> Iterator[GameEntry]:
+        """
+        Streams every game in the catalog alphabetically by title.
+        :param batch_size: The number of rows to fetch per round-trip.
+        :return: A generator of GameEntry.
+        """
+        statement = game_summary_query(ENTRY_SEPARATOR).execution_options(yield_per=batch_size)
+        for row in query_cache(self.engine).stream(self.engine, ("games",), statement, batch_size):
+            yield to_entry(row)
+
+    def search(self, query: str, limit: int = SEARCH_LIMIT) -> List[GameEntry]:
+        """
+        Searches the catalog by title, see search_games().
+        :param query: The text to search for.
+        :param limit: The maximum number of results to return.
+        :return: A list of GameEntry, best match first.
+        """
+        return [to_entry(row) for row in search_games(self.engine, query, limit, ENTRY_SEPARATOR)]
+
+    def page(self, sort: str = "title", platform: Optional[str] = None, genre: Optional[str] = None,
+             played: Optional[bool] = None, completed: Optional[bool] = None, after: Optional[Tuple] = None,
+             page_size: int = PAGE_SIZE) -> Page:
+        """
+        Lists one page of the catalog, see list_games().
+        :param sort: One of SORT_ORDERS.
+        :param platform: Only list games on this platform, or None for all.
+        :param genre: Only list games with this genre, or None for all.
+        :param played: Only list games with this played status, or None for all.
+        :param completed: Only list games with this completed status, or None for all.
+        :param after: The next_key of the previous page, or None for the first page.
+        :param page_size: The maximum number of rows on the page.
+        :return: A Page of GameEntry.
+        """
+        page = list_games(self.engine, sort, platform, genre, played, completed, after, page_size, ENTRY_SEPARATOR)
+        return Page([to_entry(row) for row in page.rows], page.next_key)
+
+    def generation(self) -> int:
+        """
+        Reads the catalog generation, which changes whenever anything in the catalog does.
+        :return: The generation.
+        """
+        with self.engine.connect() as conn:
+            return generation(conn)
+
+    def stats(self) -> CatalogStats:
+        """
+        Reads the catalog statistics, see read_stats().
+        :return: A CatalogStats.
+        """
+        return catalog_stats(self.engine)
+
+    def snapshot(self):
+        """
+        Loads a columnar in-memory copy of the catalog for fast filtering and counting, see CatalogSnapshot.
+        :return: The CatalogSnapshot.
+        """
+        import CatalogSnapshot
+        return CatalogSnapshot.load_snapshot(self.engine)
+
+    def maintain(self, full: bool = False) -> MaintenanceReport:
+        """
+        Purges orphaned rows, reclaims free space and refreshes planner statistics, see maintain().
+        :param full: Whether to rewrite the whole file and recount everything.
+        :return: A MaintenanceReport.
+        """
+        return maintain(self.engine, full)
+
+    def has_title(self, title: str) -> bool:
+        """
+        Checks whether any game has the given title.
+        :param title: The game title.
+        :return: True if there is at least one game with the title.
+        """
+        with self.engine.connect() as conn:
+            return has_title(conn, title)
+
+    def find(self, title: str, played: bool, completed: bool, platform: str, genre: str) -> Optional[int]:
+        """
+        Looks up a full entry.
+        :param title: The game title.
+        :param played: The played status.
+        :param completed: The completed status.
+        :param platform: The platform name.
+        :param genre: The genre name.
+        :return: The id of the matching game, or None.
+        """
+        with self.engine.connect() as conn:
+            return find_entry_id(conn, title, played, completed, platform, genre)
+
+    @contextlib.contextmanager
+    def batch(self) -> Iterator[CatalogBatch]:
+        """
+        Opens a transaction for several changes, committed when the block ends or rolled back should it raise.
+        :return: A context manager giving a CatalogBatch.
+        """
+        with self.engine.begin() as conn:
+            yield CatalogBatch(conn)
+
+    def add(self, title: str, played: bool, completed: bool, platform: str, genre: str) -> int:
+        """
+        Adds a full entry in its own transaction, see CatalogBatch.add().
+        :return: The id of the new game.
+        """
+        with self.batch() as batch:
+            return batch.add(title, played, completed, platform, genre)
+
+    def add_games(self, entries: Iterable[Tuple[str, bool, bool, List[str], List[str]]]) -> List[int]:
+        """
+        Adds many games in one transaction, see CatalogBatch.add_games().
+        :param entries: An iterable of (title, played, completed, platforms, genres) tuples.
+        :return: A list of the ids of the new games, in the order given.
+        """
+        with self.batch() as batch:
+            return batch.add_games(entries)
+
+    def update(self, values: Dict[str, object], ids: Optional[Iterable[int]] = None, title: Optional[str] = None,
+               platform: Optional[str] = None, genre: Optional[str] = None, played: Optional[bool] = None,
+               completed: Optional[bool] = None) -> int:
+        """
+        Changes every game matching the given filters in place in its own transaction, see CatalogBatch.update().
+        :return: The number of games matching the filters.
+        """
+        with self.batch() as batch:
+            return batch.update(values, ids, title, platform, genre, played, completed)
+
+    def remove(self, title: str, played: bool, completed: bool, platform: str, genre: str) -> int:
+        """
+        Removes a full entry in its own transaction, see CatalogBatch.remove().
+        :return: The id of the removed game.
+        """
+        with self.batch() as batch:
+            return batch.remove(title, played, completed, platform, genre)
+
+    def import_file(self, filepath: str, fmt: Optional[str] = None) -> ImportReport:
+        """
+        Bulk loads a data file into the catalog, see import_catalog().
+        :param filepath: The filepath to the data file.
+        :param fmt: The file format, worked out from the extension when not given.
+        :return: An ImportReport.
+        """
+        return import_catalog(self.engine, filepath, fmt)
+
+    def export_file(self, filepath: str, fmt: Optional[str] = None) -> ExportReport:
+        """
+        Writes the whole catalog to a data file, see export_catalog().
+        :param filepath: The filepath to write to.
+        :param fmt: The file format, worked out from the extension when not given.
+        :return: An ExportReport.
+        """
+        return export_catalog(self.engine, filepath, fmt)
+
+
+def print_sub_menu():
+    """
+    Prints the list of commands available in the sub-menu.
+    :return: Nothing.
     """
-    print("\nAll cataloged games have been displayed above.\nYou are now in the sub-menu.")
     print("\nTo search for a game by title enter the command: Search")
     print("To display the catalog sorted differently enter the command: Sort")
     print("To add a new game enter the command: AddGame")
     print("To remove a game enter the command: RemoveGame")
+    print("To mark a game as played/completed enter the command: UpdateGame")
     print("To display the database enter the command: Display")
+    print("To show how many games are played/completed per platform and genre enter the command: Stats")
+    print("To import games from a CSV/JSON/JSONL file enter the command: Import")
+    print("To export the catalog to a CSV/JSON/JSONL file enter the command: Export")
+    print("To remove unused platforms/genres and reclaim space in the catalog file enter the command: Maintain")
     print("Otherwise to return to the initial menu to create or load a different catalog enter the command: Exit")
+
+
+# Commands understood by the sub-menu, timed separately when the catalog is instrumented
+SUB_MENU_COMMANDS = ("Search", "Sort", "AddGame", "RemoveGame", "UpdateGame", "Display", "Stats", "Import", "Export",
+                     "Maintain")
+
+
+def sub_menu(engine):
+    """
+    Sub-menu accessed by user allowing them to search for a game by title, display stored games sorted in different
+    manners, add a game to the catalog, remove a game from the catalog, display all games in the database (sorted
+    alphabetically), or import/export games from/to a file.
+    :param engine: The source of connections ot the database.
+    :return: Nothing
+    """
+    print("\nAll cataloged games have been displayed above.\nYou are now in the sub-menu.")
+    print_sub_menu()
     cmd = input("\nEnter Command:")
     while cmd != "Exit":
-        if cmd == "Search":
-            search_title(engine)
-            print("\nTo search for a game by title enter the command: Search")
-            print("To display the catalog sorted differently enter the command: Sort")
-            print("To add a new game enter the command: AddGame")
-            print("To remove a game enter the command: RemoveGame")
-            print("To display the database enter the command: Display")
-            print(
-                "Otherwise to return to the initial menu to create or load a different catalog enter the command: Exit")
-            cmd = input("\nEnter Command:")
-        elif cmd == "Sort":
-            # ToDo: create function to query database in manner besides alphabetically by title as done by display_all()
-            print("\nTo search for a game by title enter the command: Search")
-            print("To display the catalog sorted differently enter the command: Sort")
-            print("To add a new game enter the command: AddGame")
-            print("To remove a game enter the command: RemoveGame")
-            print("To display the database enter the command: Display")
-            print(
-                "Otherwise to return to the initial menu to create or load a different catalog enter the command: Exit")
-            cmd = input("\nEnter Command:")
-        elif cmd == "AddGame":
-            add_game(engine)
-            print("\nTo search for a game by title enter the command: Search")
-            print("To display the catalog sorted differently enter the command: Sort")
-            print("To add a new game enter the command: AddGame")
-            print("To remove a game enter the command: RemoveGame")
-            print("To display the database enter the command: Display")
-            print(
-                "Otherwise to return to the initial menu to create or load a different catalog enter the command: Exit")
-            cmd = input("\nEnter Command:")
-        elif cmd == "RemoveGame":
-            remove_game(engine)
-            print("\nTo search for a game by title enter the command: Search")
-            print("To display the catalog sorted differently enter the command: Sort")
-            print("To add a new game enter the command: AddGame")
-            print("To remove a game enter the command: RemoveGame")
-            print("To display the database enter the command: Display")
-            print(
-                "Otherwise to return to the initial menu to create or load a different catalog enter the command: Exit")
-            cmd = input("\nEnter Command:")
-        elif cmd == "Display":
-            display_all(engine)
-            print("\nAll cataloged games have been displayed above.\nYou are now in the sub-menu.")
-            print("\nTo search for a game by title enter the command: Search")
-            print("To display the catalog sorted differently enter the command: Sort")
-            print("To add a new game enter the command: AddGame")
-            print("To remove a game enter the command: RemoveGame")
-            print("To display the database enter the command: Display")
-            print(
-                "Otherwise to return to the initial menu to create or load a different catalog enter the command: Exit")
-            cmd = input("\nEnter Command:")
-        #ToDo: Add functions to remove/add a genre/platform
-        else:
-            print("\nTo search for a game by title enter the command: Search")
-            print("To display the catalog sorted differently enter the command: Sort")
-            print("To add a new game enter the command: AddGame")
-            print("To remove a game enter the command: RemoveGame")
-            print("To display the database enter the command: Display")
-            print(
-                "Otherwise to return to the initial menu to create or load a different catalog enter the command: Exit")
-            cmd = input("\nEnter Command:")
+        with track(engine, cmd if cmd in SUB_MENU_COMMANDS else None):
+            if cmd == "Search":
+                search_title(engine)
+            elif cmd == "Sort":
+                sort_games(engine)
+            elif cmd == "AddGame":
+                add_game(engine)
+            elif cmd == "RemoveGame":
+                remove_game(engine)
+            elif cmd == "UpdateGame":
+                update_game(engine)
+            elif cmd == "Display":
+                display_all(engine)
+                print("\nAll cataloged games have been displayed above.\nYou are now in the sub-menu.")
+            elif cmd == "Stats":
+                show_stats(engine)
+            elif cmd == "Import":
+                import_file(engine)
+            elif cmd == "Export":
+                export_file(engine)
+            elif cmd == "Maintain":
+                maintain_catalog(engine)
+        #ToDo: Add functions to add a genre/platform
+        print_sub_menu()
+        cmd = input("\nEnter Command:")
     return
 
 
 def main():
     """
-    Prints welcome message then starts program at initial menu.
+    Prints welcome message then starts program at initial menu. When run with command line arguments the
+    non-interactive command line interface in CatalogCLI is used instead, see the top of this file.
     :return:
     """
     print("Welcome to the GameTracker!")
@@ -0,0 +1,263 @@
+"""
+Benchmark Suite
+Times display_all, search_title, add_game and remove_game on synthetic catalogs of increasing size and reports latency
+percentiles, throughput and peak Python memory for each. Results are saved as JSON so runs can be compared between
+releases, e.g.
+    python Testing/Benchmark.py --sizes 10000,100000 --output new.json --compare old.json
+Author: DS-S
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import sqlalchemy
+
+import Cataloger
+from Generator import build_catalog
+
+DEFAULT_SIZES = [10000, 100000, 1000000]
+
+# Number of timed runs of each operation per catalog size
+DEFAULT_RUNS = {"display_all": 3, "search_title": 200, "add_game": 100, "remove_game": 100}
+
+# Metrics compared by --compare, a rise of more than the threshold is reported as a regression
+COMPARED_METRICS = ["p50_ms", "p95_ms", "peak_memory_kb"]
+
+
+def percentile(samples, fraction):
+    """
+    Finds a percentile of a list of samples by nearest rank.
+    :param samples: The samples, sorted ascending.
+    :param fraction: The percentile as a fraction, e.g. 0.95.
+    :return: The sample at that percentile.
+    """
+    return samples[min(len(samples) - 1, max(0, round(fraction * len(samples)) - 1))]
+
+
+def summarize(operation, size, timings, peak_memory):
+    """
+    Turns the timings of one operation into a result entry.
+    :param operation: The name of the operation.
+    :param size: The number of games in the catalog.
+    :param timings: The duration of each run in seconds.
+    :param peak_memory: The peak Python memory allocated by one run, in bytes.
+    :return: The result entry.
+    """
+    timings = sorted(timings)
+    total = sum(timings)
+    return {
+        "operation": operation,
+        "size": size,
+        "runs": len(timings),
+        "p50_ms": percentile(timings, 0.50) * 1000,
+        "p95_ms": percentile(timings, 0.95) * 1000,
+        "p99_ms": percentile(timings, 0.99) * 1000,
+        "max_ms": timings[-1] * 1000,
+        "ops_per_sec": len(timings) / total if total else 0.0,
+        "peak_memory_kb": peak_memory / 1024,
+    }
+
+
+def measure(run, calls):
+    """
+    Times each call of an operation but the last, then makes the last call under tracemalloc to find its peak memory
+    use. Memory is measured separately so tracing does not slow down the timed runs.
+    :param run: Function running the operation once for the given argument.
+    :param calls: The argument of each run, plus one for the memory run.
+    :return: A (timings, peak memory) pair.
+    """
+    timings = []
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for call in calls[:-1]:
+            start = time.perf_counter()
+            run(call)
+            timings.append(time.perf_counter() - start)
+        tracemalloc.start()
+        run(calls[-1])
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return timings, peak
+
+
+def _answers(*answers):
+    """
+    Patches input() to give the answers an interactive function asks for.
+    :param answers: The answers, in the order the prompts appear.
+    :return: The patch, to be used as a context manager.
+    """
+    return mock.patch("builtins.input", side_effect=list(answers))
+
+
+def bench_catalog(engine, size, runs, seed, use_cache):
+    """
+    Runs every operation against one catalog.
+    :param engine: The source of connections to the catalog.
+    :param size: The number of games in the catalog.
+    :param runs: Map of operation name to the number of timed runs.
+    :param seed: Seed used to pick the titles searched for.
+    :param use_cache: Whether searches may be answered from the query cache.
+    :return: A list of result entries.
+    """
+    cache = Cataloger.query_cache(engine)
+    rng = random.Random(seed)
+    with engine.connect() as conn:
+        titles = [row.title for row in conn.execute(
+            sqlalchemy.select(Cataloger.Game.title).where(Cataloger.Game.id.in_(
+                [rng.randint(1, size) for _ in range(runs["search_title"])])))]
+    titles = [rng.choice(titles) for _ in range(runs["search_title"] + 1)]
+    results = []
+
+    def display(_):
+        cache.clear()
+        Cataloger.display_all(engine)
+
+    results.append(summarize("display_all", size, *measure(display, list(range(runs["display_all"] + 1)))))
+
+    def search(title):
+        if not use_cache:
+            cache.clear()
+        with _answers(title):
+            Cataloger.search_title(engine)
+
+    results.append(summarize("search_title", size, *measure(search, titles)))
+
+    # Entries made up for add_game are removed again by remove_game, leaving the catalog as it was
+    count = max(runs["add_game"], runs["remove_game"]) + 1
+    entries = [(f"Benchmark Entry {number}", rng.choice(["True", "False"]), rng.choice(["True", "False"]),
+                "Benchmark Platform", "Benchmark Genre") for number in range(count)]
+
+    def add(entry):
+        with _answers(*entry):
+            Cataloger.add_game(engine)
+
+    results.append(summarize("add_game", size, *measure(add, entries[:runs["add_game"]] + entries[-1:])))
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for entry in entries[runs["add_game"]:-1]:
+            add(entry)
+
+    def remove(entry):
+        with _answers(*entry):
+            Cataloger.remove_game(engine)
+
+    results.append(summarize("remove_game", size, *measure(remove, entries[:runs["remove_game"]] + entries[-1:])))
+    return results
+
+
+def run_benchmarks(sizes, runs, workdir, seed=0, rebuild=False, use_cache=False):
+    """
+    Builds (or reuses) a synthetic catalog of each size and benchmarks it.
+    :param sizes: The catalog sizes to benchmark.
+    :param runs: Map of operation name to the number of timed runs.
+    :param workdir: Directory the synthetic catalogs are kept in between runs.
+    :param seed: Seed for the synthetic catalogs and the titles searched for.
+    :param rebuild: Whether to rebuild catalogs that already exist.
+    :param use_cache: Whether searches may be answered from the query cache.
+    :return: A list of result entries.
+    """
+    os.makedirs(workdir, exist_ok=True)
+    results = []
+    for size in sizes:
+        filepath = os.path.join(workdir, f"synthetic-{size}-{seed}.db")
+        if rebuild or not os.path.exists(filepath):
+            print(f"Building {size} game catalog...", file=sys.stderr)
+            start = time.perf_counter()
+            engine = build_catalog(filepath, size, seed)
+            seconds = time.perf_counter() - start
+            results.append({"operation": "import", "size": size, "runs": 1, "seconds": seconds,
+                            "ops_per_sec": size / seconds})
+        else:
+            engine = Cataloger.connect(filepath)
+        print(f"Benchmarking {size} game catalog...", file=sys.stderr)
+        results.extend(bench_catalog(engine, size, runs, seed, use_cache))
+        engine.dispose()
+    return results
+
+
+def compare(results, baseline, threshold):
+    """
+    Prints how each result changed against a baseline run.
+    :param results: The result entries of this run.
+    :param baseline: The result entries of the baseline run.
+    :param threshold: The ratio above which a rise is reported as a regression.
+    :return: The number of regressions found.
+    """
+    previous = {(entry["operation"], entry["size"]): entry for entry in baseline}
+    regressions = 0
+    for entry in results:
+        old = previous.get((entry["operation"], entry["size"]))
+        if old is None:
+            continue
+        for metric in COMPARED_METRICS:
+            if metric not in entry or not old.get(metric):
+                continue
+            ratio = entry[metric] / old[metric]
+            flag = ""
+            if ratio > threshold:
+                flag = "  REGRESSION"
+                regressions += 1
+            print(f"{entry['operation']:>12} {entry['size']:>8} {metric:>15}: {old[metric]:10.2f} -> "
+                  f"{entry[metric]:10.2f} ({ratio:.2f}x){flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark catalog operations on synthetic catalogs.")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)),
+                        help="comma separated catalog sizes (default: 10000,100000,1000000)")
+    parser.add_argument("--runs", type=float, default=1.0, help="scale the number of timed runs (default: 1.0)")
+    parser.add_argument("--seed", type=int, default=0, help="random seed (default: 0)")
+    parser.add_argument("--workdir", default=os.path.join(tempfile.gettempdir(), "gamecatalog-bench"),
+                        help="directory the synthetic catalogs are kept in between runs")
+    parser.add_argument("--rebuild", action="store_true", help="rebuild catalogs even if they already exist")
+    parser.add_argument("--cache", action="store_true", help="let repeated searches be served from the query cache")
+    parser.add_argument("--label", default="", help="label stored with the results, e.g. a release number")
+    parser.add_argument("--output", default="bench_results.json", help="file to save results to")
+    parser.add_argument("--compare", help="results file of a previous run to compare against")
+    parser.add_argument("--threshold", type=float, default=1.2,
+                        help="slowdown ratio reported as a regression by --compare (default: 1.2)")
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(",")]
+    runs = {operation: max(1, round(count * args.runs)) for operation, count in DEFAULT_RUNS.items()}
+    results = run_benchmarks(sizes, runs, args.workdir, args.seed, args.rebuild, args.cache)
+    report = {
+        "label": args.label,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "sqlalchemy": sqlalchemy.__version__,
+        "platform": platform.platform(),
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as file:
+        json.dump(report, file, indent=2)
+
+    for entry in results:
+        if "p50_ms" in entry:
+            print(f"{entry['operation']:>12} {entry['size']:>8}: p50 {entry['p50_ms']:9.2f}ms  "
+                  f"p95 {entry['p95_ms']:9.2f}ms  p99 {entry['p99_ms']:9.2f}ms  {entry['ops_per_sec']:9.1f} ops/s  "
+                  f"peak {entry['peak_memory_kb']:9.0f}KB")
+        else:
+            print(f"{entry['operation']:>12} {entry['size']:>8}: {entry['seconds']:.2f}s "
+                  f"({entry['ops_per_sec']:.0f} games/s)")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as file:
+            baseline = json.load(file)["results"]
+        if compare(results, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Synthetic Catalog Generator
+Builds catalogs of any size with realistic title, platform and genre distributions for benchmarking. The same count and
+seed always produce the same catalog.
+Author: DS-S
+"""
+import argparse
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import Cataloger
+
+PLATFORMS = ["PC", "PlayStation", "PlayStation 2", "PlayStation 3", "PlayStation 4", "PlayStation 5", "PSP",
+             "PS Vita", "Xbox", "Xbox 360", "Xbox One", "Xbox Series X", "NES", "SNES", "Nintendo 64", "GameCube",
+             "Wii", "Wii U", "Switch", "Game Boy", "Game Boy Advance", "Nintendo DS", "Nintendo 3DS", "Genesis",
+             "Dreamcast", "Saturn", "Mac", "Linux", "iOS", "Android"]
+
+GENRES = ["Action", "Adventure", "RPG", "JRPG", "Strategy", "Simulation", "Sports", "Racing", "Puzzle", "Platformer",
+          "Shooter", "Fighting", "Horror", "Stealth", "Roguelike", "Metroidvania", "Visual Novel", "Rhythm",
+          "Sandbox", "MMO"]
+
+_ADJECTIVES = ["Dark", "Final", "Eternal", "Lost", "Crimson", "Silent", "Golden", "Broken", "Hidden", "Infinite",
+               "Ancient", "Shadow", "Iron", "Crystal", "Savage", "Wild", "Neon", "Forgotten", "Burning", "Frozen"]
+_NOUNS = ["Fantasy", "Legend", "Quest", "Saga", "Kingdom", "Empire", "Knight", "Dragon", "Horizon", "Frontier",
+          "Odyssey", "Chronicles", "Souls", "Storm", "Dungeon", "Galaxy", "Blade", "Hunter", "Warriors", "Tactics"]
+_PLACES = ["the Abyss", "the North", "Time", "the Void", "Avalon", "the Deep", "Tomorrow", "the Stars", "Ruin",
+           "the Fallen", "Eden", "the Wastes"]
+_SEQUELS = ["", "", "", "", " II", " III", " IV", " 2", " 3", " Remastered", " HD", " Zero", " Origins"]
+
+# Weighted number of platforms and genres per game, most games are on one platform with one genre
+_PLATFORM_COUNTS = [1] * 60 + [2] * 25 + [3] * 10 + [4] * 4 + [6]
+_GENRE_COUNTS = [1] * 55 + [2] * 35 + [3] * 10
+
+
+def _title(rng, number):
+    """
+    Makes up a game title. Titles repeat across a large catalog, the way remakes and re-releases do.
+    :param rng: The random number generator.
+    :param number: The position of the game in the catalog, used to keep large catalogs from being mostly duplicates.
+    :return: The title.
+    """
+    title = f"{rng.choice(_ADJECTIVES)} {rng.choice(_NOUNS)}"
+    if rng.random() < 0.4:
+        title += f" of {rng.choice(_PLACES)}"
+    if rng.random() < 0.7:
+        title += f": {rng.choice(_NOUNS)} {number % 9973}"
+    return title + rng.choice(_SEQUELS)
+
+
+def generate_records(count, seed=0):
+    """
+    Generates synthetic games. Platforms and genres are skewed so a few are very common and most are rare.
+    :param count: The number of games to generate.
+    :param seed: The seed for the random number generator.
+    :return: A generator of (title, played, completed, platforms, genres) tuples, as taken by
+    Cataloger.import_records().
+    """
+    rng = random.Random(seed)
+    platform_weights = [1 / (rank + 1) for rank in range(len(PLATFORMS))]
+    genre_weights = [1 / (rank + 1) for rank in range(len(GENRES))]
+    for number in range(count):
+        played = rng.random() < 0.55
+        completed = played and rng.random() < 0.6
+        platforms = set(rng.choices(PLATFORMS, platform_weights, k=rng.choice(_PLATFORM_COUNTS)))
+        genres = set(rng.choices(GENRES, genre_weights, k=rng.choice(_GENRE_COUNTS)))
+        yield _title(rng, number), played, completed, sorted(platforms), sorted(genres)
+
+
+def build_catalog(filepath, count, seed=0):
+    """
+    Creates a catalog file filled with synthetic games, replacing any existing file.
+    :param filepath: The filepath to the catalog file.
+    :param count: The number of games.
+    :param seed: The seed for the random number generator.
+    :return: The engine for the new catalog.
+    """
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(filepath + suffix):
+            os.remove(filepath + suffix)
+    engine = Cataloger.connect(filepath)
+    Cataloger.import_records(engine, generate_records(count, seed))
+    return engine
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build a synthetic game catalog.")
+    parser.add_argument("catalog", help="path of the catalog file to create, replaced if it exists")
+    parser.add_argument("count", type=int, help="number of games")
+    parser.add_argument("--seed", type=int, default=0, help="random seed (default: 0)")
+    args = parser.parse_args()
+    build_catalog(args.catalog, args.count, args.seed)
+
+
+if __name__ == "__main__":
+    main()
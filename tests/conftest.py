@@ -0,0 +1,24 @@
+"""
+Shared fixtures for the catalog tests.
+Author: DS-S
+"""
+import os
+import sys
+
+import pytest
+
+# The catalog modules live at the top of the repository rather than in a package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import Cataloger  # noqa: E402
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    """
+    A new, empty catalog.
+    :return: The CatalogService of the catalog.
+    """
+    service = Cataloger.CatalogService.open(str(tmp_path / "games.db"))
+    yield service
+    service.engine.dispose()
@@ -0,0 +1,52 @@
+"""
+Tests of the asyncio catalog service.
+Author: DS-S
+"""
+import asyncio
+
+import pytest
+
+import Cataloger
+
+pytest.importorskip("aiosqlite")
+
+import AsyncCatalog  # noqa: E402
+
+
+def test_async_service_matches_sync_service(tmp_path):
+    filepath = str(tmp_path / "games.db")
+
+    async def scenario():
+        service = await AsyncCatalog.AsyncCatalogService.open(filepath)
+        try:
+            game_id = await service.add("Hades", True, False, "Switch", "Roguelike")
+            await service.add_games([("Celeste", False, False, ["Switch", "PC"], ["Platformer"]),
+                                     ("Okami", True, True, ["PS2"], ["Adventure"])])
+            assert await service.find("Hades", True, False, "Switch", "Roguelike") == game_id
+            assert await service.has_title("Okami") and not await service.has_title("Ico")
+            assert await service.update({"completed": True}, title="Hades") == 1
+            searches = await asyncio.gather(service.search("hades"), service.search("celeste"))
+            page = await service.page("platform", page_size=2)
+            streamed = [entry.title async for entry in service.games()]
+            stats = await service.stats()
+            return searches, page, streamed, stats
+        finally:
+            await service.close()
+
+    searches, page, streamed, stats = asyncio.run(scenario())
+    assert [[entry.title for entry in results] for results in searches] == [["Hades"], ["Celeste"]]
+    assert searches[0][0].completed
+    assert [(entry.group, entry.title) for entry in page.rows] == [("PC", "Celeste"), ("PS2", "Okami")]
+    assert page.next_key is not None
+    assert streamed == ["Celeste", "Hades", "Okami"]
+    assert (stats.games, stats.played, stats.completed) == (3, 2, 2)
+    # The synchronous service sees the same catalog
+    service = Cataloger.CatalogService.open(filepath)
+    assert [entry.title for entry in service.search("okami")] == ["Okami"]
+    service.engine.dispose()
+
+
+def test_async_service_checks_the_profile(tmp_path):
+    with pytest.raises(ValueError, match="Unknown connection profile"):
+        asyncio.run(AsyncCatalog.AsyncCatalogService.open(str(tmp_path / "games.db"), "fast"))
+    assert not (tmp_path / "games.db").exists()
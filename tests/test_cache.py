@@ -0,0 +1,37 @@
+"""
+Tests of the query result cache.
+Author: DS-S
+"""
+import sqlite3
+
+import Cataloger
+
+
+def test_repeated_search_is_served_from_cache(catalog):
+    catalog.add("Hades", True, False, "PC", "Roguelike")
+    cache = Cataloger.query_cache(catalog.engine)
+    before = cache.stats()
+    assert [entry.title for entry in catalog.search("hades")] == ["Hades"]
+    assert [entry.title for entry in catalog.search("hades")] == ["Hades"]
+    after = cache.stats()
+    assert (after.hits - before.hits, after.misses - before.misses) == (1, 1)
+
+
+def test_change_by_another_connection_invalidates(catalog, tmp_path):
+    catalog.add("Hades", True, False, "PC", "Roguelike")
+    assert [row.title for row in catalog.page().rows] == ["Hades"]
+    # A write that does not go through this engine, as from another program
+    with sqlite3.connect(str(tmp_path / "games.db")) as conn:
+        conn.execute("UPDATE game SET title = 'Hades II'")
+    assert [row.title for row in catalog.page().rows] == ["Hades II"]
+    assert Cataloger.query_cache(catalog.engine).stats().invalidations >= 1
+
+
+def test_stream_keeps_only_results_that_fit_a_page(catalog):
+    catalog.add_games([(f"Game {number:02}", False, False, ["PC"], ["Action"]) for number in range(10)])
+    cache = Cataloger.query_cache(catalog.engine)
+    cache.clear()
+    assert len(list(catalog.games(batch_size=4))) == 10
+    assert cache.stats().rows == 0
+    assert len(list(catalog.games(batch_size=50))) == 10
+    assert cache.stats().rows == 10
@@ -0,0 +1,54 @@
+"""
+Tests of the non-interactive command line: argument checks, batch scripts and error reporting.
+Author: DS-S
+"""
+import pytest
+
+import CatalogCLI
+
+
+def test_counts_must_be_positive(tmp_path, capsys):
+    for limit in ("0", "-3", "many"):
+        with pytest.raises(SystemExit):
+            CatalogCLI.main([str(tmp_path / "games.db"), "search", "hades", "--limit", limit])
+        assert "expected a whole number of at least 1" in capsys.readouterr().err
+
+
+def test_add_search_and_update(tmp_path, capsys):
+    filepath = str(tmp_path / "games.db")
+    assert CatalogCLI.main([filepath, "add", "Hades", "--platform", "Switch", "--genre", "Roguelike",
+                            "--genre", "Action", "--played"]) == 0
+    assert CatalogCLI.main([filepath, "update", "--where-title", "Hades", "--completed", "true"]) == 0
+    assert "Updated 1 games." in capsys.readouterr().err
+    assert CatalogCLI.main([filepath, "search", "hades"]) == 0
+    assert capsys.readouterr().out.splitlines() == [
+        "Title: Hades || Played: True || Completed: True || Platform: Switch || Genre: Roguelike, Action"]
+
+
+def test_update_needs_filters(tmp_path, capsys):
+    assert CatalogCLI.main([str(tmp_path / "games.db"), "update", "--played", "true"]) == 1
+    assert capsys.readouterr().err.startswith("error: no games picked")
+
+
+def test_batch_runs_in_one_transaction(tmp_path, capsys):
+    filepath = str(tmp_path / "games.db")
+    script = tmp_path / "games.txt"
+    script.write_text('# Games to add\nadd "Fire Emblem" --platform Switch --genre RPG --completed\n\n'
+                      'add Okami --platform PS2 --genre Adventure\n', encoding="utf-8")
+    assert CatalogCLI.main([filepath, "batch", str(script)]) == 0
+    assert "Ran 2 commands." in capsys.readouterr().err
+    # A bad line fails the whole script, so the game before it is not added
+    script.write_text("add Ico --platform PS2 --genre Puzzle\nadd Celeste --platform\n", encoding="utf-8")
+    assert CatalogCLI.main([filepath, "batch", str(script)]) == 1
+    assert "error: line 2: invalid command" in capsys.readouterr().err
+    assert CatalogCLI.main([filepath, "list"]) == 0
+    assert [line.split(" || ")[0] for line in capsys.readouterr().out.splitlines()] == [
+        "Title: Fire Emblem", "Title: Okami"]
+
+
+def test_database_errors_are_reported(tmp_path, capsys):
+    filepath = tmp_path / "games.db"
+    filepath.write_bytes(b"not a catalog" * 100)
+    assert CatalogCLI.main([str(filepath), "stats"]) == 1
+    error = capsys.readouterr().err
+    assert error.startswith("error: ") and "Traceback" not in error and "[SQL:" not in error
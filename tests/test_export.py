@@ -0,0 +1,23 @@
+"""
+Tests of exporting a catalog to CSV/JSON/JSONL data files.
+Author: DS-S
+"""
+import pytest
+
+import Cataloger
+
+
+@pytest.mark.parametrize("name", ["games.csv", "games.json", "games.jsonl.gz"])
+def test_export_reads_back_the_same_games(catalog, tmp_path, name):
+    catalog.add_games([("Hades", True, False, ["Switch", "PC"], ["Roguelike"]),
+                       ("Ico", False, False, ["PS2; PS3", "C:\\Emulators\\"], ["Puzzle;Adventure"]),
+                       ("Okami", True, True, [], [])])
+    filepath = str(tmp_path / name)
+    assert catalog.export_file(filepath).games == 3
+    copy = Cataloger.CatalogService.open(str(tmp_path / "copy.db"))
+    assert copy.import_file(filepath).games == 3
+    expected = [(entry.title, entry.played, entry.completed, sorted(entry.platforms), sorted(entry.genres))
+                for entry in catalog.games()]
+    assert [(entry.title, entry.played, entry.completed, sorted(entry.platforms), sorted(entry.genres))
+            for entry in copy.games()] == expected
+    copy.engine.dispose()
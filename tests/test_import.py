@@ -0,0 +1,60 @@
+"""
+Tests of bulk imports from CSV/JSON/JSONL data files.
+Author: DS-S
+"""
+import json
+
+import pytest
+
+import Cataloger
+
+
+def _games(catalog):
+    """
+    Reads every game in a catalog.
+    :param catalog: The CatalogService.
+    :return: A map of title to (played, completed, platforms, genres).
+    """
+    return {entry.title: (entry.played, entry.completed, sorted(entry.platforms), sorted(entry.genres))
+            for entry in catalog.games()}
+
+
+def test_imports_csv_reusing_known_names(catalog, tmp_path):
+    catalog.add("Hades", True, False, "Switch", "Roguelike")
+    records = tmp_path / "games.csv"
+    records.write_text("title,played,completed,platforms,genres\n"
+                       "Celeste,yes,no,Switch;PC,Platformer\n"
+                       "Okami,true,true,PS2,Adventure;Action\n", encoding="utf-8")
+    report = catalog.import_file(str(records))
+    assert (report.games, report.platforms, report.genres) == (2, 2, 3)
+    assert _games(catalog) == {"Hades": (True, False, ["Switch"], ["Roguelike"]),
+                               "Celeste": (True, False, ["PC", "Switch"], ["Platformer"]),
+                               "Okami": (True, True, ["PS2"], ["Action", "Adventure"])}
+
+
+def test_imports_json_lists(catalog, tmp_path):
+    records = tmp_path / "games.json"
+    records.write_text(json.dumps([{"title": "Ico", "platforms": ["PS2", "PS3", "PS2"], "genres": ["Puzzle"]},
+                                   {"title": "Bastion", "played": True, "genre": "Action"}]), encoding="utf-8")
+    assert catalog.import_file(str(records)).games == 2
+    assert _games(catalog) == {"Ico": (False, False, ["PS2", "PS3"], ["Puzzle"]),
+                               "Bastion": (True, False, [], ["Action"])}
+
+
+def test_invalid_record_imports_nothing(catalog, tmp_path):
+    records = tmp_path / "games.jsonl"
+    records.write_text('{"title": "Ico", "platform": "PS2"}\n{"title": "Okami", "played": "maybe"}\n',
+                       encoding="utf-8")
+    with pytest.raises(ValueError, match="Record 2"):
+        catalog.import_file(str(records))
+    assert _games(catalog) == {}
+
+
+def test_batched_import_links_every_game(catalog):
+    records = [(f"Game {number}", False, number % 2 == 0, [f"Platform {number % 3}"], [f"Genre {number % 2}"])
+               for number in range(10)]
+    # Several batches, the last one partly filled
+    report = Cataloger.import_records(catalog.engine, records, batch_size=3)
+    assert (report.games, report.platforms, report.genres) == (10, 3, 2)
+    assert _games(catalog) == {title: (played, completed, platforms, genres)
+                               for title, played, completed, platforms, genres in records}
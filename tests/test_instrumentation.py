@@ -0,0 +1,35 @@
+"""
+Tests of the statement and command timings.
+Author: DS-S
+"""
+import Cataloger
+
+
+def _statements(instruments, keyword):
+    """
+    Picks the statement totals of the statements reading or writing a table.
+    :param instruments: The Instrumentation.
+    :param keyword: Text the statements start with, e.g. "SELECT" or "INSERT INTO game ".
+    :return: The list of StatementStats.
+    """
+    return [entry for entry in instruments.statement_stats() if entry.statement.lstrip().startswith(keyword)]
+
+
+def test_counts_rows_fetched_and_written(catalog):
+    catalog.add_games([(f"Game {number:02}", False, False, ["PC"], ["Puzzle"]) for number in range(12)])
+    instruments = Cataloger.instrument(catalog.engine)
+    try:
+        with Cataloger.track(catalog.engine, "Search"):
+            results = catalog.search("game", limit=5)
+        assert len(results) == 5
+        reads = _statements(instruments, "SELECT")
+        assert reads and sum(entry.rows for entry in reads) >= len(results)
+        with Cataloger.track(catalog.engine, "Update"):
+            assert catalog.update({"played": True}, platform="PC") == 12
+        writes = _statements(instruments, "UPDATE game ")
+        assert writes and sum(entry.rows for entry in writes) == 12
+        commands = {entry.command: entry for entry in instruments.command_stats()}
+        assert commands["Search"].count == 1 and commands["Search"].statements > 0
+        assert "Search" in instruments.report()
+    finally:
+        instruments.close()
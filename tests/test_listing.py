@@ -0,0 +1,51 @@
+"""
+Tests of the keyset paginated listings.
+Author: DS-S
+"""
+import pytest
+
+import Cataloger
+
+
+def test_grouped_pages_cross_group_boundaries(catalog):
+    catalog.add_games([(f"Game {number:02}", number % 2 == 0, False,
+                        [f"Platform {name}" for name in range(number % 3 + 1)], [f"Genre {number % 4}"])
+                       for number in range(30)])
+    # A title change moves the game within each of its groups
+    catalog.update({"title": "Aaa"}, title="Game 29")
+    for sort, played in (("platform", None), ("genre", None), ("platform", True)):
+        expected = sorted((row.group, row.title, row.id)
+                          for row in Cataloger.list_games(catalog.engine, sort, played=played, page_size=1000).rows)
+        listed, after = [], None
+        while True:
+            page = catalog.page(sort, played=played, after=after, page_size=4)
+            assert len(page.rows) <= 4
+            listed.extend((row.group, row.title, row.id) for row in page.rows)
+            after = page.next_key
+            if after is None:
+                break
+        assert listed == expected
+        assert len({group for group, _, _ in listed}) > 1
+
+
+def test_page_size_must_be_positive(catalog):
+    with pytest.raises(ValueError):
+        catalog.page(page_size=0)
+
+
+@pytest.mark.parametrize("sort, after", [("title", ["Game 01"]), ("title", ["Game 01", 1, 2]), ("title", [1, 1]),
+                                         ("title", ["Game 01", True]), ("title", "Game 01"),
+                                         ("platform", ["Platform 0", "Game 01"]), ("genre", ["Genre 0", 1, 1])])
+def test_malformed_page_key_is_rejected(catalog, sort, after):
+    catalog.add("Game 01", False, False, "Platform 0", "Genre 0")
+    with pytest.raises(ValueError, match="Invalid page key"):
+        catalog.page(sort, after=after)
+
+
+def test_title_pages_follow_on(catalog):
+    catalog.add_games([(f"Game {number:02}", False, False, ["Platform 0"], ["Genre 0"]) for number in range(5)])
+    first = catalog.page(page_size=3)
+    assert [row.title for row in first.rows] == ["Game 00", "Game 01", "Game 02"]
+    # A key read back from JSON is a list
+    rest = catalog.page(after=list(first.next_key), page_size=3)
+    assert [row.title for row in rest.rows] == ["Game 03", "Game 04"] and rest.next_key is None
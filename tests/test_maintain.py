@@ -0,0 +1,61 @@
+"""
+Tests of catalog maintenance: purging orphaned rows and reclaiming space.
+Author: DS-S
+"""
+import Cataloger
+
+
+def _names(engine, table, column):
+    """
+    Reads the names left in the platform/genre table.
+    :param engine: The source of connections to the database.
+    :param table: The platform/genre table.
+    :param column: The column holding the name.
+    :return: The names, sorted.
+    """
+    with engine.connect() as conn:
+        return sorted(conn.exec_driver_sql(f"SELECT {column} FROM {table}").scalars())
+
+
+def test_maintain_purges_orphans(catalog):
+    catalog.add("Hades", True, False, "Switch", "Roguelike")
+    catalog.add("Celeste", False, False, "PC", "Platformer")
+    catalog.add_games([(f"Game {number:03}", False, False, ["PS2"], ["Adventure"]) for number in range(100)])
+    # Removing games leaves their platforms and genres behind
+    for number in range(100):
+        catalog.remove(f"Game {number:03}", False, False, "PS2", "Adventure")
+    with catalog.engine.begin() as conn:
+        hades = Cataloger.find_entry_id(conn, "Hades", True, False, "Switch", "Roguelike")
+        # Link rows pointing at a game and a genre that no longer exist
+        conn.exec_driver_sql("INSERT INTO game_platform_link (game_id, platform_id, title) "
+                             "SELECT 9999, id, 'Gone' FROM platform WHERE platform_name = 'Switch'")
+        conn.exec_driver_sql("INSERT INTO game_genre_link (game_id, genre_id, title) VALUES (?, 9999, 'Hades')",
+                             (hades,))
+    report = catalog.maintain()
+    assert (report.links, report.platforms, report.genres) == (2, 1, 1)
+    assert report.bytes_after > 0 and report.bytes_reclaimed >= 0
+    assert _names(catalog.engine, "platform", "platform_name") == ["PC", "Switch"]
+    assert _names(catalog.engine, "genre", "genre_name") == ["Platformer", "Roguelike"]
+    assert [(entry.title, entry.platforms, entry.genres) for entry in catalog.games()] == [
+        ("Celeste", ["PC"], ["Platformer"]), ("Hades", ["Switch"], ["Roguelike"])]
+    assert [entry.title for entry in catalog.search("hades")] == ["Hades"]
+    with catalog.engine.connect() as conn:
+        # 2 is INCREMENTAL, set by the first run
+        assert conn.exec_driver_sql("PRAGMA auto_vacuum").scalar() == 2
+    # Nothing is left to purge
+    report = catalog.maintain()
+    assert (report.links, report.platforms, report.genres) == (0, 0, 0)
+
+
+def test_full_maintain_recounts_stats(catalog):
+    catalog.add_games([("Hades", True, False, ["Switch", "PC"], ["Roguelike"]),
+                       ("Okami", True, True, ["PS2"], ["Adventure"])])
+    with catalog.engine.begin() as conn:
+        # Statistics gone wrong, e.g. after editing the file by hand with the triggers missing
+        conn.exec_driver_sql("UPDATE status_stats SET games = games + 40")
+        conn.exec_driver_sql("UPDATE platform_stats SET played = 0")
+    report = Cataloger.maintain(catalog.engine, full=True)
+    assert report.bytes_after > 0
+    stats = catalog.stats()
+    assert (stats.games, stats.played, stats.completed) == (2, 2, 1)
+    assert {entry.name: entry.played for entry in stats.platforms} == {"PC": 1, "PS2": 1, "Switch": 1}
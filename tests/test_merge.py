@@ -0,0 +1,71 @@
+"""
+Tests of merging several catalogs into one, combining the copies of the same game.
+Author: DS-S
+"""
+import pytest
+
+import CatalogMerge
+import Cataloger
+
+
+def _source(tmp_path, name, games):
+    """
+    Makes a catalog file to merge.
+    :param tmp_path: The test's temporary directory.
+    :param name: The file name of the catalog.
+    :param games: The (title, played, completed, platforms, genres) tuples of its games.
+    :return: The filepath to the catalog.
+    """
+    filepath = str(tmp_path / name)
+    service = Cataloger.CatalogService.open(filepath)
+    service.add_games(games)
+    service.engine.dispose()
+    return filepath
+
+
+def _merged(catalog):
+    """
+    Reads the merged catalog.
+    :param catalog: The CatalogService of the merged catalog.
+    :return: Map of title to (played, completed, sorted platforms, sorted genres).
+    """
+    return {entry.title: (entry.played, entry.completed, sorted(entry.platforms), sorted(entry.genres))
+            for entry in catalog.games()}
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_merge_combines_copies_of_a_game(catalog, tmp_path, workers):
+    alice = _source(tmp_path, "alice.db", [
+        ("The Legend of Zelda: Breath of the Wild", True, False, ["Switch"], ["Adventure"]),
+        ("Hades", False, False, ["PC"], ["Roguelike"])])
+    bob = _source(tmp_path, "bob.db", [
+        ("the legend of zelda  breath of the wild", False, True, ["switch", "Wii U"], ["adventure", "Open World"]),
+        ("HADES!", True, False, ["Switch"], ["Roguelike", "Action"]),
+        ("Okami", True, True, ["PS2"], ["Adventure"])])
+    report = CatalogMerge.merge_catalogs(catalog.engine, [alice, bob], workers)
+    assert (report.catalogs, report.read, report.games) == (2, 5, 3)
+    # The first spelling seen is kept, the status is or-ed and the platforms/genres are unioned
+    assert _merged(catalog) == {
+        "The Legend of Zelda: Breath of the Wild": (True, True, ["Switch", "Wii U"], ["Adventure", "Open World"]),
+        "Hades": (True, False, ["PC", "Switch"], ["Action", "Roguelike"]),
+        "Okami": (True, True, ["PS2"], ["Adventure"])}
+    # Every game on the same platform shares one spelling of its name
+    with catalog.engine.connect() as conn:
+        assert sorted(conn.exec_driver_sql("SELECT platform_name FROM platform").scalars()) == [
+            "PC", "PS2", "Switch", "Wii U"]
+    stats = catalog.stats()
+    assert (stats.games, stats.played, stats.completed) == (3, 3, 2)
+
+
+def test_normalize_title():
+    assert CatalogMerge.normalize_title("  Ｆｉｎａｌ   Fantasy_VII: Remake! ") == "final fantasy vii remake"
+    assert CatalogMerge.normalize_name("Nintendo  SWITCH") == "nintendo switch"
+
+
+def test_merge_needs_an_empty_catalog(catalog, tmp_path):
+    source = _source(tmp_path, "alice.db", [("Okami", True, True, ["PS2"], ["Adventure"])])
+    with pytest.raises(ValueError, match="does not exist"):
+        CatalogMerge.merge_catalogs(catalog.engine, [source, str(tmp_path / "missing.db")], 1)
+    catalog.add("Hades", True, False, "Switch", "Roguelike")
+    with pytest.raises(ValueError, match="already holds games"):
+        CatalogMerge.merge_catalogs(catalog.engine, [source], 1)
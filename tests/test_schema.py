@@ -0,0 +1,102 @@
+"""
+Tests of the schema migrations.
+Author: DS-S
+"""
+import sqlite3
+
+import Cataloger
+
+# The tables of a catalog made before schema versioning
+ORIGINAL_SCHEMA = """
+CREATE TABLE game (id INTEGER NOT NULL, title VARCHAR NOT NULL, played BOOLEAN NOT NULL, completed BOOLEAN NOT NULL,
+                   PRIMARY KEY (id));
+CREATE TABLE platform (id INTEGER NOT NULL, platform_name VARCHAR NOT NULL, PRIMARY KEY (id));
+CREATE TABLE genre (id INTEGER NOT NULL, genre_name VARCHAR NOT NULL, PRIMARY KEY (id));
+CREATE TABLE game_platform_link (game_id INTEGER NOT NULL, platform_id INTEGER NOT NULL,
+                                 PRIMARY KEY (game_id, platform_id), FOREIGN KEY(game_id) REFERENCES game (id),
+                                 FOREIGN KEY(platform_id) REFERENCES platform (id));
+CREATE TABLE game_genre_link (game_id INTEGER NOT NULL, genre_id INTEGER NOT NULL, PRIMARY KEY (game_id, genre_id),
+                              FOREIGN KEY(game_id) REFERENCES game (id), FOREIGN KEY(genre_id) REFERENCES genre (id));
+"""
+
+# A catalog at schema version 1: the original tables plus the indexes added by the first migration
+V1_SCHEMA = ORIGINAL_SCHEMA + """
+CREATE INDEX ix_game_title ON game (title);
+CREATE UNIQUE INDEX ix_platform_platform_name ON platform (platform_name);
+CREATE UNIQUE INDEX ix_genre_genre_name ON genre (genre_name);
+CREATE INDEX ix_game_platform_link_platform_id ON game_platform_link (platform_id, game_id);
+CREATE INDEX ix_game_genre_link_genre_id ON game_genre_link (genre_id, game_id);
+INSERT INTO game VALUES (1, 'Fire Emblem', 0, 1), (2, 'Dark Cloud', 1, 1), (3, 'Hades', 1, 0);
+INSERT INTO platform VALUES (1, 'Switch'), (2, 'PS2'), (3, 'PC');
+INSERT INTO genre VALUES (1, 'RPG'), (2, 'Roguelike');
+INSERT INTO game_platform_link VALUES (1, 1), (2, 2), (3, 1), (3, 3);
+INSERT INTO game_genre_link VALUES (1, 1), (2, 1), (3, 2);
+PRAGMA user_version = 1;
+"""
+
+
+def _recounted(engine):
+    """
+    Reads the statistics kept up to date by the triggers, then recounts them from scratch.
+    :param engine: The source of connections to the database.
+    :return: A (maintained, recounted) pair of CatalogStats.
+    """
+    with engine.begin() as conn:
+        maintained = Cataloger.read_stats(conn)
+        Cataloger.rebuild_stats(conn)
+        return maintained, Cataloger.read_stats(conn)
+
+
+def _names(stats):
+    """
+    Reduces per platform/genre statistics to a map of name to (games, played, completed).
+    :param stats: A list of NameStats.
+    :return: The map.
+    """
+    return {entry.name: (entry.games, entry.played, entry.completed) for entry in stats}
+
+
+def test_merges_duplicate_names_of_unversioned_catalog(tmp_path):
+    filepath = str(tmp_path / "old.db")
+    with sqlite3.connect(filepath) as conn:
+        conn.executescript(ORIGINAL_SCHEMA + """
+INSERT INTO game VALUES (1, 'Fire Emblem', 0, 1), (2, 'Hades', 1, 0);
+INSERT INTO platform VALUES (1, 'Switch'), (2, 'Switch'), (3, 'PC');
+INSERT INTO genre VALUES (1, 'RPG'), (2, 'RPG');
+INSERT INTO game_platform_link VALUES (1, 2), (2, 1), (2, 2), (2, 3);
+INSERT INTO game_genre_link VALUES (1, 1), (2, 2);
+""")
+    service = Cataloger.CatalogService.open(filepath)
+    with service.engine.connect() as conn:
+        assert conn.exec_driver_sql("SELECT id, platform_name FROM platform ORDER BY id").all() == [
+            (1, "Switch"), (3, "PC")]
+        assert conn.exec_driver_sql("SELECT game_id, platform_id FROM game_platform_link ORDER BY 1, 2").all() == [
+            (1, 1), (2, 1), (2, 3)]
+        assert conn.exec_driver_sql("SELECT game_id, genre_id FROM game_genre_link ORDER BY 1, 2").all() == [
+            (1, 1), (2, 1)]
+    maintained, recounted = _recounted(service.engine)
+    assert maintained == recounted
+    assert _names(maintained.platforms) == {"PC": (1, 1, 0), "Switch": (2, 1, 1)}
+    assert _names(maintained.genres) == {"RPG": (2, 1, 1)}
+    service.engine.dispose()
+
+
+def test_migrates_version_1_catalog(tmp_path):
+    filepath = str(tmp_path / "old.db")
+    with sqlite3.connect(filepath) as conn:
+        conn.executescript(V1_SCHEMA)
+    service = Cataloger.CatalogService.open(filepath)
+    with service.engine.connect() as conn:
+        assert conn.exec_driver_sql("PRAGMA user_version").scalar() == Cataloger.SCHEMA_VERSION
+        indexes = {row[0] for row in conn.exec_driver_sql("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        assert "ix_game_title_status" in indexes and "ix_game_title" not in indexes
+        assert "ix_game_platform_link_platform_title" in indexes and "ix_game_platform_link_platform_id" not in indexes
+    maintained, recounted = _recounted(service.engine)
+    assert maintained == recounted
+    assert (maintained.games, maintained.played, maintained.completed, maintained.backlog) == (3, 2, 2, 1)
+    assert _names(maintained.platforms) == {"PC": (1, 1, 0), "PS2": (1, 1, 1), "Switch": (2, 1, 1)}
+    assert [entry.title for entry in service.search("hades")] == ["Hades"]
+    assert [(row.group, row.title) for row in service.page("platform").rows] == [
+        ("PC", "Hades"), ("PS2", "Dark Cloud"), ("Switch", "Fire Emblem"), ("Switch", "Hades")]
+    # Opening it again finds it current and changes nothing
+    assert Cataloger.migrate(service.engine) == Cataloger.SCHEMA_VERSION
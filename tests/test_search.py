@@ -0,0 +1,45 @@
+"""
+Tests of the ranked title search.
+Author: DS-S
+"""
+
+
+def _titles(catalog, query):
+    """
+    Searches a catalog.
+    :param catalog: The CatalogService.
+    :param query: The text to search for.
+    :return: The titles found, best match first.
+    """
+    return [entry.title for entry in catalog.search(query)]
+
+
+def test_ranks_exact_then_words_then_typos(catalog):
+    catalog.add_games([("Fire Emblem", False, True, ["Switch"], ["RPG"]),
+                       ("Fire Emblem: Three Houses", True, False, ["Switch"], ["RPG"]),
+                       ("Emblem of Fire", False, False, ["PC"], ["RPG"]),
+                       ("Firewatch", True, True, ["PC"], ["Adventure"]),
+                       ("Hades", True, False, ["PC"], ["Roguelike"])])
+    results = _titles(catalog, "fire emblem")
+    # The exact title first, then the titles holding both words
+    assert results[0] == "Fire Emblem"
+    assert set(results[1:3]) == {"Fire Emblem: Three Houses", "Emblem of Fire"}
+    assert "Hades" not in results
+
+
+def test_prefix_and_typo_matches(catalog):
+    catalog.add_games([("Fire Emblem", False, True, ["Switch"], ["RPG"]),
+                       ("Hollow Knight", True, False, ["PC"], ["Metroidvania"])])
+    assert _titles(catalog, "fire emb") == ["Fire Emblem"]
+    # No word matches, so the trigram index finds the title despite the typo
+    assert _titles(catalog, "hollow knigth") == ["Hollow Knight"]
+    assert _titles(catalog, "zzzz") == []
+
+
+def test_search_sees_changed_titles(catalog):
+    catalog.add("Hades", True, False, "PC", "Roguelike")
+    assert _titles(catalog, "hades") == ["Hades"]
+    catalog.update({"title": "Hades II"}, title="Hades")
+    assert _titles(catalog, "hades ii") == ["Hades II"]
+    catalog.remove("Hades II", True, False, "PC", "Roguelike")
+    assert _titles(catalog, "hades") == []
@@ -0,0 +1,94 @@
+"""
+Tests of the HTTP/JSON server: listings, conditional requests and error statuses.
+Author: DS-S
+"""
+import http.client
+import json
+import threading
+from urllib.parse import quote
+
+import pytest
+
+import CatalogServer
+
+
+@pytest.fixture
+def server(catalog):
+    """
+    The catalog served on a free local port.
+    :return: The CatalogServer.
+    """
+    server = CatalogServer.CatalogServer(("127.0.0.1", 0), catalog, workers=2, quiet=True)
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+
+def _request(server, method, path, body=None, headers=None):
+    """
+    Sends one request to the server.
+    :param server: The CatalogServer.
+    :param method: The HTTP method.
+    :param path: The request target.
+    :param body: An object to send as the JSON body, if any.
+    :param headers: Extra request headers.
+    :return: A (status, headers, body) tuple, body being the decoded JSON or None when empty.
+    """
+    conn = http.client.HTTPConnection("127.0.0.1", server.server_address[1], timeout=10)
+    try:
+        data = None if body is None else json.dumps(body).encode("utf-8")
+        conn.request(method, path, data, {**(headers or {}), "Content-Type": "application/json"})
+        response = conn.getresponse()
+        payload = response.read()
+        return response.status, response.headers, json.loads(payload) if payload else None
+    finally:
+        conn.close()
+
+
+HADES = {"title": "Hades", "played": True, "completed": False, "platform": "Switch", "genre": "Roguelike"}
+
+
+def test_listing_pages_and_not_modified(server):
+    for title in ("Okami", "Celeste", "Hades"):
+        assert _request(server, "POST", "/games", {**HADES, "title": title})[0] == 201
+    status, headers, body = _request(server, "GET", "/games?page_size=2")
+    assert status == 200 and [game["title"] for game in body["games"]] == ["Celeste", "Hades"]
+    status, _, rest = _request(server, "GET", "/games?page_size=2&after=" + quote(body["next"]))
+    assert status == 200 and [game["title"] for game in rest["games"]] == ["Okami"] and rest["next"] is None
+    etag = headers["ETag"]
+    status, _, body = _request(server, "GET", "/games?page_size=2", headers={"If-None-Match": etag})
+    assert status == 304 and body is None
+    # A change makes the client's copy stale
+    assert _request(server, "DELETE", "/games", {**HADES, "title": "Okami"})[0] == 200
+    status, headers, body = _request(server, "GET", "/games?page_size=2", headers={"If-None-Match": etag})
+    assert status == 200 and headers["ETag"] != etag
+
+
+def test_changes_that_cannot_be_made(server):
+    assert _request(server, "POST", "/games", HADES)[0] == 201
+    status, _, body = _request(server, "POST", "/games", HADES)
+    assert status == 409 and "error" in body
+    status, _, body = _request(server, "DELETE", "/games", {**HADES, "title": "Ico"})
+    assert status == 404 and "error" in body
+    assert _request(server, "POST", "/games", {**HADES, "played": "yes"})[0] == 400
+    assert _request(server, "POST", "/players", HADES)[0] == 404
+
+
+@pytest.mark.parametrize("after", ["not json", "5", '{"title": "Hades"}', '["Hades"]', '["Hades", "one"]',
+                                   '[1, 2]', '["PC", "Hades", 1]'])
+def test_malformed_after_is_a_bad_request(server, after):
+    status, _, body = _request(server, "GET", "/games?after=" + quote(after))
+    assert status == 400 and "error" in body
+    # The worker is still serving
+    assert _request(server, "GET", "/games")[0] == 200
+
+
+def test_bad_query_parameters(server):
+    assert _request(server, "GET", "/games?page_size=0")[0] == 400
+    assert _request(server, "GET", "/games?played=maybe")[0] == 400
+    assert _request(server, "GET", "/games?sort=price")[0] == 400
+    assert _request(server, "GET", "/search")[0] == 400
+    assert _request(server, "GET", "/players")[0] == 404
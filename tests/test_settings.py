@@ -0,0 +1,34 @@
+"""
+Tests of the SQLite connection settings catalogs are opened with.
+Author: DS-S
+"""
+import os
+
+import Cataloger
+
+
+def _journal_mode(engine):
+    """
+    Reads the journal mode the catalog's connections use.
+    :param engine: The source of connections to the database.
+    :return: The journal mode, e.g. "delete" or "wal".
+    """
+    with engine.connect() as conn:
+        return conn.exec_driver_sql("PRAGMA journal_mode").scalar()
+
+
+def test_default_keeps_sqlite_settings(tmp_path):
+    filepath = str(tmp_path / "games.db")
+    service = Cataloger.CatalogService.open(filepath)
+    service.add("Hades", True, False, "Switch", "Roguelike")
+    assert _journal_mode(service.engine) != "wal"
+    assert not os.path.exists(filepath + "-wal")
+    service.engine.dispose()
+
+
+def test_performance_is_opt_in(tmp_path):
+    service = Cataloger.CatalogService.open(str(tmp_path / "games.db"), profile="performance")
+    service.add("Hades", True, False, "Switch", "Roguelike")
+    assert _journal_mode(service.engine) == "wal"
+    assert [entry.title for entry in service.search("hades")] == ["Hades"]
+    service.engine.dispose()
@@ -0,0 +1,69 @@
+"""
+Tests of the in-memory columnar snapshot against the same counts made in SQL.
+Author: DS-S
+"""
+import pytest
+
+import CatalogSnapshot
+
+# Counts the games matching the snapshot's filters, each filter left out when None
+COUNT_SQL = """
+SELECT COUNT(*) FROM game
+WHERE (:platform IS NULL OR id IN (SELECT game_id FROM game_platform_link JOIN platform ON platform.id = platform_id
+                                   WHERE platform_name = :platform))
+  AND (:genre IS NULL OR id IN (SELECT game_id FROM game_genre_link JOIN genre ON genre.id = genre_id
+                                WHERE genre_name = :genre))
+  AND (:played IS NULL OR played = :played)
+  AND (:completed IS NULL OR completed = :completed)
+"""
+
+
+@pytest.fixture
+def filled(catalog):
+    """
+    A catalog of 70 games spread over several platforms and genres, with some games removed so the ids have gaps.
+    :return: The CatalogService of the catalog.
+    """
+    catalog.add_games([(f"Game {number:02}", number % 2 == 0, number % 3 == 0,
+                        [f"Platform {name}" for name in range(number % 3 + 1)], [f"Genre {number % 4}"])
+                       for number in range(70)])
+    for number in (5, 6, 33):
+        catalog.remove(f"Game {number:02}", number % 2 == 0, number % 3 == 0, "Platform 0", f"Genre {number % 4}")
+    return catalog
+
+
+def test_counts_match_sql(filled):
+    snapshot = CatalogSnapshot.load_snapshot(filled.engine)
+    assert len(snapshot) == 67
+    filters = [(platform, genre, played, completed)
+               for platform in (None, "Platform 0", "Platform 2", "Platform 9")
+               for genre in (None, "Genre 1", "Genre 3")
+               for played in (None, True, False)
+               for completed in (None, True, False)]
+    with filled.engine.connect() as conn:
+        for platform, genre, played, completed in filters:
+            expected = conn.exec_driver_sql(COUNT_SQL, {"platform": platform, "genre": genre, "played": played,
+                                                        "completed": completed}).scalar()
+            assert snapshot.count(platform, genre, played, completed) == expected, (platform, genre, played, completed)
+        by_platform = dict(conn.exec_driver_sql(
+            "SELECT platform_name, COUNT(*) FROM game_platform_link JOIN platform ON platform.id = platform_id "
+            "JOIN game ON game.id = game_id WHERE NOT played GROUP BY platform_name").all())
+    assert snapshot.by_platform(snapshot.select(played=False)) == by_platform
+    assert sum(snapshot.by_genre().values()) == len(snapshot)
+
+
+def test_entries_match_listing(filled):
+    snapshot = CatalogSnapshot.load_snapshot(filled.engine)
+    entries = snapshot.entries(snapshot.select(platform="Platform 1", completed=True))
+    listed = filled.page(platform="Platform 1", completed=True, page_size=1000).rows
+    assert entries == [entry._replace(platforms=sorted(entry.platforms), genres=sorted(entry.genres))
+                       for entry in listed]
+    assert snapshot.size().games == 67
+
+
+def test_snapshot_goes_stale_after_a_change(filled):
+    snapshot = CatalogSnapshot.load_snapshot(filled.engine)
+    assert snapshot.is_current(filled.engine)
+    filled.update({"played": True}, title="Game 01")
+    assert not snapshot.is_current(filled.engine)
+    assert CatalogSnapshot.load_snapshot(filled.engine).count(played=True) == snapshot.count(played=True) + 1
@@ -0,0 +1,65 @@
+"""
+Tests of the trigger maintained statistics.
+Author: DS-S
+"""
+import Cataloger
+
+
+def _recounted(engine):
+    """
+    Reads the statistics kept up to date by the triggers, then recounts them from scratch.
+    :param engine: The source of connections to the database.
+    :return: A (maintained, recounted) pair of CatalogStats.
+    """
+    with engine.begin() as conn:
+        maintained = Cataloger.read_stats(conn)
+        Cataloger.rebuild_stats(conn)
+        return maintained, Cataloger.read_stats(conn)
+
+
+def _names(stats):
+    """
+    Reduces per platform/genre statistics to a map of name to (games, played, completed).
+    :param stats: A list of NameStats.
+    :return: The map.
+    """
+    return {entry.name: (entry.games, entry.played, entry.completed) for entry in stats}
+
+
+def test_stats_follow_add_update_and_remove(catalog):
+    catalog.add("Hades", True, False, "Switch", "Roguelike")
+    catalog.add_games([("Celeste", False, False, ["Switch", "PC"], ["Platformer"]),
+                       ("Bastion", True, True, ["PC"], ["Action", "Roguelike"])])
+    with catalog.batch() as batch:
+        batch.add("Axiom Verge", False, True, "PC", "Metroidvania")
+    stats = catalog.stats()
+    assert (stats.games, stats.played, stats.completed, stats.backlog) == (4, 2, 2, 2)
+    assert _names(stats.platforms) == {"PC": (3, 1, 2), "Switch": (2, 1, 0)}
+    assert _names(stats.genres) == {"Action": (1, 1, 1), "Metroidvania": (1, 0, 1), "Platformer": (1, 0, 0),
+                                    "Roguelike": (2, 2, 1)}
+
+    assert catalog.update({"played": True, "completed": True}, platform="Switch") == 2
+    assert catalog.update({"platforms": ["PS5"], "genres": ["Action"]}, title="Axiom Verge") == 1
+    stats = catalog.stats()
+    assert (stats.games, stats.played, stats.completed, stats.backlog) == (4, 3, 4, 0)
+    assert _names(stats.platforms) == {"PC": (2, 2, 2), "PS5": (1, 0, 1), "Switch": (2, 2, 2)}
+    assert _names(stats.genres) == {"Action": (2, 1, 2), "Platformer": (1, 1, 1), "Roguelike": (2, 2, 2)}
+
+    catalog.remove("Hades", True, True, "Switch", "Roguelike")
+    stats = catalog.stats()
+    assert (stats.games, stats.played, stats.completed, stats.backlog) == (3, 2, 3, 0)
+    assert _names(stats.platforms) == {"PC": (2, 2, 2), "PS5": (1, 0, 1), "Switch": (1, 1, 1)}
+    assert _names(stats.genres) == {"Action": (2, 1, 2), "Platformer": (1, 1, 1), "Roguelike": (1, 1, 1)}
+    maintained, recounted = _recounted(catalog.engine)
+    assert maintained == recounted
+
+
+def test_import_counts_match_recount(catalog):
+    records = [(f"Game {number:03}", number % 2 == 0, number % 3 == 0, [f"Platform {number % 4}"],
+                [f"Genre {number % 5}", f"Genre {(number + 1) % 5}"]) for number in range(200)]
+    report = Cataloger.import_records(catalog.engine, records, batch_size=64)
+    assert report.games == 200
+    maintained, recounted = _recounted(catalog.engine)
+    assert maintained == recounted
+    assert maintained.games == 200
+
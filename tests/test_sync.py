@@ -0,0 +1,153 @@
+"""
+Tests of the change journal: replaying it on replicas, journaling imports and pruning it.
+Author: DS-S
+"""
+import pytest
+
+import Cataloger
+import CatalogSync
+
+
+def _contents(engine):
+    """
+    Reads every row of the tables the journal covers.
+    :param engine: The source of connections to the database.
+    :return: Map of table name to its rows, sorted.
+    """
+    with engine.connect() as conn:
+        return {table: sorted(conn.exec_driver_sql(f"SELECT {', '.join(columns)} FROM {table}").all())
+                for table, columns in Cataloger.JOURNAL_COLUMNS.items()}
+
+
+def _replica(tmp_path, name="replica.db"):
+    """
+    Opens a replica made by a test.
+    :param tmp_path: The test's temporary directory.
+    :param name: The file name of the replica.
+    :return: The CatalogService of the replica.
+    """
+    return Cataloger.CatalogService.open(str(tmp_path / name))
+
+
+def _journal(engine):
+    """
+    Reads the sequence numbers left in the change journal.
+    :param engine: The source of connections to the database.
+    :return: The sequence numbers, oldest first.
+    """
+    with engine.connect() as conn:
+        return [row[0] for row in conn.exec_driver_sql("SELECT seq FROM change_journal ORDER BY seq")]
+
+
+def test_sync_replays_changes(catalog, tmp_path):
+    catalog.add("Hades", True, False, "Switch", "Roguelike")
+    filepath = str(tmp_path / "replica.db")
+    CatalogSync.backup(catalog.engine, filepath)
+    catalog.add_games([("Celeste", False, False, ["Switch", "PC"], ["Platformer"])])
+    catalog.update({"played": True}, title="Celeste")
+    catalog.remove("Hades", True, False, "Switch", "Roguelike")
+    report = CatalogSync.sync(catalog.engine, filepath)
+    assert report.applied > 0 and report.skipped == 0
+    replica = _replica(tmp_path)
+    assert _contents(replica.engine) == _contents(catalog.engine)
+    stats = replica.stats()
+    assert (stats.games, stats.played) == (1, 1)
+    replica.engine.dispose()
+    # Nothing new to apply the second time
+    assert CatalogSync.sync(catalog.engine, filepath).applied == 0
+
+
+def test_change_file_applies_once(catalog, tmp_path):
+    filepath = str(tmp_path / "replica.db")
+    CatalogSync.backup(catalog.engine, filepath)
+    replica = _replica(tmp_path)
+    with catalog.engine.connect() as conn:
+        source_id = CatalogSync.catalog_id(conn)
+    with replica.engine.connect() as conn:
+        since = CatalogSync.replica_position(conn, source_id)
+    catalog.add_games([("Okami", True, True, ["PS2"], ["Adventure"]), ("Ico", False, False, ["PS2"], ["Puzzle"])])
+    changes = str(tmp_path / "changes.jsonl.gz")
+    assert CatalogSync.write_changes(catalog.engine, since, changes) > 0
+    for applied in (True, False):
+        source_id, entries = CatalogSync.read_changes(changes)
+        report = CatalogSync.apply_changes(replica.engine, source_id, entries)
+        assert (report.applied > 0) == applied
+    assert _contents(replica.engine) == _contents(catalog.engine)
+    replica.engine.dispose()
+
+
+def test_import_journals_only_written_rows(catalog, tmp_path):
+    catalog.add("Hades", True, False, "Switch", "Roguelike")
+    # Link rows left behind for the ids the import is about to hand out
+    with catalog.engine.begin() as conn:
+        conn.exec_driver_sql("INSERT INTO game_platform_link (game_id, platform_id, title) VALUES (2, 1, 'Stale')")
+        conn.exec_driver_sql("INSERT INTO game_genre_link (game_id, genre_id, title) VALUES (3, 1, 'Stale')")
+        since = CatalogSync.journal_position(conn)
+    records = tmp_path / "games.jsonl"
+    records.write_text('{"title": "Okami", "played": true, "platform": "PS2", "genre": "Adventure"}\n'
+                       '{"title": "Ico", "platform": "PS2", "genre": "Puzzle"}\n', encoding="utf-8")
+    assert catalog.import_file(str(records)).games == 2
+    links = [(change.table, change.data) for change in CatalogSync.changes_since(catalog.engine, since)
+             if change.table.endswith("_link")]
+    with catalog.engine.connect() as conn:
+        platforms = dict(conn.exec_driver_sql("SELECT platform_name, id FROM platform").all())
+        genres = dict(conn.exec_driver_sql("SELECT genre_name, id FROM genre").all())
+    assert sorted(links, key=repr) == sorted([
+        ("game_platform_link", {"game_id": 2, "platform_id": platforms["PS2"]}),
+        ("game_platform_link", {"game_id": 3, "platform_id": platforms["PS2"]}),
+        ("game_genre_link", {"game_id": 2, "genre_id": genres["Adventure"]}),
+        ("game_genre_link", {"game_id": 3, "genre_id": genres["Puzzle"]})], key=repr)
+
+
+def test_maintain_keeps_changes_replicas_need(catalog, tmp_path):
+    catalog.add("Hades", True, False, "Switch", "Roguelike")
+    filepath = str(tmp_path / "replica.db")
+    CatalogSync.backup(catalog.engine, filepath)
+    with catalog.engine.connect() as conn:
+        position = CatalogSync.journal_position(conn)
+    catalog.add("Celeste", False, False, "PC", "Platformer")
+    report = catalog.maintain()
+    assert report.changes > 0
+    assert _journal(catalog.engine) and min(_journal(catalog.engine)) == position + 1
+    CatalogSync.sync(catalog.engine, filepath)
+    assert catalog.maintain().changes > 0 and _journal(catalog.engine) == []
+    replica = _replica(tmp_path)
+    assert _contents(replica.engine) == _contents(catalog.engine)
+    replica.engine.dispose()
+    # Nothing pruned is needed: the replica is up to date
+    catalog.add("Okami", True, True, "PS2", "Adventure")
+    assert CatalogSync.sync(catalog.engine, filepath).applied > 0
+
+
+def test_maintain_without_replicas_keeps_journal(catalog, tmp_path):
+    filepath = str(tmp_path / "replica.db")
+    CatalogSync.backup(catalog.engine, filepath)
+    # Forget the replica, as for one made before the catalog recorded its replicas
+    with catalog.engine.begin() as conn:
+        conn.exec_driver_sql("DELETE FROM replica_state")
+    catalog.add("Hades", True, False, "Switch", "Roguelike")
+    catalog.add("Celeste", False, False, "PC", "Platformer")
+    journal = _journal(catalog.engine)
+    assert journal
+    assert catalog.maintain().changes == 0
+    assert _journal(catalog.engine) == journal
+    # The replica can still catch up
+    assert CatalogSync.sync(catalog.engine, filepath).applied > 0
+    replica = _replica(tmp_path)
+    assert _contents(replica.engine) == _contents(catalog.engine)
+    replica.engine.dispose()
+
+
+def test_sync_after_pruned_changes_fails(catalog, tmp_path):
+    filepath, other = str(tmp_path / "replica.db"), str(tmp_path / "other.db")
+    CatalogSync.backup(catalog.engine, filepath)
+    CatalogSync.backup(catalog.engine, other)
+    catalog.add("Hades", True, False, "Switch", "Roguelike")
+    CatalogSync.sync(catalog.engine, other)
+    # Forget the replica that is behind, as for one made before the catalog recorded its replicas
+    with catalog.engine.begin() as conn:
+        conn.exec_driver_sql("DELETE FROM replica_state WHERE seq < (SELECT max(seq) FROM replica_state)")
+    assert catalog.maintain().changes > 0
+    catalog.add("Celeste", False, False, "PC", "Platformer")
+    with pytest.raises(ValueError, match="pruned"):
+        CatalogSync.sync(catalog.engine, filepath)
@@ -0,0 +1,33 @@
+"""
+Tests of in-place updates of games.
+Author: DS-S
+"""
+import Cataloger
+
+
+def _recounted(engine):
+    """
+    Reads the statistics kept up to date by the triggers, then recounts them from scratch.
+    :param engine: The source of connections to the database.
+    :return: A (maintained, recounted) pair of CatalogStats.
+    """
+    with engine.begin() as conn:
+        maintained = Cataloger.read_stats(conn)
+        Cataloger.rebuild_stats(conn)
+        return maintained, Cataloger.read_stats(conn)
+
+
+def test_bulk_update_counts_match_recount(catalog):
+    records = [(f"Game {number:03}", number % 2 == 0, number % 3 == 0, [f"Platform {number % 4}"],
+                [f"Genre {number % 5}", f"Genre {(number + 1) % 5}"]) for number in range(200)]
+    Cataloger.import_records(catalog.engine, records)
+    generation = catalog.generation()
+    assert catalog.update({"played": True}, platform="Platform 1") == 50
+    assert catalog.update({"completed": False, "genres": ["Genre 0", "Genre 9"]}, genre="Genre 2") == 80
+    assert catalog.update({"title": "Renamed", "platforms": ["Platform 9"]}, played=False) == 50
+    # One bump per update, not one per row
+    assert catalog.generation() == generation + 3
+    maintained, recounted = _recounted(catalog.engine)
+    assert maintained == recounted
+    assert {(entry.name, entry.games, entry.played) for entry in maintained.platforms
+            if entry.name == "Platform 9"} == {("Platform 9", 50, 0)}